@@ -0,0 +1,38 @@
+"""
+Re-initialization of the objects of this package in forked processes.
+
+A forked process only has the thread that forked: a lock another thread of the parent
+held then is held forever, and the background threads are gone. The objects holding
+locks, threads or per-process state register here, and get their `_reset_after_fork`
+called in the child, before anything else runs.
+"""
+
+import itertools
+import os
+import weakref
+from typing import Protocol
+
+
+class ForkResettable(Protocol):
+    def _reset_after_fork(self) -> None: ...
+
+
+# Ordered by registration: the sinks are reset before the objects logging to them
+_registered: "weakref.WeakValueDictionary[int, ForkResettable]" = (
+    weakref.WeakValueDictionary()
+)
+_counter = itertools.count()
+
+
+def register_after_fork(obj: ForkResettable) -> None:
+    """Have `obj._reset_after_fork()` called in the forked processes, while alive."""
+    _registered[next(_counter)] = obj
+
+
+def reset_after_fork() -> None:
+    """Reset the registered objects, in the order they were registered."""
+    for obj in list(_registered.values()):
+        obj._reset_after_fork()  # noqa: SLF001
+
+
+os.register_at_fork(after_in_child=reset_after_fork)
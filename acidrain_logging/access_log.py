@@ -0,0 +1,30 @@
+from typing import Any
+
+
+class ResponseData:
+    """What the access log middlewares pick up about a response, while it is sent."""
+
+    __slots__ = ("bytes_sent", "headers_time", "logged", "start_time", "status_code")
+
+    def __init__(self, start_time: float) -> None:
+        self.start_time = start_time
+        self.status_code = 500
+        self.headers_time: float | None = None
+        self.bytes_sent = 0
+        self.logged = False
+
+    def to_dict(self, elapsed_ms: float) -> dict[str, Any]:
+        time_to_headers = None
+        if self.headers_time is not None:
+            time_to_headers = get_elapsed_ms(self.start_time, self.headers_time)
+
+        return {
+            "elapsed": elapsed_ms,
+            "time_to_headers": time_to_headers,
+            "bytes_sent": self.bytes_sent,
+            "status_code": self.status_code,
+        }
+
+
+def get_elapsed_ms(start_time: float, end_time: float) -> float:
+    return round((end_time - start_time) * 1000, 3)
@@ -0,0 +1,647 @@
+import atexit
+import contextlib
+import fcntl
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Iterator, Sized
+from typing import Any, Generic, TypeVar
+
+import orjson
+import structlog
+from structlog.stdlib import BoundLogger
+
+from acidrain_logging._fork import register_after_fork
+from acidrain_logging.config import AccessLogSettings
+
+log: BoundLogger = structlog.get_logger()
+
+# Upper bounds of the latency buckets, in ms: 4 buckets per doubling, from 50µs to
+# about 3 minutes, for a relative error of at most 19%. Slower requests go in an
+# overflow bucket.
+BUCKET_BOUNDS_MS: tuple[float, ...] = tuple(
+    round(0.05 * 2 ** (i / 4), 6) for i in range(88)
+)
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed, exponential buckets (see `BUCKET_BOUNDS_MS`).
+
+    Percentiles are estimated as the upper bound of the bucket they fall into, capped
+    by the largest recorded value.
+    """
+
+    __slots__ = ("count", "counts", "max", "total")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value_ms: float) -> None:
+        self.counts[bisect_left(BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        self.max = max(self.max, value_ms)
+
+    def percentile(self, q: float) -> float:
+        """Estimate the `q`th percentile, `q` being between 0 and 100."""
+        rank = max(math.ceil(q / 100 * self.count), 1)
+
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if i < len(BUCKET_BOUNDS_MS):
+                    return min(BUCKET_BOUNDS_MS[i], self.max)
+                break
+
+        return self.max
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50": round(self.percentile(50), 3),
+            "p90": round(self.percentile(90), 3),
+            "p99": round(self.percentile(99), 3),
+            "max": round(self.max, 3),
+        }
+
+
+RequestKey = tuple[str, str | None, int]
+
+
+def get_summary(
+    histograms: dict[RequestKey, LatencyHistogram], interval_s: float
+) -> dict[str, Any]:
+    """Build the summary logged for the requests of an interval."""
+    return {
+        "interval_s": round(interval_s, 3),
+        "requests": [
+            {
+                "method": method,
+                "route": route,
+                "status_code": status_code,
+                **histogram.summary(),
+            }
+            for (method, route, status_code), histogram in sorted(
+                histograms.items(), key=_sort_key
+            )
+        ],
+    }
+
+
+def _sort_key(item: tuple[RequestKey, LatencyHistogram]) -> tuple[str, str, int]:
+    (method, route, status_code), _ = item
+    return route or "", method, status_code
+
+
+_T = TypeVar("_T", bound=Sized)
+
+
+class PeriodicAggregator(ABC, Generic[_T]):
+    """
+    Collect data, and log a summary of it periodically.
+
+    Every `interval_s`, a background thread logs a summary of the data of the interval,
+    if there is any, and starts over. What is left is logged on close, which also
+    happens at exit.
+
+    In forked processes, the aggregator starts over empty, with its own thread: what
+    was recorded before the fork is the parent's to log.
+    """
+
+    def __init__(self, interval_s: float) -> None:
+        self.interval_s = interval_s
+
+        self._data = self._new()
+        self._start_time = time.monotonic()
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+
+        self._thread = self._start_thread()
+
+        atexit.register(self.close)
+        register_after_fork(self)
+
+    @abstractmethod
+    def _new(self) -> _T:
+        """Return the empty data of an interval."""
+
+    @abstractmethod
+    def _log(self, data: _T, interval_s: float) -> None:
+        """Log the summary of the data of an interval."""
+
+    def emit(self) -> None:
+        """Log the summary of what was recorded since the last one, if anything."""
+        now = time.monotonic()
+
+        with self._lock:
+            data, self._data = self._data, self._new()
+            start_time, self._start_time = self._start_time, now
+
+        if len(data):
+            self._log(data, now - start_time)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._wakeup.notify()
+
+        self._thread.join()
+        atexit.unregister(self.close)
+
+        self.emit()
+
+    def _reset_after_fork(self) -> None:
+        self._data = self._new()
+        self._start_time = time.monotonic()
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+
+        if not self._closed:
+            self._thread = self._start_thread()
+
+    def _start_thread(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self._run, name="acidrain-log-aggregation", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._closed:
+                    self._wakeup.wait(self.interval_s)
+
+                if self._closed:
+                    return
+
+            # A summary that fails to be logged is lost, not the next ones
+            with contextlib.suppress(Exception):
+                self.emit()
+
+
+class RequestAggregator(PeriodicAggregator[dict[RequestKey, LatencyHistogram]]):
+    """
+    Collect the latency of requests per method, route template and status code.
+
+    The summary is logged as `http_summary`, see `get_summary`.
+    """
+
+    def record(
+        self, method: str, route: str | None, status_code: int, elapsed_ms: float
+    ) -> None:
+        key = (method, route, status_code)
+
+        with self._lock:
+            histogram = self._data.get(key)
+            if histogram is None:
+                histogram = self._data[key] = LatencyHistogram()
+
+            histogram.record(elapsed_ms)
+
+    def _new(self) -> dict[RequestKey, LatencyHistogram]:
+        return {}
+
+    def _log(self, data: dict[RequestKey, LatencyHistogram], interval_s: float) -> None:
+        log.info("HTTP requests summary", http_summary=get_summary(data, interval_s))
+
+
+class TaskStats:
+    """Final states, durations and start delays, in ms, of the runs of a task."""
+
+    __slots__ = ("duration", "start_delay", "states")
+
+    def __init__(self) -> None:
+        self.states: Counter[str] = Counter()
+        self.duration = LatencyHistogram()
+        self.start_delay = LatencyHistogram()
+
+    def record(
+        self, state: str, duration_ms: float, start_delay_ms: float | None
+    ) -> None:
+        self.states[state] += 1
+        self.duration.record(duration_ms)
+        if start_delay_ms is not None:
+            self.start_delay.record(start_delay_ms)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.duration.count,
+            "states": dict(self.states),
+            "duration": self.duration.summary(),
+            "start_delay": self.start_delay.summary(),
+        }
+
+
+def get_task_summary(stats: dict[str, TaskStats], interval_s: float) -> dict[str, Any]:
+    """Build the summary logged for the task runs of an interval."""
+    return {
+        "interval_s": round(interval_s, 3),
+        "tasks": [
+            {"name": name, **task_stats.summary()}
+            for name, task_stats in sorted(stats.items())
+        ],
+    }
+
+
+class TaskAggregator(PeriodicAggregator[dict[str, TaskStats]]):
+    """
+    Collect the runs of tasks per task name.
+
+    The summary is logged as `task_summary`, see `get_task_summary`.
+    """
+
+    def record(
+        self,
+        task_name: str,
+        state: str,
+        duration_ms: float,
+        start_delay_ms: float | None,
+    ) -> None:
+        with self._lock:
+            stats = self._data.get(task_name)
+            if stats is None:
+                stats = self._data[task_name] = TaskStats()
+
+            stats.record(state, duration_ms, start_delay_ms)
+
+    def _new(self) -> dict[str, TaskStats]:
+        return {}
+
+    def _log(self, data: dict[str, TaskStats], interval_s: float) -> None:
+        log.info(
+            "Celery tasks summary", task_summary=get_task_summary(data, interval_s)
+        )
+
+
+# Layout of the shared table, in 64 bits words: a header, the pids of the processes
+# owning each region, the key directory and the regions.
+_HEADER_WORDS = 4
+_KEY_COUNT = 0
+_EMITTER_PID = 1
+_LAST_EMIT = 2
+
+# Length of the key, then the key as JSON
+_KEY_WORDS = 32
+
+# The bucket counts, then the count, total and max of the slot
+_COUNT = len(BUCKET_BOUNDS_MS) + 1
+_TOTAL_US = _COUNT + 1
+_MAX_US = _COUNT + 2
+_SLOT_WORDS = _COUNT + 3
+
+
+class SharedRequestStats:
+    """
+    Request latency histograms shared by forked processes, like gunicorn workers.
+
+    The table lives in an anonymous shared memory map, so it must be created before
+    forking, for instance in the gunicorn configuration file, and installed with
+    `set_shared_stats`:
+
+        # gunicorn.conf.py
+        from acidrain_logging.aggregation import SharedRequestStats, set_shared_stats
+
+        set_shared_stats(SharedRequestStats())
+
+    The access log middlewares then record into it, when aggregation is enabled,
+    instead of aggregating in each worker.
+
+    Each process writes to its own region of the table, claimed on first use, so
+    recording takes no lock shared between processes. The counters only ever grow:
+    the region of a dead process is taken over as is by the next one. Summaries are
+    logged by a single process, elected among those that started an emitter, from
+    the sum of all the regions minus the one of the previous summary, kept in the
+    table as well.
+
+    Keys (method, route and status) are registered in a shared directory, under a
+    lock, once per process and key. Requests past `max_keys` distinct keys, or
+    `max_workers` processes, are not counted.
+
+    That lock, also taken to claim a region and to emit, is a record lock on a
+    temporary file: the kernel releases it if the process holding it dies, a worker
+    killed by the gunicorn timeout for instance, so the others can't be deadlocked.
+    """
+
+    def __init__(self, *, max_workers: int = 64, max_keys: int = 256) -> None:
+        self.max_workers = max_workers
+        self.max_keys = max_keys
+
+        self._pids_offset = _HEADER_WORDS
+        self._keys_offset = self._pids_offset + max_workers
+        self._regions_offset = self._keys_offset + max_keys * _KEY_WORDS
+        # One region per worker, plus one for the previous summary
+        size = self._regions_offset + (max_workers + 1) * max_keys * _SLOT_WORDS
+
+        self._mmap = mmap.mmap(-1, size * 8)
+        self._words = memoryview(self._mmap).cast("Q")
+        self._words[_LAST_EMIT] = time.time_ns()
+
+        # Record locks are owned by a process, and aren't inherited by its children
+        self._lock_file = tempfile.TemporaryFile()  # noqa: SIM115
+
+        # Local to each process, reset after a fork
+        self._lock = threading.Lock()
+        self._shared_thread_lock = threading.Lock()
+        self._pid = 0
+        self._region = -1
+        self._key_indexes: dict[RequestKey, int] = {}
+        self._emitter: threading.Thread | None = None
+        self._closed = threading.Event()
+
+        register_after_fork(self)
+
+    def record(
+        self, method: str, route: str | None, status_code: int, elapsed_ms: float
+    ) -> None:
+        key = (method, route, status_code)
+        elapsed_us = round(elapsed_ms * 1000)
+        words = self._words
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._claim_process()
+
+            index = self._key_indexes.get(key)
+            if index is None:
+                index = self._key_indexes[key] = self._get_key_index(key)
+
+            if self._region < 0 or index < 0:
+                return
+
+            slot = self._get_slot_offset(self._region, index)
+            words[slot + bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+            words[slot + _COUNT] += 1
+            words[slot + _TOTAL_US] += elapsed_us
+            words[slot + _MAX_US] = max(words[slot + _MAX_US], elapsed_us)
+
+    def collect(self) -> tuple[dict[RequestKey, LatencyHistogram], float]:
+        """
+        Return the histograms of the requests since the previous call, in any process.
+
+        Also returns the time elapsed since then, in seconds.
+        """
+        words = self._words
+        baseline_region = self.max_workers
+
+        with self._shared_lock():
+            now = time.time_ns()
+            interval_s = (now - words[_LAST_EMIT]) / 1e9
+            words[_LAST_EMIT] = now
+
+            histograms = {}
+            for index in range(words[_KEY_COUNT]):
+                totals = self._sum_regions(index)
+
+                baseline = self._get_slot_offset(baseline_region, index)
+                previous = words[baseline : baseline + _SLOT_WORDS].tolist()
+                words[baseline : baseline + _SLOT_WORDS] = array("Q", totals)
+
+                if totals[_COUNT] > previous[_COUNT]:
+                    histograms[self._read_key(index)] = _get_histogram(totals, previous)
+
+        return histograms, interval_s
+
+    def emit(self) -> None:
+        """Log the summary of the requests since the previous one, if any."""
+        histograms, interval_s = self.collect()
+        if histograms:
+            log.info(
+                "HTTP requests summary",
+                http_summary=get_summary(histograms, interval_s),
+            )
+
+    def start_emitter(self, interval_s: float) -> None:
+        """
+        Log a summary every `interval_s` from this process, if it is elected.
+
+        Can be called from every process: only one of them emits at a time, and
+        another one takes over if it goes away.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._claim_process()
+
+            if self._emitter is not None:
+                return
+
+            self._closed = threading.Event()
+            self._emitter = threading.Thread(
+                target=self._run_emitter,
+                args=(interval_s,),
+                name="acidrain-log-shared-aggregation",
+                daemon=True,
+            )
+            self._emitter.start()
+
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """Stop the emitter of this process, emitting what is left if elected."""
+        with self._lock:
+            emitter, self._emitter = self._emitter, None
+
+        if emitter is None or self._pid != os.getpid():
+            return
+
+        self._closed.set()
+        emitter.join()
+        atexit.unregister(self.close)
+
+        if self._is_elected():
+            self.emit()
+            with self._shared_lock():
+                self._words[_EMITTER_PID] = 0
+
+    def _run_emitter(self, interval_s: float) -> None:
+        while not self._closed.wait(interval_s):
+            # Elected again on the next interval, if this one failed
+            with contextlib.suppress(Exception):
+                if self._elect():
+                    self.emit()
+
+    @contextlib.contextmanager
+    def _shared_lock(self) -> Iterator[None]:
+        """Lock the table against the other processes, and the other threads."""
+        # Record locks don't exclude the threads of their owner
+        with self._shared_thread_lock:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_file, fcntl.LOCK_UN)
+
+    def _sum_regions(self, index: int) -> list[int]:
+        words = self._words
+        pids = words[self._pids_offset : self._pids_offset + self.max_workers]
+
+        totals = [0] * _SLOT_WORDS
+        for region, pid in enumerate(pids):
+            if pid == 0:
+                # Never claimed
+                continue
+
+            slot = self._get_slot_offset(region, index)
+            for i, value in enumerate(words[slot : slot + _MAX_US]):
+                totals[i] += value
+
+            totals[_MAX_US] = max(totals[_MAX_US], words[slot + _MAX_US])
+
+        return totals
+
+    def _elect(self) -> bool:
+        pid = os.getpid()
+
+        with self._shared_lock():
+            emitter_pid = self._words[_EMITTER_PID]
+            if emitter_pid in {0, pid} or not _is_alive(emitter_pid):
+                self._words[_EMITTER_PID] = pid
+                return True
+
+        return False
+
+    def _is_elected(self) -> bool:
+        return self._words[_EMITTER_PID] == os.getpid()
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._shared_thread_lock = threading.Lock()
+
+        # The thread of the parent is gone
+        self._emitter = None
+
+    def _claim_process(self) -> None:
+        """Claim a region for this process. Must be called with the local lock held."""
+        self._pid = os.getpid()
+        self._region = self._claim_region()
+
+    def _claim_region(self) -> int:
+        words = self._words
+        pids = range(self._pids_offset, self._pids_offset + self.max_workers)
+
+        with self._shared_lock():
+            for offset in pids:
+                if words[offset] == self._pid:
+                    return offset - self._pids_offset
+
+            for offset in pids:
+                if words[offset] == 0 or not _is_alive(words[offset]):
+                    words[offset] = self._pid
+                    return offset - self._pids_offset
+
+        return -1
+
+    def _get_key_index(self, key: RequestKey) -> int:
+        encoded = orjson.dumps(key)
+        if len(encoded) > (_KEY_WORDS - 1) * 8:
+            return -1
+
+        words = self._words
+
+        with self._shared_lock():
+            key_count = words[_KEY_COUNT]
+            for index in range(key_count):
+                if self._read_raw_key(index) == encoded:
+                    return index
+
+            if key_count >= self.max_keys:
+                return -1
+
+            offset = (self._keys_offset + key_count * _KEY_WORDS) * 8
+            words[self._keys_offset + key_count * _KEY_WORDS] = len(encoded)
+            self._mmap[offset + 8 : offset + 8 + len(encoded)] = encoded
+            words[_KEY_COUNT] = key_count + 1
+
+            return key_count
+
+    def _read_raw_key(self, index: int) -> bytes:
+        word = self._keys_offset + index * _KEY_WORDS
+        offset = word * 8 + 8
+        return self._mmap[offset : offset + self._words[word]]
+
+    def _read_key(self, index: int) -> RequestKey:
+        method, route, status_code = orjson.loads(self._read_raw_key(index))
+        return method, route, status_code
+
+    def _get_slot_offset(self, region: int, index: int) -> int:
+        return self._regions_offset + (region * self.max_keys + index) * _SLOT_WORDS
+
+
+def _get_histogram(totals: list[int], previous: list[int]) -> LatencyHistogram:
+    histogram = LatencyHistogram()
+    histogram.counts = [
+        total - prev
+        for total, prev in zip(totals[:_COUNT], previous[:_COUNT], strict=True)
+    ]
+    histogram.count = totals[_COUNT] - previous[_COUNT]
+    histogram.total = (totals[_TOTAL_US] - previous[_TOTAL_US]) / 1000
+
+    # Only the max of all time is known: use the estimate of the max of the interval,
+    # capped by it, like for the percentiles.
+    histogram.max = totals[_MAX_US] / 1000
+    histogram.max = histogram.percentile(100)
+
+    return histogram
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # pragma: no cover: owned by another user
+        return True
+
+    return True
+
+
+_shared_stats: SharedRequestStats | None = None
+
+
+def set_shared_stats(stats: SharedRequestStats | None) -> None:
+    """Install the table the access log middlewares aggregate into, if they do."""
+    global _shared_stats  # noqa: PLW0603
+    _shared_stats = stats
+
+
+def get_shared_stats() -> SharedRequestStats | None:
+    return _shared_stats
+
+
+def create_aggregator(
+    settings: AccessLogSettings,
+) -> RequestAggregator | SharedRequestStats | None:
+    """
+    Return what the access log middlewares record the requests into, if anything.
+
+    That is the installed `SharedRequestStats`, with its emitter started in this
+    process, or a new `RequestAggregator`.
+    """
+    if not settings.aggregate:
+        return None
+
+    shared_stats = get_shared_stats()
+    if shared_stats is not None:
+        shared_stats.start_emitter(settings.aggregate_interval_s)
+        return shared_stats
+
+    return RequestAggregator(settings.aggregate_interval_s)
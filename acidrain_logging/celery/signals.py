@@ -1,34 +1,120 @@
-from datetime import datetime
+import logging
+import time
+from contextvars import Token
+from datetime import UTC, datetime
 from typing import TYPE_CHECKING, Any
-from uuid import uuid4
 
-import pytz
 import structlog
 from celery.apps.worker import Worker
 from celery.signals import (
     before_task_publish,
     celeryd_after_setup,
     setup_logging,
+    task_failure,
     task_postrun,
     task_prerun,
+    task_retry,
+    task_success,
+    worker_process_shutdown,
 )
-from structlog.contextvars import bind_contextvars, get_contextvars, reset_contextvars
 from structlog.stdlib import BoundLogger
 
-from acidrain_logging import configure_logger
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.aggregation import TaskAggregator
+from acidrain_logging.config import TaskLogSettings
+from acidrain_logging.context import (
+    BoundContext,
+    bind_contextvars,
+    get_contextvars,
+    reset_contextvars,
+)
+from acidrain_logging.levels import (
+    get_allowed_level,
+    get_elevated_level,
+    reset_elevated_level,
+    set_elevated_level,
+)
+from acidrain_logging.recorder import FlightRecorder, start_recording, stop_recording
+from acidrain_logging.sampling import TaskLogSampler
+from acidrain_logging.trace_ids import new_trace_id
+from acidrain_logging.truncation import TaskArgsFormatter
 
 if TYPE_CHECKING:
     from celery import Task
 
 log: BoundLogger = structlog.get_logger()
 
+# Tokens to restore the context as it was before each running task
+_context_tokens: dict[str, Token[BoundContext]] = {}
+
+# Tokens to restore the log level of the context, for the tasks run with a raised one
+_level_tokens: dict[str, Token[int | None]] = {}
+
+# Flight recorders of the running tasks, if enabled
+_recorders: dict[str, FlightRecorder] = {}
+
+
+class _TaskTiming:
+    """Lifecycle of a running task, in `time.perf_counter` seconds, if sampled."""
+
+    __slots__ = ("end", "queue_wait", "sampled", "start")
+
+    def __init__(
+        self, start: float, queue_wait: float | None, *, sampled: bool
+    ) -> None:
+        self.start = start
+        self.queue_wait = queue_wait
+        self.sampled = sampled
+        self.end: float | None = None
+
+    def to_dict(self, now: float) -> dict[str, float | None]:
+        end = self.end if self.end is not None else now
+
+        return {
+            "queue_wait": self.queue_wait,
+            "execution": end - self.start,
+            "postrun": now - end,
+        }
+
+
+_task_timings: dict[str, _TaskTiming] = {}
+
+_sampler = TaskLogSampler(TaskLogSettings())
+_args_formatter = TaskArgsFormatter(TaskLogSettings())
+_aggregator: TaskAggregator | None = None
+
+
+def configure_task_logs(settings: TaskLogSettings) -> None:
+    """Set up which task runs are logged, or aggregated, see `TaskLogSettings`."""
+    global _sampler, _args_formatter, _aggregator  # noqa: PLW0603
+
+    if _aggregator is not None:
+        _aggregator.close()
+
+    _sampler = TaskLogSampler(settings)
+    _args_formatter = TaskArgsFormatter(settings)
+    _aggregator = (
+        TaskAggregator(settings.aggregate_interval_s) if settings.aggregate else None
+    )
+
 
 def utcnow() -> datetime:
-    return datetime.now(tz=pytz.UTC)
+    return datetime.now(tz=UTC)
 
 
 def _setup_logging(*_: tuple[Any], **__: dict[str, Any]) -> None:
-    configure_logger()
+    log_config = LogConfig()
+    configure_logger(log_config)
+    configure_task_logs(log_config.task_log)
+
+
+def _flush_logs(*_: tuple[Any], **__: dict[str, Any]) -> None:
+    """Flush the lines buffered by a pool process, which exits without `atexit`."""
+    if _aggregator is not None:
+        _aggregator.emit()
+
+    for handler in logging.getLogger().handlers:
+        handler.flush()
 
 
 def _log_celery_startup(
@@ -42,9 +128,41 @@ def _log_celery_startup(
 def _add_task_meta(
     headers: dict[str, Any], *_: tuple[Any], **__: dict[str, Any]
 ) -> None:
-    """Inject publish timestamp and trace id, if available, to all tasks."""
-    headers["x_trace_id"] = get_contextvars().get("trace_id") or str(uuid4())
-    headers["x_publish_tm"] = utcnow().isoformat()
+    """Inject publish timestamp, trace id and raised log level, if any, to all tasks."""
+    headers["x_trace_id"] = (
+        get_contextvars().get("trace_id")
+        or structlog.contextvars.get_contextvars().get("trace_id")
+        or new_trace_id()
+    )
+    # Epoch in µs, cheaper to produce and parse than an ISO string
+    publish_us = time.time_ns() // 1000
+    headers["x_publish_us"] = publish_us
+
+    # TODO: Drop once the workers of the previous release, which only read this one,
+    #  are gone.
+    seconds, micros = divmod(publish_us, 1_000_000)
+    headers["x_publish_tm"] = (
+        datetime.fromtimestamp(seconds, tz=UTC).replace(microsecond=micros).isoformat()
+    )
+
+    # Published from a request or a task with a raised log level
+    level = get_elevated_level()
+    if level is not None:
+        headers["x_log_level"] = logging.getLevelName(level)
+
+
+def _get_publish_time(task: "Task[Any, Any]") -> float | None:
+    """Return when the task was published, as an epoch, if known."""
+    publish_us = task.request.get("x_publish_us")
+    if publish_us is not None:
+        return float(publish_us) / 1_000_000
+
+    # Published by an older version
+    publish_tm = task.request.get("x_publish_tm")
+    if publish_tm:
+        return datetime.fromisoformat(publish_tm).timestamp()
+
+    return None
 
 
 def _task_prerun(
@@ -56,56 +174,121 @@ def _task_prerun(
     **__: dict[str, Any],
 ) -> None:
     """Add task data to logging context."""
-    start_time = utcnow()
+    start = time.time()
+    start_time = datetime.fromtimestamp(start, tz=UTC)
+    publish_time = _get_publish_time(task)
+    queue_wait = start - publish_time if publish_time is not None else None
+
+    sampled = _sampler.should_log_start(task.name)
+    _task_timings[task_id] = _TaskTiming(
+        time.perf_counter(), queue_wait, sampled=sampled
+    )
+
+    task_ctx: dict[str, Any] = {
+        "task": {"id": task_id, "name": task.name, "start_time": start_time}
+    }
 
     trace_id = task.request.get("x_trace_id")
     if trace_id:
         # Bind the trace id if there's one in the props, otherwise, keep the one we may
         # already have
-        bind_contextvars(trace_id=trace_id)
+        task_ctx["trace_id"] = trace_id
 
-    bind_contextvars(task={"id": task_id, "name": task.name, "start_time": start_time})
+    _context_tokens[task_id] = bind_contextvars(**task_ctx)
 
-    log_data: dict[str, Any] = {
-        "task_args": args,
-        "task_kwargs": kwargs,
-        "queue": task.request.get("delivery_info", {}).get("routing_key"),
-    }
+    level_name = task.request.get("x_log_level")
+    level = get_allowed_level(level_name) if level_name else None
+    if level is not None:
+        _level_tokens[task_id] = set_elevated_level(level)
 
-    publish_tm = task.request.get("x_publish_tm")
-    if publish_tm:
-        log_data["publish_tm"] = publish_tm
-        log_data["start_delay"] = (
-            start_time - datetime.fromisoformat(publish_tm)
-        ).total_seconds()
+    recorder = start_recording()
+    if recorder is not None:
+        _recorders[task_id] = recorder
+
+    if not sampled:
+        return
+
+    # Truncated when rendered, if the line is
+    task_args, task_kwargs = _args_formatter.format(task.name, args, kwargs)
+
+    log_data: dict[str, Any] = {}
+    if task_args is not None:
+        log_data["task_args"] = task_args
+    if task_kwargs is not None:
+        log_data["task_kwargs"] = task_kwargs
+    log_data["queue"] = task.request.get("delivery_info", {}).get("routing_key")
+
+    if publish_time is not None:
+        log_data["publish_tm"] = datetime.fromtimestamp(publish_time, tz=UTC)
+        log_data["start_delay"] = queue_wait
 
     log.info("Received task: %s", task.name, data=log_data)
 
 
+def _task_done(sender: "Task[Any, Any]", **__: dict[str, Any]) -> None:
+    """Mark the end of the execution of the task, result stored."""
+    timing = _task_timings.get(sender.request.id or "")
+    if timing is not None:
+        timing.end = time.perf_counter()
+
+
 def _task_postrun(
+    task_id: str,
     task: "Task[Any, Any]",
     state: str,
     *_: tuple[Any],
     **__: dict[str, Any],
 ) -> None:
     """Log the task end and status and reset context."""
-    task_ctx = get_contextvars().get("task", {}).copy()
-    start_time = task_ctx.get("start_time")
-    task_ctx.update(
-        {
-            "name": task.name,
-            "state": state,
-            "duration": (utcnow() - start_time).total_seconds() if start_time else None,
-        }
+    now = time.perf_counter()
+    timing = _task_timings.pop(task_id, None)
+    duration = now - timing.start if timing else None
+
+    # The recorded events go first, in the context of the task
+    stop_recording(
+        _recorders.pop(task_id, None),
+        failed=state != "SUCCESS",
+        elapsed_ms=duration * 1000 if duration is not None else None,
     )
-    bind_contextvars(task=task_ctx)
-    log.info("Task complete: %s", task.name)
-    reset_contextvars()
+
+    if _aggregator is not None and timing is not None and duration is not None:
+        queue_wait = timing.queue_wait
+        _aggregator.record(
+            task.name,
+            state,
+            duration * 1000,
+            queue_wait * 1000 if queue_wait is not None else None,
+        )
+
+    # Runs we didn't see start are logged, like before sampling
+    if _sampler.should_log_end(
+        sampled=timing.sampled if timing else True,
+        state=state,
+        duration_ms=duration * 1000 if duration is not None else None,
+    ):
+        task_ctx = get_contextvars().get("task", {}).copy()
+        task_ctx.update({"name": task.name, "state": state, "duration": duration})
+        if timing:
+            task_ctx["timing"] = timing.to_dict(now)
+        bind_contextvars(task=task_ctx)
+        log.info("Task complete: %s", task.name)
+
+    token = _context_tokens.pop(task_id, None)
+    if token is not None:
+        reset_contextvars(token)
+
+    level_token = _level_tokens.pop(task_id, None)
+    if level_token is not None:
+        reset_elevated_level(level_token)
 
 
 def connect_signals() -> None:
     setup_logging.connect(_setup_logging)
+    worker_process_shutdown.connect(_flush_logs)
     celeryd_after_setup.connect(_log_celery_startup)
     before_task_publish.connect(_add_task_meta)
     task_prerun.connect(_task_prerun)
+    task_success.connect(_task_done)
+    task_failure.connect(_task_done)
+    task_retry.connect(_task_done)
     task_postrun.connect(_task_postrun)
@@ -1,8 +1,10 @@
 import logging
+import signal
 from enum import StrEnum
+from pathlib import Path
 from typing import Annotated
 
-from pydantic import Field, field_validator
+from pydantic import Field, SecretStr, field_validator
 from pydantic_settings import (
     BaseSettings,
     SettingsConfigDict,
@@ -16,11 +18,45 @@ class OutputFormat(StrEnum):
     JSON = "json"
 
 
+class OverflowPolicy(StrEnum):
+    __slots__ = ()
+
+    BLOCK = "block"
+    DROP_NEWEST = "drop_newest"
+    DROP_OLDEST = "drop_oldest"
+
+
+class TraceIdFormat(StrEnum):
+    __slots__ = ()
+
+    UUID = "uuid"
+    HEX = "hex"
+    TRACEPARENT = "traceparent"
+
+
+class ExceptionFormat(StrEnum):
+    __slots__ = ()
+
+    TEXT = "text"
+    DICT = "dict"
+
+
 class InvalidLogLevelError(Exception):
     def __init__(self, value: str) -> None:
         super().__init__(f"Invalid log level: {value}")
 
 
+def sanitize_log_level(value: str) -> str:
+    sanitized = value.upper()
+
+    # If there is a level with that name, getLevelName returns the corresponding int
+    # value. If we don't get an int, the level doesn't exist.
+    if sanitized not in logging.getLevelNamesMapping():
+        raise InvalidLogLevelError(value)
+
+    return sanitized
+
+
 class DatadogSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="dd_")
 
@@ -32,6 +68,304 @@ class DatadogSettings(BaseSettings):
     def is_enabled(self) -> bool:
         return self.injection_enabled and any((self.env, self.service, self.version))
 
+    def get_static_fields(self) -> dict[str, str]:
+        if not self.is_enabled():
+            return {}
+
+        return {
+            "dd.env": self.env,
+            "dd.service": self.service,
+            "dd.version": self.version,
+        }
+
+
+class QueueSettings(BaseSettings):
+    """
+    Settings for the non-blocking output mode.
+
+    When enabled, rendered lines are handed to a bounded queue and written by a
+    background thread. When the queue is full, `overflow_policy` decides what happens,
+    but events at or above `protected_level` are never dropped: they block instead.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_queue_")
+
+    enabled: bool = False
+    max_size: Annotated[int, Field(gt=0)] = 10_000
+    overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK
+    protected_level: str = "ERROR"
+    close_timeout_s: Annotated[float, Field(ge=0)] = 5.0
+
+    @field_validator("protected_level")
+    def validate_protected_level(cls, value: str) -> str:
+        return sanitize_log_level(value)
+
+
+class BatchSettings(BaseSettings):
+    """
+    Settings for the batching output mode.
+
+    When enabled, lines are buffered and written with a single system call once
+    `max_bytes` or `max_count` is reached, or at most `max_latency_ms` after the oldest
+    buffered line. Events at or above `flush_level` are written right away, along with
+    anything buffered before them.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_batch_")
+
+    enabled: bool = False
+    max_bytes: Annotated[int, Field(gt=0)] = 64 * 1024
+    max_count: Annotated[int, Field(gt=0)] = 1024
+    max_latency_ms: Annotated[float, Field(gt=0)] = 200
+    flush_level: str = "ERROR"
+
+    @field_validator("flush_level")
+    def validate_flush_level(cls, value: str) -> str:
+        return sanitize_log_level(value)
+
+
+class FunnelSettings(BaseSettings):
+    """
+    Settings for the multi-process funnel mode.
+
+    When enabled, the processes forked after the logging is configured, like the
+    Celery prefork pool or gunicorn workers, don't write the lines themselves: they
+    send them in batches to the process that configured the logging, which is the only
+    one writing. Batches are sent once they hold `max_bytes`, or at most
+    `max_latency_ms` after their oldest line. Events at or above `flush_level` are sent
+    right away, and are never dropped when the parent can't keep up.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_funnel_")
+
+    enabled: bool = False
+    max_bytes: Annotated[int, Field(gt=0)] = 64 * 1024
+    max_latency_ms: Annotated[float, Field(gt=0)] = 100
+    flush_level: str = "ERROR"
+
+    @field_validator("flush_level")
+    def validate_flush_level(cls, value: str) -> str:
+        return sanitize_log_level(value)
+
+
+class RateLimitSettings(BaseSettings):
+    """
+    Settings for the rate limit of repeated events.
+
+    When enabled, the events are limited per logger, level and message template: each
+    one can be logged `burst` times in a row, then `rate` times per second. The events
+    over the limit are dropped before being processed, and the next one to be logged
+    carries their count as `repeated`, or a summary of them if there is none by the
+    time it could be. At most `max_keys` are tracked, the least recently logged ones
+    being forgotten first, with a summary of their dropped events.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_rate_limit_")
+
+    enabled: bool = False
+    rate: Annotated[float, Field(gt=0)] = 1.0
+    burst: Annotated[int, Field(gt=0)] = 10
+    max_keys: Annotated[int, Field(gt=0)] = 1024
+
+
+class ExceptionSettings(BaseSettings):
+    """
+    Settings for the rendering of the exceptions.
+
+    As `text`, the tracebacks are formatted like `structlog.processors.format_exc_info`
+    does, but from a cache of the last `cache_size` ones, per exception type and code
+    locations: an exception raised again from the same place only costs its message.
+    A `cache_size` of 0 disables the cache.
+
+    As `dict`, for the JSON output only, they are rendered as a structured list of
+    exceptions and frames instead, see `structlog.tracebacks.ExceptionDictTransformer`.
+    Stacks deeper than `max_frames` only keep their outer and inner frames, and the
+    locals of the frames, if shown, are cut at `locals_max_length` items and
+    `locals_max_string` characters.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_exception_")
+
+    format: ExceptionFormat = ExceptionFormat.TEXT
+    cache_size: Annotated[int, Field(ge=0)] = 256
+    max_frames: Annotated[int, Field(gt=1)] = 20
+    show_locals: bool = False
+    locals_max_length: Annotated[int, Field(gt=0)] = 10
+    locals_max_string: Annotated[int, Field(gt=0)] = 80
+
+
+class FlightRecorderSettings(BaseSettings):
+    """
+    Settings for the flight recorder.
+
+    When enabled, the structlog events below the configured level, down to `level`, are
+    not dropped during the requests and tasks handled by the access log middlewares and
+    the Celery signals: they are kept, unrendered, in a buffer of the last `max_events`
+    of each request or task. The buffer is logged if the request or task fails, ends
+    with a 5xx, or takes longer than `flush_slower_than_ms`, and discarded otherwise.
+    Events of the stdlib loggers are not recorded.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_recorder_")
+
+    enabled: bool = False
+    level: str = "DEBUG"
+    max_events: Annotated[int, Field(gt=0)] = 1000
+    flush_slower_than_ms: Annotated[float | None, Field(ge=0)] = None
+
+    @field_validator("level")
+    def validate_level(cls, value: str) -> str:
+        return sanitize_log_level(value)
+
+
+class LevelElevationSettings(BaseSettings):
+    """
+    Settings for the log level raised per request or task.
+
+    When enabled, a request with the `header` header logs the structlog events from the
+    level it names, e.g. `X-Debug-Log: debug`, but not below `level`, without changing
+    the level of the other requests. With a `secret`, the header must be set to
+    `<level>:<secret>` to be honored: it is to be stripped from the outside requests at
+    the edge otherwise. The tasks published during the request run with the same level,
+    through a header of the message. Events of the stdlib loggers keep their level.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_elevation_")
+
+    enabled: bool = False
+    header: str = "X-Debug-Log"
+    level: str = "DEBUG"
+    secret: SecretStr | None = None
+
+    @field_validator("level")
+    def validate_level(cls, value: str) -> str:
+        return sanitize_log_level(value)
+
+
+class LogControlSettings(BaseSettings):
+    """
+    Settings for the control of the log levels at runtime.
+
+    With a `levels_file` and a `signal`, the signal reloads the levels from it: a JSON
+    object of logger names and levels, `root` for the root logger. There is no default
+    signal, the usual ones being taken by the servers, like SIGUSR2 by gunicorn for its
+    binary upgrade.
+
+    With a `socket_path`, the levels can be read and set through a Unix socket, only
+    accessible to the user of the process. `{pid}` in the path is replaced by the id of
+    the process, for each forked process to have its own. See
+    `acidrain_logging.control`.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_control_")
+
+    levels_file: Path | None = None
+    signal: str | None = None
+    socket_path: str | None = None
+
+    @field_validator("signal")
+    def validate_signal(cls, value: str | None) -> str | None:
+        if value is None:
+            return None
+
+        sanitized = value.upper()
+        if not sanitized.startswith("SIG"):
+            sanitized = f"SIG{sanitized}"
+
+        if not hasattr(signal.Signals, sanitized):
+            raise ValueError(value)
+
+        return sanitized
+
+
+class TraceIdSettings(BaseSettings):
+    """
+    Settings for the trace ids generated for requests and published tasks without one.
+
+    `format` is either a UUID, 32 hex digits, or a W3C `traceparent` header value. With
+    `from_datadog`, the id of the active Datadog trace, if any, is used instead of a
+    random one.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_trace_id_")
+
+    format: TraceIdFormat = TraceIdFormat.UUID
+    from_datadog: bool = False
+
+
+class AccessLogSettings(BaseSettings):
+    """
+    Settings for the access logs of the FastAPI and Flask middlewares.
+
+    Rules are keyed on the template of the matched route, like `/users/{user_id}` for
+    FastAPI or `/users/<user_id>` for Flask, not on the raw path. Requests to the routes
+    in `exclude` are not logged, and the others are logged with the probability given
+    by `sample_rates` for their route, or `default_sample_rate`. Requests answered with
+    a status of `always_log_status` or more, or slower than `always_log_slower_than_ms`,
+    are always logged, whatever the route.
+
+    With `aggregate`, the latency of every request is collected per method, route and
+    status, and logged as a summary every `aggregate_interval_s`, in place of the
+    per-request lines: only the requests matching the always-log rules are still
+    logged one by one. To aggregate across the workers of a gunicorn server, see
+    `acidrain_logging.aggregation.SharedRequestStats`.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_access_")
+
+    default_sample_rate: Annotated[float, Field(ge=0, le=1)] = 1.0
+    sample_rates: Annotated[
+        dict[str, Annotated[float, Field(ge=0, le=1)]], Field(default_factory=dict)
+    ]
+    exclude: Annotated[set[str], Field(default_factory=set)]
+    always_log_status: int = 500
+    always_log_slower_than_ms: Annotated[float | None, Field(ge=0)] = None
+    aggregate: bool = False
+    aggregate_interval_s: Annotated[float, Field(gt=0)] = 60.0
+
+
+class TaskLogSettings(BaseSettings):
+    """
+    Settings for the task logs of the Celery signals.
+
+    Rules are keyed on the task name. Runs of the tasks in `sample_every` are logged
+    once every N runs, starting with the first one, and the runs of the others with
+    the probability given by `sample_rates` for their name, or `default_sample_rate`.
+    A sampled run is logged when received and when complete. The runs of the other
+    ones are only logged when complete, and only if they did not succeed or were
+    slower than `always_log_slower_than_ms`.
+
+    With `aggregate`, the final state, duration and start delay of every run are
+    collected per task name, and logged as a summary every `aggregate_interval_s`, in
+    place of the per-task lines: only the runs matching the always-log rules are still
+    logged. Each pool process logs its own summaries.
+
+    The arguments of the tasks are logged within `args_max_depth` levels of nesting,
+    `args_max_length` items per container and about `args_max_bytes` each, see
+    `acidrain_logging.truncation`. `args_deny` lists, per task name, the keyword
+    arguments not to log, `*` hiding all of them, positional ones included. `args_allow`
+    lists, per task name, the only keyword arguments to log: positional ones are then
+    hidden.
+    """
+
+    model_config = SettingsConfigDict(env_prefix="acidrain_log_task_")
+
+    default_sample_rate: Annotated[float, Field(ge=0, le=1)] = 1.0
+    sample_rates: Annotated[
+        dict[str, Annotated[float, Field(ge=0, le=1)]], Field(default_factory=dict)
+    ]
+    sample_every: Annotated[
+        dict[str, Annotated[int, Field(gt=0)]], Field(default_factory=dict)
+    ]
+    always_log_slower_than_ms: Annotated[float | None, Field(ge=0)] = None
+    aggregate: bool = False
+    aggregate_interval_s: Annotated[float, Field(gt=0)] = 60.0
+    args_max_depth: Annotated[int, Field(ge=0)] = 4
+    args_max_length: Annotated[int, Field(gt=0)] = 50
+    args_max_bytes: Annotated[int, Field(gt=0)] = 4096
+    args_allow: Annotated[dict[str, set[str]], Field(default_factory=dict)]
+    args_deny: Annotated[dict[str, set[str]], Field(default_factory=dict)]
+
 
 class LogConfig(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="acidrain_log_", env_ignore_empty=True)
@@ -43,16 +377,30 @@ class LogConfig(BaseSettings):
     timestamp_format: str = "iso"
     timestamp_key: str = "timestamp"
     level_names: dict[str, str] | None = None
+    static_fields: Annotated[dict[str, str], Field(default_factory=dict)]
+    fast_path: bool = False
 
     datadog: DatadogSettings = Field(default_factory=DatadogSettings)
+    queue: QueueSettings = Field(default_factory=QueueSettings)
+    batching: BatchSettings = Field(default_factory=BatchSettings)
+    funnel: FunnelSettings = Field(default_factory=FunnelSettings)
+    rate_limit: RateLimitSettings = Field(default_factory=RateLimitSettings)
+    exceptions: ExceptionSettings = Field(default_factory=ExceptionSettings)
+    flight_recorder: FlightRecorderSettings = Field(
+        default_factory=FlightRecorderSettings
+    )
+    level_elevation: LevelElevationSettings = Field(
+        default_factory=LevelElevationSettings
+    )
+    control: LogControlSettings = Field(default_factory=LogControlSettings)
+    access_log: AccessLogSettings = Field(default_factory=AccessLogSettings)
+    task_log: TaskLogSettings = Field(default_factory=TaskLogSettings)
+    trace_id: TraceIdSettings = Field(default_factory=TraceIdSettings)
 
     @field_validator("level")
     def validate_log_level(cls, value: str) -> str:
-        sanitized = value.upper()
+        return sanitize_log_level(value)
 
-        # If there is a level with that name, getLevelName returns the corresponding int
-        # value. If we don't get an int, the level doesn't exist.
-        if sanitized not in logging.getLevelNamesMapping():
-            raise InvalidLogLevelError(value)
-
-        return sanitized
+    def get_static_fields(self) -> dict[str, str]:
+        """Fields added to every event: the Datadog ones, then `static_fields`."""
+        return {**self.datadog.get_static_fields(), **self.static_fields}
@@ -0,0 +1,167 @@
+"""
+Logging context, bound per thread or asyncio task.
+
+Works like `structlog.contextvars`, but the whole context is kept in a single
+`ContextVar`, as an immutable `BoundContext`. Each bind creates a new one, so its JSON
+serialization can be cached and spliced as is in every line logged until the next bind
+or reset. Bound values must therefore never be mutated in place: bind a new value
+instead.
+
+The bound values are mirrored in `structlog.contextvars`, for its `get_contextvars` to
+return them too. `merge_structlog_contextvars` merges the values bound there directly,
+leaving the mirrored ones to `merge_contextvars`. Both run first, like structlog's own
+`merge_contextvars`, and their values come first in the event dict, the bound ones
+before the others: the JSON renderer splices them at the same place when they weren't
+merged.
+"""
+
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from logging import Logger
+from typing import Any
+
+import structlog
+from structlog.typing import EventDict
+
+
+class BoundContext:
+    """
+    Immutable snapshot of the bound values.
+
+    `fragment` is left to the renderer, to cache the serialized values.
+    """
+
+    __slots__ = ("fragment", "values")
+
+    def __init__(self, values: dict[str, Any]) -> None:
+        self.values = values
+        self.fragment: bytes | None = None
+
+
+_EMPTY_CONTEXT = BoundContext({})
+
+_MISSING = object()
+
+_context: ContextVar[BoundContext] = ContextVar(
+    "acidrain_logging_context", default=_EMPTY_CONTEXT
+)
+
+
+def get_bound_context() -> BoundContext:
+    return _context.get()
+
+
+def get_contextvars() -> dict[str, Any]:
+    return _context.get().values.copy()
+
+
+def bind_contextvars(**kwargs: Any) -> Token[BoundContext]:  # noqa: ANN401
+    """
+    Bind `kwargs` to the current context.
+
+    Returns a token that can be passed to `reset_contextvars`, to go back to the
+    context as it was before this call.
+    """
+    values = {**_context.get().values, **kwargs}
+    token = _context.set(BoundContext(values))
+    structlog.contextvars.bind_contextvars(**kwargs)
+
+    return token
+
+
+def unbind_contextvars(*keys: str) -> None:
+    """Unbind `keys`, including the ones bound with `structlog.contextvars`."""
+    values = _context.get().values
+    if not values.keys().isdisjoint(keys):
+        _context.set(BoundContext({k: v for k, v in values.items() if k not in keys}))
+
+    structlog.contextvars.unbind_contextvars(*keys)
+
+
+def reset_contextvars(token: Token[BoundContext]) -> None:
+    previous = _context.get().values
+    _context.reset(token)
+    values = _context.get().values
+
+    # Mirrored in structlog.contextvars, from the values before and after the reset
+    removed = previous.keys() - values.keys()
+    if removed:
+        structlog.contextvars.unbind_contextvars(*removed)
+
+    changed = {k: v for k, v in values.items() if previous.get(k, _MISSING) is not v}
+    if changed:
+        structlog.contextvars.bind_contextvars(**changed)
+
+
+def clear_contextvars() -> None:
+    """Clear the context, including the values bound with `structlog.contextvars`."""
+    _context.set(_EMPTY_CONTEXT)
+    structlog.contextvars.clear_contextvars()
+
+
+@contextmanager
+def bound_contextvars(**kwargs: Any) -> Generator[None, None, None]:  # noqa: ANN401
+    token = bind_contextvars(**kwargs)
+    try:
+        yield
+    finally:
+        reset_contextvars(token)
+
+
+def merge_contextvars(
+    _logger: Logger, _method_name: str, event_dict: EventDict
+) -> EventDict:
+    """
+    Add the bound values to the event dict, like `structlog.contextvars`.
+
+    The event's own values take precedence. The bound values come first, in the
+    order they were bound.
+    """
+    values = _context.get().values
+    if values:
+        return {**values, **event_dict}
+
+    return event_dict
+
+
+def merge_structlog_contextvars(
+    _logger: Logger, _method_name: str, event_dict: EventDict
+) -> EventDict:
+    """
+    Add the values bound with `structlog.contextvars`, like its `merge_contextvars`.
+
+    The values mirrored from this module's context are left to `merge_contextvars`:
+    only the ones bound there directly, or changed since, are merged, first like the
+    bound values. The variables are read directly, without copying the whole context
+    like `get_contextvars`.
+    """
+    values = _context.get().values
+    merged = {
+        key: value
+        for key, var in _get_structlog_vars()
+        if (value := var.get()) is not Ellipsis
+        and values.get(key, _MISSING) is not value
+    }
+    if merged:
+        return {**merged, **event_dict}
+
+    return event_dict
+
+
+# The variables of `structlog.contextvars`, by key. structlog only ever adds new ones.
+# Not part of its API: the supported versions are bounded in the project's metadata.
+_structlog_vars: tuple[tuple[str, ContextVar[Any]], ...] = ()
+
+
+def _get_structlog_vars() -> tuple[tuple[str, ContextVar[Any]], ...]:
+    global _structlog_vars  # noqa: PLW0603
+
+    context_vars = structlog.contextvars._CONTEXT_VARS  # noqa: SLF001
+    if len(context_vars) != len(_structlog_vars):
+        prefix_len = structlog.contextvars.STRUCTLOG_KEY_PREFIX_LEN
+        _structlog_vars = tuple(
+            (key[prefix_len:], var) for key, var in tuple(context_vars.items())
+        )
+
+    return _structlog_vars
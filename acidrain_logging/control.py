@@ -0,0 +1,322 @@
+"""
+Control of the log levels at runtime, without a restart.
+
+`set_log_levels` changes the levels in place. Besides being called directly, it is
+reachable, see `LogControlSettings`:
+- by a Unix signal, reloading the levels from a JSON file;
+- through a Unix socket, taking a JSON object of levels to set per connection, empty to
+  only read them, and answering with the levels after the change, or an error. From a
+  shell: `python -m acidrain_logging.control <socket> [<logger>=<level> ...]`;
+- through an admin route, see `acidrain_logging.fastapi.admin` and
+  `acidrain_logging.flask.admin`.
+
+`configure_logger` sets up the signal and the socket from the `control` settings.
+"""
+
+import argparse
+import atexit
+import contextlib
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from types import FrameType
+from typing import Any
+
+import orjson
+import structlog
+from structlog.stdlib import BoundLogger
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging._fork import register_after_fork
+from acidrain_logging.config import (
+    InvalidLogLevelError,
+    LogConfig,
+    sanitize_log_level,
+)
+from acidrain_logging.levels import get_bound_logger_methods
+
+log: BoundLogger = structlog.get_logger()
+
+_MAX_REQUEST_BYTES = 65536
+_ACCEPT_TIMEOUT_S = 1.0
+_CLIENT_TIMEOUT_S = 1.0
+
+
+# Config of the last `configure_logger` call, with the levels set since
+_config: LogConfig | None = None
+
+# Class of the bound loggers of the fast path, if enabled. Its methods are replaced in
+# place when the levels change: the loggers cached on first use by structlog keep it.
+_fast_path_logger: type[FilteringBoundLogger] | None = None
+
+
+def get_log_levels() -> dict[str, str]:
+    """Return the level of the root logger, as `root`, and of the configured loggers."""
+    names = _config.logger_levels if _config is not None else ()
+
+    return {
+        "root": logging.getLevelName(logging.getLogger().level),
+        **{name: logging.getLevelName(logging.getLogger(name).level) for name in names},
+    }
+
+
+def set_log_levels(levels: Mapping[str, str]) -> dict[str, str]:
+    """
+    Change the level of loggers in place, `root` or an empty name for the root logger.
+
+    The levels are all checked before any is set. `Logger.setLevel` clears the
+    `isEnabledFor` caches of the stdlib loggers, and the bound loggers of the fast path,
+    cached or not, get the methods of the new levels. Return the levels after the
+    change, see `get_log_levels`.
+    """
+    global _config  # noqa: PLW0603
+
+    levels = {
+        "" if name == "root" else name: sanitize_log_level(level)
+        for name, level in levels.items()
+    }
+
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    if _config is not None:
+        _config = _config.model_copy(
+            update={
+                "level": levels.pop("", _config.level),
+                "logger_levels": {**_config.logger_levels, **levels},
+            }
+        )
+
+        if _fast_path_logger is not None:
+            for name, method in get_bound_logger_methods(_config).items():
+                setattr(_fast_path_logger, name, method)
+
+    return get_log_levels()
+
+
+def apply_log_levels(levels: Any, source: str) -> dict[str, str]:  # noqa: ANN401
+    """
+    Set the levels of a decoded JSON object, see `set_log_levels`.
+
+    Raise `ValueError` if it is not an object of names and levels.
+    """
+    if not isinstance(levels, dict) or not all(
+        isinstance(level, str) for level in levels.values()
+    ):
+        msg = "Expected a JSON object of logger names and levels"
+        raise ValueError(msg)
+
+    result = set_log_levels(levels)
+    if levels:
+        log.warning("Log levels changed", log_levels=levels, source=source)
+
+    return result
+
+
+def _reload_levels_file(path: Path) -> None:
+    try:
+        apply_log_levels(orjson.loads(path.read_bytes()), source="signal")
+    except Exception:
+        log.exception("Failed to reload the log levels", path=str(path))
+
+
+def install_signal_handler(path: Path, signum: signal.Signals) -> None:
+    """
+    Reload the levels from the JSON file at `path` on `signum`.
+
+    They are reloaded from a thread: the handler runs in the middle of whatever the
+    main thread was doing, possibly logging.
+    """
+
+    def _handler(_signum: int, _frame: FrameType | None) -> None:
+        threading.Thread(
+            target=_reload_levels_file,
+            args=(path,),
+            name="acidrain-log-control",
+            daemon=True,
+        ).start()
+
+    signal.signal(signum, _handler)
+
+
+class LevelControlServer:
+    """
+    Serve the log levels on a Unix socket, from a background thread.
+
+    `{pid}` in `path` is replaced by the id of the process. Forked processes start a
+    server of their own if it's there, and don't serve the levels otherwise.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._closed = False
+        self._start()
+
+        atexit.register(self.close)
+        register_after_fork(self)
+
+    @property
+    def socket_path(self) -> str:
+        return self._socket_path
+
+    def close(self) -> None:
+        if self._closed:
+            return
+
+        self._closed = True
+        # Wakes up the thread, blocked in accept
+        with contextlib.suppress(OSError):
+            self._socket.shutdown(socket.SHUT_RDWR)
+        self._thread.join()
+        self._socket.close()
+
+        with contextlib.suppress(FileNotFoundError):
+            Path(self._socket_path).unlink()
+
+        atexit.unregister(self.close)
+
+    def _start(self) -> None:
+        self._socket_path = self.path.format(pid=os.getpid())
+
+        # Left by a previous process
+        with contextlib.suppress(FileNotFoundError):
+            Path(self._socket_path).unlink()
+
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only accessible to the user of the process from the start, not after a chmod
+        umask = os.umask(0o177)
+        try:
+            self._socket.bind(self._socket_path)
+        finally:
+            os.umask(umask)
+        self._socket.listen()
+        self._socket.settimeout(_ACCEPT_TIMEOUT_S)
+
+        self._thread = threading.Thread(
+            target=self._run, name="acidrain-log-control", daemon=True
+        )
+        self._thread.start()
+
+    def _reset_after_fork(self) -> None:
+        # The socket file is the parent's
+        self._socket.close()
+
+        if "{pid}" not in self.path:
+            self._closed = True
+            atexit.unregister(self.close)
+        elif not self._closed:
+            self._start()
+
+    def _run(self) -> None:
+        while not self._closed:
+            try:
+                conn, _ = self._socket.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+
+            with conn, contextlib.suppress(OSError):
+                conn.settimeout(_CLIENT_TIMEOUT_S)
+                conn.sendall(_handle_request(_read_request(conn)))
+
+
+def _read_request(conn: socket.socket) -> bytes:
+    """Read up to a new line, or until the client shuts down its side."""
+    data = b""
+    while b"\n" not in data and len(data) < _MAX_REQUEST_BYTES:
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+
+    return data
+
+
+def _handle_request(request: bytes) -> bytes:
+    try:
+        levels = orjson.loads(request) if request.strip() else {}
+        response: dict[str, Any] = {"levels": apply_log_levels(levels, source="socket")}
+    except (ValueError, InvalidLogLevelError) as e:
+        response = {"error": str(e)}
+
+    return orjson.dumps(response) + b"\n"
+
+
+def request_log_levels(
+    path: str, levels: dict[str, str] | None = None
+) -> dict[str, Any]:
+    """Set the levels through the socket at `path`, and return its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(_CLIENT_TIMEOUT_S * 5)
+        conn.connect(path)
+        conn.sendall(orjson.dumps(levels or {}) + b"\n")
+        conn.shutdown(socket.SHUT_WR)
+
+        response: dict[str, Any] = orjson.loads(_read_request(conn))
+        return response
+
+
+_server: LevelControlServer | None = None
+
+
+def configure_log_control(
+    config: LogConfig, fast_path_logger: type[FilteringBoundLogger] | None
+) -> None:
+    """
+    Set up the signal and the socket, replacing the ones of a previous call.
+
+    `fast_path_logger` is the class of the bound loggers of the fast path, if enabled.
+    """
+    global _server, _config, _fast_path_logger  # noqa: PLW0603
+    _config = config
+    _fast_path_logger = fast_path_logger
+    settings = config.control
+
+    if _server is not None:
+        _server.close()
+        _server = None
+
+    if settings.socket_path is not None:
+        _server = LevelControlServer(settings.socket_path)
+
+    if settings.levels_file is not None and settings.signal is not None:
+        # Signal handlers can only be installed from the main thread
+        if threading.current_thread() is threading.main_thread():
+            install_signal_handler(
+                settings.levels_file, signal.Signals[settings.signal]
+            )
+        else:
+            log.warning(
+                "Log levels signal not installed outside of the main thread",
+                signal=settings.signal,
+            )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m acidrain_logging.control",
+        description="Read or set the log levels of a process, through its socket.",
+    )
+    parser.add_argument("socket", help="path of the socket of the process")
+    parser.add_argument(
+        "levels", nargs="*", metavar="LOGGER=LEVEL", help="`root` for the root logger"
+    )
+    args = parser.parse_args(argv)
+
+    levels = dict(level.split("=", 1) for level in args.levels)
+    response = request_log_levels(args.socket, levels)
+    sys.stdout.write(orjson.dumps(response, option=orjson.OPT_INDENT_2).decode())
+    sys.stdout.write("\n")
+
+    if "error" in response:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
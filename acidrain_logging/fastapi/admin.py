@@ -0,0 +1,33 @@
+"""
+Admin route to read and set the log levels at runtime, see `acidrain_logging.control`.
+
+It is not protected in any way: it's up to the app to only expose it to its admins,
+for instance with `dependencies`.
+"""
+
+from collections.abc import Sequence
+
+from fastapi import APIRouter, HTTPException, params
+
+from acidrain_logging.config import InvalidLogLevelError
+from acidrain_logging.control import apply_log_levels, get_log_levels
+
+
+def create_log_levels_router(
+    path: str = "/log-levels", *, dependencies: Sequence[params.Depends] | None = None
+) -> APIRouter:
+    """Return a router reading the levels on GET, and setting some of them on PUT."""
+    router = APIRouter(dependencies=dependencies)
+
+    @router.get(path)
+    def _get_log_levels() -> dict[str, str]:
+        return get_log_levels()
+
+    @router.put(path)
+    def _set_log_levels(levels: dict[str, str]) -> dict[str, str]:
+        try:
+            return apply_log_levels(levels, source="admin route")
+        except InvalidLogLevelError as e:
+            raise HTTPException(status_code=422, detail=str(e)) from e
+
+    return router
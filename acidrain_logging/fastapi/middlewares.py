@@ -1,19 +1,50 @@
 import time
+import warnings
 from typing import Any
-from uuid import uuid4
 
 import structlog
 from fastapi import FastAPI
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
 from starlette.responses import Response
-from structlog.contextvars import bind_contextvars, clear_contextvars
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from structlog.stdlib import BoundLogger
 
+from acidrain_logging import LogConfig
+from acidrain_logging.access_log import ResponseData, get_elapsed_ms
+from acidrain_logging.aggregation import create_aggregator
+from acidrain_logging.config import AccessLogSettings
+from acidrain_logging.context import bind_contextvars, clear_contextvars
+from acidrain_logging.levels import (
+    get_level_header,
+    parse_level_header,
+    set_elevated_level,
+)
+from acidrain_logging.recorder import FlightRecorder, start_recording, stop_recording
+from acidrain_logging.sampling import AccessLogSampler
+from acidrain_logging.trace_ids import new_trace_id
+
 log: BoundLogger = structlog.get_logger()
 
 
-class ContextResetMiddleware(BaseHTTPMiddleware):
+class BaseMiddleware(BaseHTTPMiddleware):
+    """
+    Deprecated, with its subclasses.
+
+    The `LogMiddleware` installed by `add_log_middlewares` resets the context, binds
+    the trace id and logs the requests itself.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        warnings.warn(
+            f"{type(self).__name__} is deprecated, use add_log_middlewares instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        super().__init__(app)
+
+
+class ContextResetMiddleware(BaseMiddleware):
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
@@ -22,17 +53,17 @@ class ContextResetMiddleware(BaseHTTPMiddleware):
         return await call_next(request)
 
 
-class TraceIdMiddleware(BaseHTTPMiddleware):
+class TraceIdMiddleware(BaseMiddleware):
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
-        trace_id = request.headers.get("X-Trace-Id") or str(uuid4())
+        trace_id = request.headers.get("X-Trace-Id") or new_trace_id()
         bind_contextvars(trace_id=trace_id)
 
         return await call_next(request)
 
 
-class LogRequestMiddleware(BaseHTTPMiddleware):
+class LogRequestMiddleware(BaseMiddleware):
     async def dispatch(
         self, request: Request, call_next: RequestResponseEndpoint
     ) -> Response:
@@ -51,8 +82,128 @@ class LogRequestMiddleware(BaseHTTPMiddleware):
         return response
 
 
+class LogMiddleware:
+    """
+    Pure ASGI middleware doing the work of the three middlewares above, in one layer.
+
+    For each HTTP request, the context is reset, the trace id is bound and the request
+    is logged once the last chunk of the response body has been sent. Unlike
+    `BaseHTTPMiddleware`, there is no task nor stream wrapping the app: messages are
+    passed through as is, only the status code, the time to the headers and the size
+    of the body are picked up on the way.
+
+    Which requests are logged, or aggregated, is decided by the `access_log` settings,
+    before building anything for the log. With the flight recorder enabled, the
+    verbose events of the request are logged before it if it failed, see
+    `acidrain_logging.recorder`. With the level elevation enabled, the level of the
+    request is raised from its header, see `acidrain_logging.levels`.
+    """
+
+    def __init__(
+        self, app: ASGIApp, access_log: AccessLogSettings | None = None
+    ) -> None:
+        access_log = access_log or AccessLogSettings()
+
+        self.app = app
+        self.sampler = AccessLogSampler(access_log)
+        self.aggregator = create_aggregator(access_log)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        clear_contextvars()
+        bind_contextvars(trace_id=_get_header(scope, b"x-trace-id") or new_trace_id())
+        level_header = get_level_header()
+        if level_header is not None:
+            set_elevated_level(
+                parse_level_header(_get_header(scope, level_header.lower().encode()))
+            )
+        recorder = start_recording()
+
+        response = ResponseData(start_time)
+
+        async def _send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                response.status_code = message["status"]
+                response.headers_time = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                response.bytes_sent += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    await send(message)
+                    self._log_request(scope, response, recorder)
+                    return
+
+            await send(message)
+
+        failed = False
+        try:
+            await self.app(scope, receive, _send)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            if not response.logged:
+                # The app failed, or the client went away, before the end of the body
+                self._log_request(scope, response, recorder, failed=failed)
+
+    def _log_request(
+        self,
+        scope: Scope,
+        response: ResponseData,
+        recorder: FlightRecorder | None,
+        *,
+        failed: bool = False,
+    ) -> None:
+        response.logged = True
+        elapsed_ms = get_elapsed_ms(response.start_time, time.perf_counter())
+
+        stop_recording(
+            recorder,
+            failed=failed or response.status_code >= 500,  # noqa: PLR2004
+            elapsed_ms=elapsed_ms,
+        )
+
+        # The route is only there if one matched
+        route = getattr(scope.get("route"), "path", None)
+
+        if self.aggregator is not None:
+            self.aggregator.record(
+                scope["method"], route, response.status_code, elapsed_ms
+            )
+
+        if not self.sampler.should_log(route, response.status_code, elapsed_ms):
+            return
+
+        response_data = response.to_dict(elapsed_ms)
+
+        # The router has added the path params to the scope by now.
+        request = Request(scope)
+        msg = f"{request.method} {request.url.path} {response.status_code}"
+
+        log.info(msg, http=_get_request_data(request, response_data))
+
+
+def _get_header(scope: Scope, header: bytes) -> str | None:
+    for name, value in scope["headers"]:
+        if name == header:
+            return value.decode("latin-1") or None
+
+    return None
+
+
 def get_request_data(
     request: Request, response: Response, elapsed_ms: float
+) -> dict[str, Any]:
+    response_data = {"elapsed": elapsed_ms, "status_code": response.status_code}
+    return _get_request_data(request, response_data)
+
+
+def _get_request_data(
+    request: Request, response_data: dict[str, Any]
 ) -> dict[str, Any]:
     return {
         "method": request.method,
@@ -69,14 +220,11 @@ def get_request_data(
             "path": request.url.path,
             "scheme": request.url.scheme,
         },
-        "response": {
-            "elapsed": elapsed_ms,
-            "status_code": response.status_code,
-        },
+        "response": response_data,
     }
 
 
-def add_log_middlewares(app: FastAPI) -> None:
-    app.add_middleware(LogRequestMiddleware)
-    app.add_middleware(TraceIdMiddleware)
-    app.add_middleware(ContextResetMiddleware)
+def add_log_middlewares(app: FastAPI, log_config: LogConfig | None = None) -> None:
+    log_config = log_config or LogConfig()
+
+    app.add_middleware(LogMiddleware, access_log=log_config.access_log)
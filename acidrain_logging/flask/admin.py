@@ -0,0 +1,33 @@
+"""
+Admin route to read and set the log levels at runtime, see `acidrain_logging.control`.
+
+It is not protected in any way: it's up to the app to only expose it to its admins,
+for instance with a `before_request` of the blueprint.
+"""
+
+from typing import Any
+
+from flask import Blueprint, request
+
+from acidrain_logging.config import InvalidLogLevelError
+from acidrain_logging.control import apply_log_levels, get_log_levels
+
+
+def create_log_levels_blueprint(
+    path: str = "/log-levels", name: str = "acidrain_log_levels"
+) -> Blueprint:
+    """Return a blueprint reading the levels on GET, and setting some of them on PUT."""
+    blueprint = Blueprint(name, __name__)
+
+    @blueprint.get(path)
+    def _get_log_levels() -> dict[str, str]:
+        return get_log_levels()
+
+    @blueprint.put(path)
+    def _set_log_levels() -> dict[str, str] | tuple[dict[str, Any], int]:
+        try:
+            return apply_log_levels(request.get_json(), source="admin route")
+        except (ValueError, InvalidLogLevelError) as e:
+            return {"error": str(e)}, 422
+
+    return blueprint
@@ -1,22 +1,36 @@
-import time
+import warnings
 from collections.abc import Iterable
-from typing import TYPE_CHECKING, Any
-from uuid import uuid4
+from typing import TYPE_CHECKING
 
-import structlog
-from flask import Flask, Response, g, request
-from structlog.contextvars import bind_contextvars, clear_contextvars
-from structlog.stdlib import BoundLogger
-from werkzeug.wrappers import Request
+from flask import Flask, request
 
-log: BoundLogger = structlog.get_logger()
+from acidrain_logging import LogConfig
+from acidrain_logging.context import bind_contextvars, clear_contextvars
+from acidrain_logging.trace_ids import new_trace_id
+from acidrain_logging.wsgi.middlewares import (
+    PATH_PARAMS_ENVIRON_KEY,
+    ROUTE_ENVIRON_KEY,
+    LogMiddleware,
+)
 
 if TYPE_CHECKING:
     from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
 
 
 class BaseMiddleware:
+    """
+    Deprecated, with its subclasses.
+
+    The `LogMiddleware` installed by `add_log_middlewares` resets the context and binds
+    the trace id itself.
+    """
+
     def __init__(self, app: "WSGIApplication") -> None:
+        warnings.warn(
+            f"{type(self).__name__} is deprecated, use add_log_middlewares instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         self.app = app
 
 
@@ -32,60 +46,24 @@ class TraceIdMiddleware(BaseMiddleware):
     def __call__(
         self, environ: "WSGIEnvironment", start_response: "StartResponse"
     ) -> Iterable[bytes]:
-        req = Request(environ)
-
-        trace_id = req.headers.get("X-Trace-Id") or str(uuid4())
+        trace_id = environ.get("HTTP_X_TRACE_ID") or new_trace_id()
         bind_contextvars(trace_id=trace_id)
 
         return self.app(environ, start_response)
 
 
-def _inject_start_time() -> None:
-    g.start_time = time.perf_counter()
-
-
-def _log_request(response: Response) -> Response:
-    msg = f"{request.method} {request.path} {response.status_code}"
-
-    host = request.host
-    if ":" in host:  # pragma: no cover: tested through module test
-        host = host.split(":")[0]
-
-    request_data: dict[str, Any] = {
-        "method": request.method,
-        "client": {
-            "remote_ip": request.remote_addr,
-            "user_agent": request.headers.get("user-agent"),
-        },
-        "request": {
-            "path_params": request.view_args,
-            "query_params": dict(request.args),
-        },
-        "url": {
-            "host": host,
-            "path": request.path,
-            "scheme": request.scheme,
-        },
-        "response": {
-            "status_code": response.status_code,
-        },
-    }
-
-    start_time = g.get("start_time")
-    if start_time:
-        request_data["response"]["elapsed"] = round(
-            (time.perf_counter() - start_time) * 1000, 3
-        )
-
-    log.info(msg, http=request_data)
-
-    return response
+def _store_route() -> None:
+    """Hand the matched route over to the `LogMiddleware`, for the access log."""
+    if request.url_rule is not None:
+        request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+        request.environ[PATH_PARAMS_ENVIRON_KEY] = request.view_args
 
 
-def add_log_middlewares(app: Flask) -> None:
-    for cls in reversed((ResetContextMiddleware, TraceIdMiddleware)):
-        # Types are fine and assigning to a method is what we _must_ do here.
-        app.wsgi_app = cls(app.wsgi_app)  # type: ignore[assignment, method-assign]
+def add_log_middlewares(app: Flask, log_config: LogConfig | None = None) -> None:
+    log_config = log_config or LogConfig()
 
-    app.before_request(_inject_start_time)
-    app.after_request(_log_request)
+    # Types are fine and assigning to a method is what we _must_ do here.
+    app.wsgi_app = LogMiddleware(  # type: ignore[method-assign]
+        app.wsgi_app, log_config.access_log
+    )
+    app.before_request(_store_route)
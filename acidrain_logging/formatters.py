@@ -0,0 +1,68 @@
+import logging
+from typing import Any, cast
+
+from structlog.stdlib import ProcessorFormatter
+from structlog.typing import EventDict, WrappedLogger
+
+
+class BytesProcessorFormatter(ProcessorFormatter):
+    """
+    `ProcessorFormatter` for renderers that produce complete lines, as bytes.
+
+    The event dict goes through the same steps as with `ProcessorFormatter.format`, but
+    the output of the last processor is returned untouched by `format_bytes`, instead of
+    being turned into a `str` and handed to `logging.Formatter.format`.
+
+    `format` is still available for handlers that need a `str`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return self.format_bytes(record).decode().removesuffix("\n")
+
+    def format_bytes(self, record: logging.LogRecord) -> bytes:
+        # Same as ProcessorFormatter.format: work on a copy, to let other handlers and
+        # formatters process the original record.
+        record = logging.makeLogRecord(record.__dict__)
+
+        logger, meth_name, ed = self._get_event_dict(record)
+
+        for proc in self.processors:
+            ed = proc(logger, meth_name, ed)  # type: ignore[assignment]
+
+        return cast("bytes", ed)
+
+    def _get_event_dict(
+        self, record: logging.LogRecord
+    ) -> tuple[WrappedLogger, str, EventDict]:
+        logger: Any = getattr(record, "_logger", None)
+        meth_name: str | None = getattr(record, "_name", None)
+
+        if logger is not None and meth_name is not None:
+            # Both attached by wrap_for_formatter
+            structlog_ed = cast("dict[str, Any]", record.msg).copy()
+            structlog_ed["_record"] = record
+            structlog_ed["_from_structlog"] = True
+
+            return self.logger or logger, meth_name, structlog_ed
+
+        meth_name = record.levelname.lower()
+        ed: EventDict = {
+            "event": record.getMessage() if self.use_get_message else str(record.msg),
+            "_record": record,
+            "_from_structlog": False,
+        }
+
+        if self.pass_foreign_args:
+            ed["positional_args"] = record.args
+
+        record.args = ()
+
+        if record.exc_info:
+            ed["exc_info"] = record.exc_info
+        if record.stack_info:
+            ed["stack_info"] = record.stack_info
+
+        for proc in self.foreign_pre_chain or ():
+            ed = cast("EventDict", proc(self.logger, meth_name, ed))
+
+        return self.logger, meth_name, ed
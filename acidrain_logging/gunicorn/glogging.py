@@ -0,0 +1,79 @@
+import logging
+from datetime import timedelta
+from typing import Any
+
+import structlog
+from gunicorn import glogging  # type: ignore[import-untyped]
+from gunicorn.config import Config  # type: ignore[import-untyped]
+from gunicorn.http.message import Request  # type: ignore[import-untyped]
+from gunicorn.http.wsgi import Response  # type: ignore[import-untyped]
+from structlog.stdlib import BoundLogger
+
+from acidrain_logging.logging import configure_logger, is_configured
+from acidrain_logging.wsgi.middlewares import get_path, get_request_data
+
+log: BoundLogger = structlog.get_logger("gunicorn.access")
+
+
+class Logger(glogging.Logger):  # type: ignore[misc]
+    """
+    Gunicorn logger class, routing gunicorn's logs through our processors and renderer.
+
+        gunicorn --logger-class acidrain_logging.gunicorn.glogging.Logger ...
+
+    The logging is configured once, in the master, with the `LogConfig` from the
+    environment, unless it already is, for instance from the gunicorn configuration
+    file. Workers inherit it when forked: the sinks re-initialize themselves in the
+    child, see `acidrain_logging.sinks.Sink`. With the funnel mode enabled
+    (`ACIDRAIN_LOG_FUNNEL_ENABLED`), workers send their lines to the master, which is
+    the only one writing them.
+
+    Workers can configure the logging again, like an app calling `configure_logger`
+    when imported. The same configuration as the master's is kept as is. Another one
+    replaces it, and its lines only go through the master if it has the funnel mode
+    enabled too.
+
+    gunicorn's error log propagates to our handler, at gunicorn's `loglevel`. Its
+    access log is left to the access log middlewares, unless `accesslog` is set: the
+    requests are then logged like the middlewares log them, without the route.
+    """
+
+    def setup(self, cfg: Config) -> None:
+        self.cfg = cfg
+        self.loglevel = self.LOG_LEVELS.get(cfg.loglevel.lower(), logging.INFO)
+        self.error_log.setLevel(self.loglevel)
+        self.access_log.setLevel(logging.INFO)
+
+        for logger in (self.error_log, self.access_log):
+            logger.handlers.clear()
+            logger.propagate = True
+
+        if not is_configured():
+            configure_logger()
+
+    def access(
+        self,
+        resp: Response,
+        _req: Request,
+        environ: dict[str, Any],
+        request_time: timedelta,
+    ) -> None:
+        if not self.access_log_enabled:
+            return
+
+        status = resp.status
+        if isinstance(status, str):
+            status = status.split(None, 1)[0]
+        status_code = int(status)
+
+        method = environ["REQUEST_METHOD"]
+        path = get_path(environ)
+        response_data = {
+            "elapsed": round(request_time.total_seconds() * 1000, 3),
+            "bytes_sent": resp.sent,
+            "status_code": status_code,
+        }
+
+        msg = f"{method} {path} {status_code}"
+
+        log.info(msg, http=get_request_data(environ, path, response_data))
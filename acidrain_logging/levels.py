@@ -0,0 +1,240 @@
+"""
+Log level raised for a single request or task, without touching the global levels.
+
+The access log middlewares read the level from a trusted header, see
+`LevelElevationSettings`, and `set_elevated_level` makes it the level of the current
+context: `filter_by_level_or_elevated` then lets through the structlog events from that
+level, whatever the level of their logger.
+
+The global level check of the fast path stays as it is: only the methods between the
+configured levels and the most verbose level a request can ask for check the context,
+see `make_elevating_bound_logger`. Everything else is a no-op as before.
+"""
+
+import hmac
+import logging
+from collections.abc import Callable
+from contextvars import ContextVar, Token
+from typing import Any
+
+import structlog
+from structlog import BoundLoggerBase, DropEvent
+from structlog.stdlib import ProcessorFormatter
+from structlog.typing import EventDict, FilteringBoundLogger, WrappedLogger
+
+from acidrain_logging.config import LevelElevationSettings, LogConfig
+
+# Levels of structlog's method names, including the "notset" of `log(NOTSET, ...)`
+METHOD_LEVELS = {**structlog.processors.NAME_TO_LEVEL, "fatal": logging.CRITICAL}
+
+_elevated_level: ContextVar[int | None] = ContextVar(
+    "acidrain_logging_elevated_level", default=None
+)
+
+_settings = LevelElevationSettings()
+_elevation_level = logging.DEBUG
+
+
+def configure_level_elevation(settings: LevelElevationSettings) -> None:
+    global _settings, _elevation_level  # noqa: PLW0603
+    _settings = settings
+    _elevation_level = logging.getLevelNamesMapping()[settings.level]
+
+
+def get_level_header() -> str | None:
+    """Return the header raising the level of a request, or None if disabled."""
+    return _settings.header if _settings.enabled else None
+
+
+def get_allowed_level(name: str) -> int | None:
+    """
+    Return the level to raise a context to from its name, if elevation is enabled.
+
+    Levels more verbose than the configured one are capped to it, unknown ones ignored.
+    """
+    if not _settings.enabled:
+        return None
+
+    level = logging.getLevelNamesMapping().get(name.strip().upper())
+    if level is None:
+        return None
+
+    return max(level, _elevation_level)
+
+
+def parse_level_header(value: str | None) -> int | None:
+    """Return the level requested by the header of a request, if it is honored."""
+    if not value:
+        return None
+
+    if _settings.secret is not None:
+        name, _, secret = value.partition(":")
+        if not hmac.compare_digest(
+            secret.encode(), _settings.secret.get_secret_value().encode()
+        ):
+            return None
+        value = name
+
+    return get_allowed_level(value)
+
+
+def set_elevated_level(level: int | None) -> Token[int | None]:
+    """Set the level of the current context, None to go back to the global levels."""
+    return _elevated_level.set(level)
+
+
+def reset_elevated_level(token: Token[int | None]) -> None:
+    _elevated_level.reset(token)
+
+
+def get_elevated_level() -> int | None:
+    return _elevated_level.get()
+
+
+def is_elevated(level: int) -> bool:
+    """Return whether the events of `level` are enabled by the current context."""
+    elevated = _elevated_level.get()
+    return elevated is not None and level >= elevated
+
+
+def is_enabled_for(logger: WrappedLogger, level: int) -> bool:
+    """
+    Return whether a stdlib logger is enabled for `level`, or the current context.
+
+    Like `filter_by_level` for the logger, `logging.disable` included.
+    """
+    if logger.isEnabledFor(level):
+        return True
+
+    return (
+        not logger.disabled
+        and level > logging.root.manager.disable
+        and is_elevated(level)
+    )
+
+
+def emit_record(logger: WrappedLogger, method_name: str, event_dict: EventDict) -> None:
+    """
+    Hand an event to the handlers of a stdlib logger, like structlog does.
+
+    The level of the logger is bypassed, the event being below it by definition.
+    """
+    args, kwargs = ProcessorFormatter.wrap_for_formatter(
+        logger, method_name, event_dict
+    )
+    record = logger.makeRecord(
+        logger.name,
+        METHOD_LEVELS[method_name],
+        "(unknown file)",
+        0,
+        args[0],
+        (),
+        None,
+        extra=kwargs["extra"],
+    )
+    logger.handle(record)
+
+
+def filter_by_level_or_elevated(
+    logger: WrappedLogger, method_name: str, event_dict: EventDict
+) -> EventDict:
+    """Filter by level like `structlog.stdlib.filter_by_level`, or the context's."""
+    if is_enabled_for(logger, METHOD_LEVELS[method_name]):
+        return event_dict
+
+    raise DropEvent
+
+
+def emit_below_level(
+    logger: WrappedLogger, method_name: str, event_dict: EventDict
+) -> EventDict:
+    """
+    Hand the events below the level of their stdlib logger to its handlers directly.
+
+    They would be dropped by the logger otherwise, on the way to its handlers.
+    """
+    if logger.isEnabledFor(METHOD_LEVELS[method_name]):
+        return event_dict
+
+    emit_record(logger, method_name, event_dict)
+    raise DropEvent
+
+
+def _gate(method: Callable[..., Any], level: int) -> Callable[..., Any]:
+    def gated(self: Any, event: str, *args: Any, **kw: Any) -> Any:  # noqa: ANN401
+        elevated = _elevated_level.get()
+        if elevated is None or level < elevated:
+            return None
+
+        return method(self, event, *args, **kw)
+
+    gated.__name__ = method.__name__
+    return gated
+
+
+def make_elevating_bound_logger(
+    min_level: int, elevation_level: int
+) -> type[FilteringBoundLogger]:
+    """
+    Return `structlog.make_filtering_bound_logger(min_level)`, elevation aside.
+
+    The methods of the levels from `elevation_level`, the most verbose one a context can
+    be raised to, up to `min_level` are no-ops unless the context is raised to theirs.
+    The other methods, `log` and the async ones, go through the processors instead.
+    """
+    if elevation_level >= min_level:
+        return structlog.make_filtering_bound_logger(min_level)
+
+    base = structlog.make_filtering_bound_logger(elevation_level)
+    methods: dict[str, Any] = {
+        name: _gate(getattr(base, name), level)
+        for name, level in METHOD_LEVELS.items()
+        # Goes through `error`, and `log`
+        if name not in {"exception", "notset"} and elevation_level <= level < min_level
+    }
+    if "info" in methods:
+        methods["msg"] = methods["info"]
+
+    def enabled_for(_: Any, level: int) -> bool:  # noqa: ANN401
+        return level >= min_level or is_elevated(level)
+
+    def get_effective_level(_: Any) -> int:  # noqa: ANN401
+        elevated = _elevated_level.get()
+        return min_level if elevated is None else min(elevated, min_level)
+
+    methods["is_enabled_for"] = enabled_for
+    methods["get_effective_level"] = get_effective_level
+
+    return type(f"Elevating{base.__name__}", (base,), methods)
+
+
+def get_bound_logger_methods(config: LogConfig) -> dict[str, Any]:
+    """
+    Return the methods of the bound loggers of the fast path, for the current levels.
+
+    Calls below the most verbose configured level are no-ops, or below the level of the
+    flight recorder if enabled. With the level elevation, the calls down to its level
+    check the level of their context first, see `make_elevating_bound_logger`.
+    """
+    levels = [
+        logging.getLogger(name).getEffectiveLevel()
+        for name in ("", *config.logger_levels)
+    ]
+    if config.flight_recorder.enabled:
+        levels.append(logging.getLevelNamesMapping()[config.flight_recorder.level])
+    min_level = min(levels)
+
+    wrapper_class = structlog.make_filtering_bound_logger(min_level)
+    if config.level_elevation.enabled:
+        wrapper_class = make_elevating_bound_logger(
+            min_level, logging.getLevelNamesMapping()[config.level_elevation.level]
+        )
+
+    # Flattened, the classes above being shared
+    return {
+        name: value
+        for cls in reversed(wrapper_class.__mro__)
+        if cls not in BoundLoggerBase.__mro__
+        for name, value in vars(cls).items()
+        if not name.startswith("__")
+    }
@@ -0,0 +1,79 @@
+import logging
+import sys
+import traceback
+
+import structlog
+
+from acidrain_logging.sinks import Sink
+
+
+class SinkLogger:
+    """
+    Wrapped logger that writes the renderer's output to a `Sink`.
+
+    Used by the fast path, in place of a `logging.Logger`: there is no `LogRecord` and
+    no handler involved. The stdlib logger is still used for its name and level.
+    """
+
+    __slots__ = ("_logger", "_sink", "name")
+
+    terminator = b"\n"
+
+    def __init__(self, logger: logging.Logger, sink: Sink) -> None:
+        self._logger = logger
+        self._sink = sink
+        self.name = logger.name
+
+    @property
+    def disabled(self) -> bool:
+        return self._logger.disabled
+
+    def isEnabledFor(self, level: int) -> bool:  # noqa: N802 -> Same as logging.Logger
+        return self._logger.isEnabledFor(level)
+
+    def getEffectiveLevel(self) -> int:  # noqa: N802 -> Same as logging.Logger
+        return self._logger.getEffectiveLevel()
+
+    def debug(self, message: str | bytes) -> None:
+        self._write(message, logging.DEBUG)
+
+    def info(self, message: str | bytes) -> None:
+        self._write(message, logging.INFO)
+
+    def warning(self, message: str | bytes) -> None:
+        self._write(message, logging.WARNING)
+
+    def error(self, message: str | bytes) -> None:
+        self._write(message, logging.ERROR)
+
+    def critical(self, message: str | bytes) -> None:
+        self._write(message, logging.CRITICAL)
+
+    def _write(self, message: str | bytes, levelno: int) -> None:
+        if isinstance(message, str):
+            message = message.encode(errors="backslashreplace") + self.terminator
+
+        try:
+            self._sink.write(message, levelno)
+        except Exception:  # noqa: BLE001 -> Same as logging.Handler.handleError
+            if logging.raiseExceptions and sys.stderr:  # pragma: no branch
+                sys.stderr.write("--- Logging error ---\n")
+                traceback.print_exc(file=sys.stderr)
+
+
+class SinkLoggerFactory:
+    """
+    Create `SinkLogger`s that all write to the same sink.
+
+    Loggers are named exactly like `structlog.stdlib.LoggerFactory` names them.
+    """
+
+    def __init__(self, sink: Sink) -> None:
+        self._sink = sink
+        # Skip our own frame when guessing the caller's module name.
+        self._stdlib_factory = structlog.stdlib.LoggerFactory(
+            ignore_frame_names=[__name__]
+        )
+
+    def __call__(self, *args: str) -> SinkLogger:
+        return SinkLogger(self._stdlib_factory(*args), self._sink)
@@ -1,40 +1,116 @@
 import logging
-from logging import StreamHandler
+import os
+from collections.abc import Sequence
 
-import orjson
 import structlog
+from structlog import BoundLoggerBase
 from structlog.dev import ConsoleRenderer, plain_traceback
-from structlog.processors import JSONRenderer
 from structlog.typing import Processor
 
 from acidrain_logging import LogConfig, OutputFormat
+from acidrain_logging.control import configure_log_control
+from acidrain_logging.formatters import BytesProcessorFormatter
+from acidrain_logging.levels import (
+    configure_level_elevation,
+    emit_below_level,
+    emit_record,
+    filter_by_level_or_elevated,
+    get_bound_logger_methods,
+)
+from acidrain_logging.loggers import SinkLoggerFactory
+from acidrain_logging.pipeline import compile_pre_processors
 from acidrain_logging.processors import (
     SHARED_PRE_PROCESSORS,
     LogProcessor,
     LogProcessorFactory,
+    timestamper_builder,
+)
+from acidrain_logging.recorder import (
+    EventReplayer,
+    RendererEmitter,
+    configure_flight_recorder,
+    filter_by_level_or_record,
+)
+from acidrain_logging.renderers import JSONLineRenderer
+from acidrain_logging.sinks import (
+    BatchSink,
+    FunnelSink,
+    QueueSink,
+    Sink,
+    SinkHandler,
+    StreamSink,
 )
+from acidrain_logging.trace_ids import configure_trace_ids
+
+_Configuration = tuple[LogConfig, tuple[LogProcessor | LogProcessorFactory, ...]]
+
+# The handler installed by the last `configure_logger` call, what it was called with,
+# and in which process
+_handler: SinkHandler | None = None
+_configuration: _Configuration | None = None
+_configured_pid = 0
 
 
-def configure_logger(log_config: LogConfig | None = None) -> None:
+def configure_logger(
+    log_config: LogConfig | None = None,
+    *,
+    pre_processors: Sequence[
+        LogProcessor | LogProcessorFactory
+    ] = SHARED_PRE_PROCESSORS,
+) -> None:
+    """
+    Configure structlog and the stdlib logging.
+
+    `pre_processors` can be used to insert custom processors anywhere in the chain,
+    usually by slicing `SHARED_PRE_PROCESSORS`. The chain is compiled into a single
+    processor, see `compile_pre_processors`.
+
+    Calling it again replaces the handler of the previous call, so that lines aren't
+    written twice. In a forked process, like a gunicorn worker, calling it with the
+    configuration inherited from the parent does nothing: the sinks of the parent are
+    kept, re-initialized for the child, see `acidrain_logging.sinks.Sink`.
+    """
+    global _handler, _configuration, _configured_pid  # noqa: PLW0603
     log_config = log_config or LogConfig()
 
-    pre_processors = _get_pre_processors(
-        log_config, pre_processors=SHARED_PRE_PROCESSORS
+    configuration = (log_config, tuple(pre_processors))
+    if (
+        is_configured()
+        and _configured_pid != os.getpid()
+        and _configuration == configuration
+    ):
+        return
+
+    pre_processor = compile_pre_processors(log_config, pre_processors)
+    foreign_pre_processor = compile_pre_processors(
+        log_config, pre_processors, foreign=True
     )
 
-    formatter = structlog.stdlib.ProcessorFormatter(
+    formatter_cls = (
+        BytesProcessorFormatter
+        if log_config.output_format == OutputFormat.JSON
+        else structlog.stdlib.ProcessorFormatter
+    )
+    formatter = formatter_cls(
         processors=[
             structlog.stdlib.ProcessorFormatter.remove_processors_meta,
             _get_log_renderer(log_config),
         ],
-        foreign_pre_chain=pre_processors,
+        foreign_pre_chain=[foreign_pre_processor],
     )
 
-    handler = StreamHandler()
+    sink = _get_sink(log_config)
+    handler = SinkHandler(sink)
     handler.setFormatter(formatter)
 
     root_logger = logging.getLogger()
+    if _handler is not None and _handler in root_logger.handlers:
+        root_logger.removeHandler(_handler)
+        _handler.close()
     root_logger.addHandler(handler)
+    _handler = handler
+    _configuration = configuration
+    _configured_pid = os.getpid()
     root_logger.setLevel(log_config.level)
 
     for name, level in log_config.logger_levels.items():
@@ -42,11 +118,27 @@ def configure_logger(log_config: LogConfig | None = None) -> None:
         logger.setLevel(level.upper())
 
     _override_uvicorn_loggers()
+    configure_trace_ids(log_config.trace_id)
+    configure_level_elevation(log_config.level_elevation)
+
+    if log_config.fast_path:
+        _configure_fast_path(log_config, pre_processor, sink)
+        return
+
+    configure_log_control(log_config, None)
+    configure_flight_recorder(
+        log_config.flight_recorder,
+        EventReplayer(pre_processor, emit_record, timestamper_builder(log_config)),
+    )
+
+    processors = _get_level_filters(log_config, pre_processor)
+    if log_config.level_elevation.enabled:
+        # The stdlib logger would drop the events of the raised levels
+        processors.append(emit_below_level)
 
     structlog.configure(
         processors=[
-            structlog.stdlib.filter_by_level,
-            *pre_processors,
+            *processors,
             structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         logger_factory=structlog.stdlib.LoggerFactory(),
@@ -55,20 +147,64 @@ def configure_logger(log_config: LogConfig | None = None) -> None:
     )
 
 
-def _get_pre_processors(
-    config: LogConfig, pre_processors: list[LogProcessor | LogProcessorFactory]
-) -> list[LogProcessor]:
-    processors = []
+def is_configured() -> bool:
+    """Return whether the handler of `configure_logger` is installed."""
+    return _handler is not None and _handler in logging.getLogger().handlers
 
-    for pre_processor in pre_processors:
-        if isinstance(pre_processor, LogProcessorFactory):
-            processor = pre_processor(config)
-            if processor is not None:
-                processors.append(processor)
-        else:
-            processors.append(pre_processor)
 
-    return processors
+def _configure_fast_path(
+    config: LogConfig, pre_processor: LogProcessor, sink: Sink
+) -> None:
+    """
+    Have structlog render its events and write them to the sink directly.
+
+    The stdlib logging machinery is bypassed: no `LogRecord`, no handler lock, no
+    second pass through a `ProcessorFormatter`. Records from the stdlib loggers still go
+    through the `SinkHandler` and end up in the same sink.
+
+    Calls below the most verbose configured level are no-ops, see
+    `get_bound_logger_methods`. Above that, the levels of the stdlib loggers still
+    apply, through `filter_by_level`.
+    """
+    # Its methods are replaced in place when the levels change, see `set_log_levels`
+    wrapper_class = type(
+        "FastPathBoundLogger", (BoundLoggerBase,), get_bound_logger_methods(config)
+    )
+    configure_log_control(config, wrapper_class)
+
+    renderer = _get_log_renderer(config)
+    configure_flight_recorder(
+        config.flight_recorder,
+        EventReplayer(
+            pre_processor, RendererEmitter(renderer), timestamper_builder(config)
+        ),
+    )
+
+    structlog.configure(
+        processors=[*_get_level_filters(config, pre_processor), renderer],
+        logger_factory=SinkLoggerFactory(sink),
+        wrapper_class=wrapper_class,
+        cache_logger_on_first_use=True,
+    )
+
+
+def _get_level_filters(
+    config: LogConfig, pre_processor: LogProcessor
+) -> list[Processor]:
+    """
+    Return the pre-processor, behind the level filter.
+
+    With the flight recorder, the events below the level are recorded instead while
+    recording, before any processing, see `acidrain_logging.recorder`. With the level
+    elevation, the level of the context applies too, see `acidrain_logging.levels`.
+    """
+    if config.flight_recorder.enabled:
+        return [filter_by_level_or_record, pre_processor]
+
+    if config.level_elevation.enabled:
+        return [filter_by_level_or_elevated, pre_processor]
+
+    return [structlog.stdlib.filter_by_level, pre_processor]
 
 
 def _get_log_renderer(config: LogConfig) -> Processor:
@@ -76,12 +212,47 @@ def _get_log_renderer(config: LogConfig) -> Processor:
         return ConsoleRenderer(colors=config.color, exception_formatter=plain_traceback)
 
     if config.output_format == OutputFormat.JSON:
-        return JSONRenderer(serializer=lambda *a, **kw: orjson.dumps(*a, **kw).decode())
+        # Rendered as a complete line, in bytes, to be written as is by the SinkHandler
+        return JSONLineRenderer(config.get_static_fields())
 
     # Shoud never happen, but ensures we don't forget to handle any new enum value
     raise ValueError(config.output_format)  # pragma: no cover
 
 
+def _get_sink(config: LogConfig) -> Sink:
+    level_names = logging.getLevelNamesMapping()
+
+    sink: Sink
+    if config.batching.enabled:
+        sink = BatchSink(
+            max_bytes=config.batching.max_bytes,
+            max_count=config.batching.max_count,
+            max_latency_s=config.batching.max_latency_ms / 1000,
+            flush_level=level_names[config.batching.flush_level],
+        )
+    else:
+        sink = StreamSink()
+
+    if config.queue.enabled:
+        sink = QueueSink(
+            sink,
+            max_size=config.queue.max_size,
+            overflow_policy=config.queue.overflow_policy,
+            protected_level=level_names[config.queue.protected_level],
+            close_timeout_s=config.queue.close_timeout_s,
+        )
+
+    if config.funnel.enabled:
+        sink = FunnelSink(
+            sink,
+            max_bytes=config.funnel.max_bytes,
+            max_latency_s=config.funnel.max_latency_ms / 1000,
+            flush_level=level_names[config.funnel.flush_level],
+        )
+
+    return sink
+
+
 def _override_uvicorn_loggers() -> None:
     """
     Override uvicorn's logging with ours.
@@ -90,7 +261,7 @@ def _override_uvicorn_loggers() -> None:
     propagate to our handler.
 
     Then we disable uvicorn's access logs and disable propagation. Our
-    LogRequestMiddleware will take care of that.
+    LogMiddleware will take care of that.
     """
     for log_name in ("uvicorn", "uvicorn.error"):
         logger = logging.getLogger(log_name)
@@ -0,0 +1,163 @@
+from collections.abc import Iterable, Sequence
+from logging import Logger
+
+import structlog
+from structlog.typing import EventDict
+
+from acidrain_logging import LogConfig, OutputFormat, context
+from acidrain_logging.processors import (
+    SHARED_PRE_PROCESSORS,
+    KeyOps,
+    LogProcessor,
+    LogProcessorFactory,
+    get_key_ops,
+)
+
+
+class CompiledPipeline:
+    """Run a sequence of processors as a single processor."""
+
+    __slots__ = ("processors",)
+
+    def __init__(self, processors: Iterable[LogProcessor]) -> None:
+        self.processors = tuple(processors)
+
+    def __call__(
+        self, logger: Logger, method_name: str, event_dict: EventDict
+    ) -> EventDict:
+        for processor in self.processors:
+            event_dict = processor(logger, method_name, event_dict)
+
+        return event_dict
+
+
+def compile_pre_processors(
+    config: LogConfig,
+    pre_processors: Sequence[LogProcessor | LogProcessorFactory],
+    *,
+    foreign: bool = False,
+) -> LogProcessor:
+    """
+    Turn a list of pre-processors into a single processor.
+
+    Factories are resolved against `config` and stages that would be no-ops for the
+    events of this chain are dropped: `foreign` is True for the records coming from
+    stdlib loggers, and False for the events coming from structlog.
+
+    Then, consecutive processors that only pop, rename, remap or insert keys (see
+    `KeyOps`) are fused into a single pass over the event dict, as long as they don't
+    touch the same keys. Any other processor, including user-supplied ones, is kept as
+    is, at its position in the list.
+
+    The JSON renderer adds the bound context itself, so its merge is dropped on the
+    fast path and for foreign records, unless a user-supplied processor comes after
+    it and could use the bound values.
+    """
+    renders_context = not _has_user_processor_after_merge(pre_processors)
+    processors = [
+        processor
+        for processor in _resolve(config, pre_processors)
+        if not _is_noop(
+            config, processor, foreign=foreign, renders_context=renders_context
+        )
+    ]
+    processors = _fuse(processors)
+
+    if len(processors) == 1:
+        return processors[0]
+
+    return CompiledPipeline(processors)
+
+
+def _resolve(
+    config: LogConfig, pre_processors: Sequence[LogProcessor | LogProcessorFactory]
+) -> list[LogProcessor]:
+    processors = []
+
+    for pre_processor in pre_processors:
+        if isinstance(pre_processor, LogProcessorFactory):
+            processor = pre_processor(config)
+            if processor is not None:
+                processors.append(processor)
+        else:
+            processors.append(pre_processor)
+
+    return processors
+
+
+def _has_user_processor_after_merge(
+    pre_processors: Sequence[LogProcessor | LogProcessorFactory],
+) -> bool:
+    if context.merge_contextvars not in pre_processors:
+        return False
+
+    index = list(pre_processors).index(context.merge_contextvars)
+    return any(p not in SHARED_PRE_PROCESSORS for p in pre_processors[index + 1 :])
+
+
+def _is_noop(
+    config: LogConfig,
+    processor: LogProcessor,
+    *,
+    foreign: bool,
+    renders_context: bool,
+) -> bool:
+    # The JSON renderer splices the bound context itself. It still has to be merged in
+    # the structlog events of the stdlib path, as they end up as `LogRecord.msg`.
+    if processor is context.merge_contextvars:
+        return (
+            renders_context
+            and config.output_format == OutputFormat.JSON
+            and (foreign or config.fast_path)
+        )
+
+    # Only records from stdlib loggers have a `_record` to take extras from.
+    if isinstance(processor, structlog.stdlib.ExtraAdder):
+        return not foreign
+
+    # Positional args are only passed by `structlog.stdlib.BoundLogger`. The fast path
+    # interpolates them itself, and the formatter merges them in foreign messages.
+    if isinstance(processor, structlog.stdlib.PositionalArgumentsFormatter):
+        return foreign or config.fast_path
+
+    key_ops = get_key_ops(processor)
+    return key_ops is not None and not key_ops and _get_residual(processor) is None
+
+
+def _fuse(processors: list[LogProcessor]) -> list[LogProcessor]:
+    fused: list[LogProcessor] = []
+    group: KeyOps | None = None
+
+    for processor in processors:
+        key_ops = get_key_ops(processor)
+
+        if key_ops is None:
+            if group is not None:
+                fused.append(group)
+                group = None
+            fused.append(processor)
+            continue
+
+        if group is not None and group.keys & key_ops.keys:
+            # Reordering the operations would change the result
+            fused.append(group)
+            group = None
+
+        group = key_ops if group is None else group.merge(key_ops)
+
+        # Whatever the processor does on top of its key operations has to run right
+        # after them.
+        residual = _get_residual(processor)
+        if residual is not None:
+            fused.append(group)
+            fused.append(residual)
+            group = None
+
+    if group is not None:
+        fused.append(group)
+
+    return [p for p in fused if not isinstance(p, KeyOps) or p]
+
+
+def _get_residual(processor: LogProcessor) -> LogProcessor | None:
+    return getattr(processor, "residual", None)
@@ -1,14 +1,17 @@
-from collections.abc import Callable
+import time
+from collections.abc import Callable, Mapping
 from dataclasses import dataclass
-from functools import partial
+from datetime import UTC, datetime
 from logging import Logger
 from typing import Any
 
 import structlog
 from structlog.typing import EventDict
 
-from acidrain_logging import LogConfig, OutputFormat
-from acidrain_logging.config import DatadogSettings
+from acidrain_logging import LogConfig, OutputFormat, context
+from acidrain_logging.config import DatadogSettings, ExceptionFormat
+from acidrain_logging.ratelimit import RateLimiter
+from acidrain_logging.tracebacks import CachedExceptionFormatter
 
 try:
     from ddtrace.trace import tracer
@@ -26,7 +29,138 @@ class LogProcessorFactory:
         return self.builder(config)
 
 
-def timestamper_builder(config: LogConfig) -> LogProcessor:
+@dataclass(frozen=True)
+class KeyOps:
+    """
+    Processor that only pops, renames, remaps or inserts keys in the event dict.
+
+    Processors made of such operations declare them through a `key_ops` attribute, so
+    that the pipeline compiler can fuse them into a single pass. The operations are
+    applied in this order: pop, rename, remap, insert.
+    """
+
+    pop: tuple[str, ...] = ()
+    rename: tuple[tuple[str, str], ...] = ()
+    remap: tuple[tuple[str, Mapping[str, str]], ...] = ()
+    insert: tuple[tuple[str, Any], ...] = ()
+
+    def __bool__(self) -> bool:
+        return any((self.pop, self.rename, self.remap, self.insert))
+
+    @property
+    def keys(self) -> frozenset[str]:
+        return frozenset(
+            (
+                *self.pop,
+                *(key for pair in self.rename for key in pair),
+                *(key for key, _ in self.remap),
+                *(key for key, _ in self.insert),
+            )
+        )
+
+    def merge(self, other: "KeyOps") -> "KeyOps":
+        return KeyOps(
+            pop=(*self.pop, *other.pop),
+            rename=(*self.rename, *other.rename),
+            remap=(*self.remap, *other.remap),
+            insert=(*self.insert, *other.insert),
+        )
+
+    def __call__(
+        self, _logger: Logger, _method_name: str, event_dict: EventDict
+    ) -> EventDict:
+        for key in self.pop:
+            event_dict.pop(key, None)
+
+        for src, dst in self.rename:
+            event_dict[dst] = event_dict.pop(src)
+
+        for key, mapping in self.remap:
+            value = event_dict[key]
+            event_dict[key] = mapping.get(value, value)
+
+        if self.insert:
+            event_dict.update(self.insert)
+
+        return event_dict
+
+
+class CachedTimeStamper:
+    """
+    Faster alternative to `structlog.processors.TimeStamper`, for the common formats.
+
+    Supported formats are:
+    - `iso`: same output as `TimeStamper(fmt="iso")`. The formatted date and time are
+      cached for the current second, only the microseconds are formatted per event.
+    - `epoch`: seconds since the epoch, as a float, like `TimeStamper(fmt=None)`.
+    - `epoch_ns`: nanoseconds since the epoch, as an int.
+    """
+
+    __slots__ = ("_cache", "_stamper", "_suffix", "fmt", "key", "utc")
+
+    FORMATS = frozenset(("iso", "epoch", "epoch_ns"))
+
+    def __init__(self, fmt: str, *, utc: bool = True, key: str = "timestamp") -> None:
+        self.fmt = fmt
+        self.utc = utc
+        self.key = key
+
+        # Same as TimeStamper: UTC timestamps end with Z, local ones have no offset.
+        self._suffix = "Z" if utc else ""
+        self._cache: tuple[int, str] = (-1, "")
+
+        match fmt.lower():
+            case "iso":
+                self._stamper: Callable[[], str | float | int] = self._iso
+            case "epoch":
+                self._stamper = time.time
+            case "epoch_ns":
+                self._stamper = time.time_ns
+            case _:
+                raise ValueError(fmt)
+
+    def __call__(
+        self, _logger: Logger, _method_name: str, event_dict: EventDict
+    ) -> EventDict:
+        event_dict[self.key] = self._stamper()
+        return event_dict
+
+    def stamp(self, time_ns: int) -> str | float | int:
+        """Return the timestamp of another time than now, in ns since the epoch."""
+        match self.fmt.lower():
+            case "iso":
+                return self._iso(time_ns)
+            case "epoch":
+                return time_ns / 1_000_000_000
+            case _:
+                return time_ns
+
+    def _iso(self, time_ns: int | None = None) -> str:
+        if time_ns is None:
+            time_ns = time.time_ns()
+
+        # Truncated to the microsecond like datetime.now()
+        seconds, micros = divmod(time_ns // 1000, 1_000_000)
+
+        # Stored as a single tuple, to be swapped atomically between threads.
+        cached_seconds, prefix = self._cache
+        if seconds != cached_seconds:
+            tz = UTC if self.utc else None
+            prefix = datetime.fromtimestamp(seconds, tz=tz).strftime(
+                "%Y-%m-%dT%H:%M:%S"
+            )
+            self._cache = (seconds, prefix)
+
+        # Same as datetime.isoformat(): no fraction when there are no microseconds.
+        if micros:
+            return f"{prefix}.{micros:06d}{self._suffix}"
+
+        return f"{prefix}{self._suffix}"
+
+
+def timestamper_builder(
+    config: LogConfig,
+) -> CachedTimeStamper | structlog.processors.TimeStamper:
     kwargs: dict[str, Any] = {}
 
     # TODO: Check if needed for DD logs
@@ -35,6 +169,9 @@ def timestamper_builder(config: LogConfig) -> LogProcessor:
     else:
         kwargs["utc"] = False
 
+    if config.timestamp_format.lower() in CachedTimeStamper.FORMATS:
+        return CachedTimeStamper(config.timestamp_format, **kwargs)
+
     return structlog.processors.TimeStamper(
         fmt=config.timestamp_format,
         **kwargs,
@@ -44,6 +181,46 @@ def timestamper_builder(config: LogConfig) -> LogProcessor:
 TimeStamperFactory = LogProcessorFactory(builder=timestamper_builder)
 
 
+def rate_limiter_builder(config: LogConfig) -> LogProcessor | None:
+    settings = config.rate_limit
+    if not settings.enabled:
+        return None
+
+    return RateLimiter(settings.rate, settings.burst, settings.max_keys)
+
+
+RateLimiterFactory = LogProcessorFactory(builder=rate_limiter_builder)
+
+
+def exception_renderer_builder(config: LogConfig) -> LogProcessor | None:
+    settings = config.exceptions
+
+    # The console renderer expects a text
+    if (
+        settings.format == ExceptionFormat.DICT
+        and config.output_format == OutputFormat.JSON
+    ):
+        return structlog.processors.ExceptionRenderer(
+            structlog.tracebacks.ExceptionDictTransformer(
+                show_locals=settings.show_locals,
+                locals_max_length=settings.locals_max_length,
+                locals_max_string=settings.locals_max_string,
+                max_frames=settings.max_frames,
+                use_rich=False,
+            )
+        )
+
+    if settings.cache_size == 0:
+        return structlog.processors.format_exc_info
+
+    return structlog.processors.ExceptionRenderer(
+        CachedExceptionFormatter(settings.cache_size)
+    )
+
+
+ExceptionRendererFactory = LogProcessorFactory(builder=exception_renderer_builder)
+
+
 # https://github.com/hynek/structlog/issues/35#issuecomment-591321744
 def event_renamer(
     _logger: Logger, _method_name: str, event_dict: EventDict
@@ -79,6 +256,7 @@ class LevelRenamer:
 
     def __init__(self, rename_map: dict[str, str]) -> None:
         self._rename_map = rename_map
+        self.key_ops = KeyOps(remap=(("level", rename_map),))
 
     def __call__(
         self, _logger: Logger, _method_name: str, event_dict: EventDict
@@ -126,6 +304,12 @@ def datadog_injector(
         }
     )
 
+    return datadog_span_injector(_logger, _method_name, event_dict)
+
+
+def datadog_span_injector(
+    _logger: Logger, _method_name: str, event_dict: EventDict
+) -> EventDict:
     span = tracer and tracer.current_span()
     if span:
         event_dict.update({"dd.span_id": span.span_id, "dd.trace_id": span.trace_id})
@@ -133,27 +317,92 @@ def datadog_injector(
     return event_dict
 
 
+class DatadogInjector:
+    """
+    Add the Datadog settings and the current span, if any, to the event dict.
+
+    The settings never change: they are exposed as `key_ops`, and only the span
+    injection is left as the `residual` processor once they are fused.
+    """
+
+    def __init__(self, datadog_settings: DatadogSettings) -> None:
+        self.key_ops = KeyOps(
+            insert=tuple(datadog_settings.get_static_fields().items())
+        )
+        self.residual: LogProcessor | None = (
+            datadog_span_injector if tracer is not None else None
+        )
+
+    def __call__(
+        self, logger: Logger, method_name: str, event_dict: EventDict
+    ) -> EventDict:
+        event_dict = self.key_ops(logger, method_name, event_dict)
+
+        if self.residual is None:
+            return event_dict
+
+        return self.residual(logger, method_name, event_dict)
+
+
 def datadog_injector_builder(config: LogConfig) -> LogProcessor | None:
     if not config.datadog.is_enabled():
         return None
 
-    return partial(datadog_injector, datadog_settings=config.datadog)
+    if config.output_format == OutputFormat.JSON:
+        # The settings are spliced in the rendered line, only the span is left to add
+        return datadog_span_injector if tracer is not None else None
+
+    return DatadogInjector(config.datadog)
 
 
 DatadogInjectorFactory = LogProcessorFactory(builder=datadog_injector_builder)
 
 
+def static_fields_builder(config: LogConfig) -> LogProcessor | None:
+    # The JSON renderer splices the static fields in the rendered line
+    if config.output_format == OutputFormat.JSON or not config.static_fields:
+        return None
+
+    return KeyOps(insert=tuple(config.static_fields.items()))
+
+
+StaticFieldsFactory = LogProcessorFactory(builder=static_fields_builder)
+
+
+_FUNCTION_KEY_OPS: dict[Callable[..., EventDict], KeyOps] = {
+    drop_color_message_key: KeyOps(pop=("color_message",)),
+    event_renamer: KeyOps(rename=(("event", "message"),)),
+}
+
+
+def get_key_ops(processor: LogProcessor) -> KeyOps | None:
+    """Return the key operations a processor is made of, if it declares any."""
+    if isinstance(processor, KeyOps):
+        return processor
+
+    key_ops = getattr(processor, "key_ops", None)
+    if isinstance(key_ops, KeyOps):
+        return key_ops
+
+    return _FUNCTION_KEY_OPS.get(processor)
+
+
 SHARED_PRE_PROCESSORS: list[LogProcessor | LogProcessorFactory] = [
-    structlog.contextvars.merge_contextvars,
+    context.merge_structlog_contextvars,
+    # Then the bound values, at the very start of the event dict
+    context.merge_contextvars,
     structlog.stdlib.add_logger_name,
     structlog.stdlib.add_log_level,
+    # Before any costly processing, and the positional args being formatted
+    RateLimiterFactory,
     structlog.stdlib.PositionalArgumentsFormatter(),
     structlog.stdlib.ExtraAdder(),
     TimeStamperFactory,
-    structlog.processors.format_exc_info,
+    ExceptionRendererFactory,
     structlog.processors.StackInfoRenderer(),
     drop_color_message_key,
     EventRenamerFactory,
     LevelRenamerFactory,
     DatadogInjectorFactory,
+    StaticFieldsFactory,
 ]
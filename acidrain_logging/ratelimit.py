@@ -0,0 +1,184 @@
+"""
+Rate limit of the events repeated in bursts, like an error on each call to a dependency.
+
+The events are limited per logger, level and message template, with a token bucket.
+Those over the limit are dropped before any other processing, traceback formatting
+included, and are counted: the next event of the same key to be logged carries the
+count as `repeated`. If the key isn't logged again by the time it could be, or is
+forgotten before, its message template is logged on its own with the count instead,
+with the next event of any key.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from logging import Logger
+from typing import Any
+
+import structlog
+from structlog import DropEvent
+from structlog.typing import EventDict
+
+from acidrain_logging._fork import register_after_fork
+from acidrain_logging.levels import METHOD_LEVELS
+
+# Marks the events logged with the count of a key, to let them through
+_SUMMARY_KEY = "_acidrain_rate_limit_summary"
+
+RateLimitKey = tuple[Any, str, str]
+
+
+class _Bucket:
+    __slots__ = ("suppressed", "tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float) -> None:
+        self.tokens = tokens
+        self.updated_at = updated_at
+        self.suppressed = 0
+
+
+def _get_template(event_dict: EventDict) -> str:
+    """
+    Return the message template of an event, before any interpolation.
+
+    Records of the stdlib loggers keep it in `msg`, and the events of
+    `structlog.stdlib.BoundLogger` keep their positional args apart until they are
+    formatted. The fast path interpolates them in the call: its messages are their own
+    templates.
+    """
+    record = event_dict.get("_record")
+    template = record.msg if record is not None else event_dict.get("event")
+
+    return template if isinstance(template, str) else str(template)
+
+
+class RateLimiter:
+    """
+    Drop the events over the limit of their logger, level and message template.
+
+    Each key starts with `burst` tokens and gets `rate` more per second, up to `burst`.
+    An event takes a token if there is one, and is dropped otherwise. The buckets of
+    the `max_keys` most recently logged keys are kept, in LRU order.
+
+    The count of the dropped events goes with the next event of their key. The counts
+    left once their key has a token again, or of the keys forgotten, are logged apart
+    with the next event of any key, see `_log_repeated`.
+    """
+
+    __slots__ = (
+        "__weakref__",
+        "_buckets",
+        "_lock",
+        "_next_due_at",
+        "_pending",
+        "_summaries",
+        "burst",
+        "max_keys",
+        "rate",
+    )
+
+    def __init__(self, rate: float, burst: int, max_keys: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+
+        self._buckets: OrderedDict[RateLimitKey, _Bucket] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Keys with dropped events, and when they get a token back
+        self._pending: dict[RateLimitKey, float] = {}
+        self._next_due_at = math.inf
+        # Counts to log apart, per key
+        self._summaries: list[tuple[RateLimitKey, int]] = []
+
+        register_after_fork(self)
+
+    def __call__(
+        self, _logger: Logger, method_name: str, event_dict: EventDict
+    ) -> EventDict:
+        if event_dict.pop(_SUMMARY_KEY, False):
+            return event_dict
+
+        key = (event_dict.get("logger"), method_name, _get_template(event_dict))
+        now = time.monotonic()
+
+        with self._lock:
+            repeated = self._take(key, now)
+
+            summaries = None
+            if self._summaries or now >= self._next_due_at:
+                summaries = self._pop_summaries(now)
+
+        if summaries:
+            for summary in summaries:
+                _log_repeated(*summary)
+
+        if repeated is None:
+            raise DropEvent
+
+        if repeated:
+            event_dict["repeated"] = repeated
+
+        return event_dict
+
+    def _take(self, key: RateLimitKey, now: float) -> int | None:
+        """Take a token, and return the count to log with it, or None if dropped."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                evicted_key, evicted = self._buckets.popitem(last=False)
+                if self._pending.pop(evicted_key, None) is not None:
+                    self._summaries.append((evicted_key, evicted.suppressed))
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(
+                bucket.tokens + (now - bucket.updated_at) * self.rate, self.burst
+            )
+            bucket.updated_at = now
+
+        if bucket.tokens < 1:
+            bucket.suppressed += 1
+            due_at = now + (1 - bucket.tokens) / self.rate
+            self._pending[key] = due_at
+            self._next_due_at = min(self._next_due_at, due_at)
+            return None
+
+        bucket.tokens -= 1
+        repeated, bucket.suppressed = bucket.suppressed, 0
+        self._pending.pop(key, None)
+
+        return repeated
+
+    def _pop_summaries(self, now: float) -> list[tuple[RateLimitKey, int]]:
+        for key, due_at in list(self._pending.items()):
+            if due_at <= now:
+                del self._pending[key]
+                bucket = self._buckets[key]
+                self._summaries.append((key, bucket.suppressed))
+                bucket.suppressed = 0
+
+        self._next_due_at = min(self._pending.values(), default=math.inf)
+        summaries, self._summaries = self._summaries, []
+
+        return summaries
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+def _log_repeated(key: RateLimitKey, repeated: int) -> None:
+    """
+    Log the message template of a key with the count of its dropped events.
+
+    At the level of the key, through the configured processors, the limiter aside.
+    """
+    logger_name, method_name, template = key
+    structlog.get_logger(logger_name).log(
+        METHOD_LEVELS.get(method_name, logging.ERROR),
+        template,
+        repeated=repeated,
+        **{_SUMMARY_KEY: True},
+    )
@@ -0,0 +1,217 @@
+"""
+Flight recorder: the verbose events of a request or task, logged only if it goes wrong.
+
+`start_recording` installs a `FlightRecorder` in the current context. While it is
+there, `filter_by_level_or_record` keeps the structlog events below the configured
+level, down to the recorder's level, as they are: raw, with their time and a copy of
+their context. `stop_recording` then drops the whole buffer, or replays it through the
+pre-processor and the renderer with an `EventReplayer`: only the events that end up
+logged pay for the processing.
+
+`configure_logger` sets it all up from the `flight_recorder` settings.
+"""
+
+import logging
+import sys
+import time
+from collections import deque
+from collections.abc import Callable
+from contextvars import Context, ContextVar, copy_context
+from datetime import UTC, datetime
+from typing import Any, cast
+
+from structlog import DropEvent
+from structlog.processors import StackInfoRenderer, TimeStamper
+from structlog.typing import EventDict, WrappedLogger
+
+from acidrain_logging.config import FlightRecorderSettings
+from acidrain_logging.levels import METHOD_LEVELS, is_enabled_for
+from acidrain_logging.processors import CachedTimeStamper, LogProcessor
+
+# Hands a replayed event to the rest of the chain
+RecordedEventEmitter = Callable[[WrappedLogger, str, EventDict], None]
+
+# The stack is only there when the event is recorded
+_stack_info_renderer = StackInfoRenderer(additional_ignores=[__name__])
+
+
+class RendererEmitter:
+    """Render a replayed event and write it with its `SinkLogger`, for the fast path."""
+
+    __slots__ = ("renderer",)
+
+    def __init__(
+        self, renderer: Callable[[WrappedLogger, str, EventDict], Any]
+    ) -> None:
+        self.renderer = renderer
+
+    def __call__(
+        self, logger: WrappedLogger, method_name: str, event_dict: EventDict
+    ) -> None:
+        line = self.renderer(logger, method_name, event_dict)
+        # `SinkLogger` writes without checking the level
+        getattr(logger, logging.getLevelName(METHOD_LEVELS[method_name]).lower())(line)
+
+
+def _stamp(timestamper: CachedTimeStamper | TimeStamper, time_ns: int) -> Any:  # noqa: ANN401
+    if isinstance(timestamper, CachedTimeStamper):
+        return timestamper.stamp(time_ns)
+
+    # structlog's TimeStamper, for the other formats, always set by the config
+    fmt = cast("str", timestamper.fmt)
+    if timestamper.utc:
+        return datetime.fromtimestamp(time_ns / 1e9, tz=UTC).strftime(fmt)
+
+    return datetime.fromtimestamp(time_ns / 1e9).strftime(fmt)  # noqa: DTZ006
+
+
+class EventReplayer:
+    """
+    Run a recorded event through the pre-processor, then emit it.
+
+    Its timestamp is then set back to the time it was recorded at, if `timestamper`
+    set one.
+    """
+
+    __slots__ = ("emit", "pre_processor", "timestamper")
+
+    def __init__(
+        self,
+        pre_processor: LogProcessor,
+        emit: RecordedEventEmitter,
+        timestamper: CachedTimeStamper | TimeStamper,
+    ) -> None:
+        self.pre_processor = pre_processor
+        self.emit = emit
+        self.timestamper = timestamper
+
+    def __call__(
+        self,
+        logger: WrappedLogger,
+        method_name: str,
+        event_dict: EventDict,
+        time_ns: int,
+    ) -> None:
+        try:
+            event_dict = self.pre_processor(logger, method_name, event_dict)
+        except DropEvent:
+            return
+
+        if self.timestamper.key in event_dict:
+            event_dict[self.timestamper.key] = _stamp(self.timestamper, time_ns)
+
+        self.emit(logger, method_name, event_dict)
+
+
+class FlightRecorder:
+    """The last `max_events` events recorded in a context, not processed yet."""
+
+    __slots__ = ("_events",)
+
+    def __init__(self, max_events: int) -> None:
+        # Appending is atomic: threads running with a copy of the context can share it
+        self._events: deque[tuple[WrappedLogger, str, EventDict, int, Context]] = deque(
+            maxlen=max_events
+        )
+
+    def record(
+        self, logger: WrappedLogger, method_name: str, event_dict: EventDict
+    ) -> None:
+        # The exception and the stack are gone by the time the event is replayed
+        if event_dict.get("exc_info") is True:
+            event_dict["exc_info"] = sys.exc_info()
+        if event_dict.get("stack_info"):
+            event_dict = _stack_info_renderer(logger, method_name, event_dict)
+
+        self._events.append(
+            (logger, method_name, event_dict, time.time_ns(), copy_context())
+        )
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def flush(self) -> None:
+        """Log the recorded events, in order, each in the context it was recorded in."""
+        replay = _replay
+        if replay is None:
+            self._events.clear()
+            return
+
+        while self._events:
+            logger, method_name, event_dict, time_ns, context = self._events.popleft()
+            context.run(replay, logger, method_name, event_dict, time_ns)
+
+
+_recorder: ContextVar[FlightRecorder | None] = ContextVar(
+    "acidrain_logging_recorder", default=None
+)
+
+_settings = FlightRecorderSettings()
+_level = logging.DEBUG
+_replay: EventReplayer | None = None
+
+
+def configure_flight_recorder(
+    settings: FlightRecorderSettings, replay: EventReplayer | None = None
+) -> None:
+    global _settings, _level, _replay  # noqa: PLW0603
+    _settings = settings
+    _level = logging.getLevelNamesMapping()[settings.level]
+    _replay = replay
+
+
+def start_recording() -> FlightRecorder | None:
+    """Record the verbose events of the current context, if the recorder is enabled."""
+    if not _settings.enabled:
+        return None
+
+    recorder = FlightRecorder(_settings.max_events)
+    _recorder.set(recorder)
+    return recorder
+
+
+def stop_recording(
+    recorder: FlightRecorder | None, *, failed: bool, elapsed_ms: float | None
+) -> None:
+    """
+    Stop recording, and log the recorded events if the request or task failed.
+
+    They are also logged if it was slower than `flush_slower_than_ms`, and dropped
+    otherwise.
+    """
+    if recorder is None:
+        return
+
+    if _recorder.get() is recorder:
+        _recorder.set(None)
+
+    slower_than_ms = _settings.flush_slower_than_ms
+    if failed or (
+        slower_than_ms is not None
+        and elapsed_ms is not None
+        and elapsed_ms > slower_than_ms
+    ):
+        recorder.flush()
+    else:
+        recorder.clear()
+
+
+def filter_by_level_or_record(
+    logger: WrappedLogger, method_name: str, event_dict: EventDict
+) -> EventDict:
+    """
+    Filter by level like `filter_by_level_or_elevated`, except while recording.
+
+    The events filtered out, at or above the recorder's level, are then recorded.
+    """
+    level = METHOD_LEVELS[method_name]
+    if is_enabled_for(logger, level):
+        return event_dict
+
+    # Replayed regardless of the levels, but not of `logging.disable`
+    if level >= _level and level > logging.root.manager.disable:
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.record(logger, method_name, event_dict)
+
+    raise DropEvent
@@ -0,0 +1,98 @@
+from collections.abc import Mapping
+from functools import partial
+from typing import Any, cast
+
+import orjson
+from structlog.processors import JSONRenderer
+from structlog.typing import EventDict, WrappedLogger
+
+from acidrain_logging.context import BoundContext, get_bound_context
+
+_CLOSING = b"}\n"
+
+
+class JSONLineRenderer(JSONRenderer):
+    """
+    Render the event dict as a complete JSON line, in bytes.
+
+    `static_fields` are serialized once, and spliced at the end of every line. They
+    win over the event's own values for the same keys, like an `event_dict.update`
+    would: such events are rendered without the splicing.
+
+    The values of the bound context (see `acidrain_logging.context`) are serialized
+    once per bind, and spliced at the start of every line, unless the event dict has
+    keys in common with the context: they are then merged and serialized as usual.
+    This means `merge_contextvars` can be left out of the processors. Values it merged
+    first, as the shared processors do, are taken back out of the event dict and
+    spliced too.
+    """
+
+    def __init__(self, static_fields: Mapping[str, str] | None = None) -> None:
+        super().__init__(
+            serializer=partial(orjson.dumps, option=orjson.OPT_APPEND_NEWLINE)
+        )
+
+        self._static_fields = dict(static_fields or {})
+        self._static_keys = frozenset(self._static_fields)
+
+        # '"key":"value",...', spliced before the closing brace
+        self._static_fragment = orjson.dumps(self._static_fields)[1:-1]
+
+    def __call__(
+        self, _logger: WrappedLogger, _name: str, event_dict: EventDict
+    ) -> bytes:
+        context_fragment = None
+        context = get_bound_context()
+        if context.values:
+            if self._can_splice(context, event_dict) or self._pop_merged_context(
+                context, event_dict
+            ):
+                context_fragment = self._get_context_fragment(context)
+            elif not context.values.keys() <= event_dict.keys():
+                event_dict = {**context.values, **event_dict}
+
+        static_fragment = self._static_fragment
+        if static_fragment and not self._static_keys.isdisjoint(event_dict):
+            event_dict = {**event_dict, **self._static_fields}
+            static_fragment = b""
+
+        line = cast("bytes", self._dumps(event_dict, **self._dumps_kw))
+        if context_fragment is None and not static_fragment:
+            return line
+
+        # Empty fragments, like the one of an empty event dict, need no comma
+        fragments = (context_fragment, line[1:-2], static_fragment)
+        return b"{" + b",".join(f for f in fragments if f) + _CLOSING
+
+    def _can_splice(self, context: BoundContext, event_dict: EventDict) -> bool:
+        # Values already merged, or overridden by the event, are serialized as usual,
+        # and so is the context if its keys clash with the static fields.
+        return context.values.keys().isdisjoint(
+            event_dict
+        ) and self._static_keys.isdisjoint(context.values)
+
+    def _pop_merged_context(self, context: BoundContext, event_dict: EventDict) -> bool:
+        # The same values, in the same order, at the start of the event dict
+        values = context.values
+        if len(event_dict) < len(values) or not self._static_keys.isdisjoint(values):
+            return False
+
+        # Event dicts are dicts, with their keys in insertion order
+        items = cast("dict[str, Any]", event_dict).items()
+        merged = zip(items, values.items(), strict=False)
+        if not all(k == ck and v is cv for (k, v), (ck, cv) in merged):
+            return False
+
+        for key in values:
+            del event_dict[key]
+
+        return True
+
+    def _get_context_fragment(self, context: BoundContext) -> bytes:
+        fragment = context.fragment
+        if fragment is None:
+            # '"key":"value",...', cached on the context until the next bind replaces it
+            line = cast("bytes", self._dumps(context.values, **self._dumps_kw))
+            fragment = context.fragment = line[1:-2]
+
+        return fragment
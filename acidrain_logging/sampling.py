@@ -0,0 +1,124 @@
+import itertools
+import random
+
+from acidrain_logging.config import AccessLogSettings, TaskLogSettings
+
+
+class AccessLogSampler:
+    """
+    Decide whether a request is logged, from its route template, status and duration.
+
+    See `AccessLogSettings` for the rules. Exclusions are resolved as a rate of 0 once,
+    so deciding only costs a dict lookup, plus a random draw for sampled routes.
+    """
+
+    __slots__ = (
+        "_always_log_slower_than_ms",
+        "_always_log_status",
+        "_default_rate",
+        "_rates",
+    )
+
+    def __init__(self, settings: AccessLogSettings) -> None:
+        self._rates: dict[str | None, float] = {}
+        self._default_rate = 0.0
+
+        # Aggregated requests are only logged one by one if they match the always-log
+        # rules.
+        if not settings.aggregate:
+            self._rates.update(settings.sample_rates)
+            self._rates.update(dict.fromkeys(settings.exclude, 0.0))
+            self._default_rate = settings.default_sample_rate
+        self._always_log_status = settings.always_log_status
+        self._always_log_slower_than_ms = settings.always_log_slower_than_ms
+
+    def should_log(
+        self, route: str | None, status_code: int, elapsed_ms: float | None
+    ) -> bool:
+        """
+        Return whether to log the request.
+
+        `route` is the template of the matched route, None if no route matched, and
+        `elapsed_ms` is None if the duration of the request is unknown.
+        """
+        rate = self._rates.get(route, self._default_rate)
+        if rate >= 1.0:
+            return True
+
+        if status_code >= self._always_log_status:
+            return True
+
+        slower_than_ms = self._always_log_slower_than_ms
+        if (
+            slower_than_ms is not None
+            and elapsed_ms is not None
+            and elapsed_ms > slower_than_ms
+        ):
+            return True
+
+        return rate > 0.0 and random.random() < rate  # noqa: S311
+
+
+class TaskLogSampler:
+    """
+    Decide whether a task run is logged, from its name, final state and duration.
+
+    See `TaskLogSettings` for the rules. Whether a run is sampled is decided when it
+    starts, so that both of its lines are logged, or none. The runs that are not
+    sampled are still logged when they complete, if they match the always-log rules.
+    """
+
+    __slots__ = (
+        "_always_log_slower_than_ms",
+        "_counters",
+        "_default_rate",
+        "_every",
+        "_rates",
+    )
+
+    def __init__(self, settings: TaskLogSettings) -> None:
+        self._rates: dict[str, float] = {}
+        self._every: dict[str, int] = {}
+        self._default_rate = 0.0
+
+        # Aggregated runs are only logged one by one if they match the always-log
+        # rules.
+        if not settings.aggregate:
+            self._rates.update(settings.sample_rates)
+            self._every.update(settings.sample_every)
+            self._default_rate = settings.default_sample_rate
+        self._always_log_slower_than_ms = settings.always_log_slower_than_ms
+
+        # Taking the next value of a count is atomic, no lock needed
+        self._counters = {name: itertools.count() for name in self._every}
+
+    def should_log_start(self, task_name: str) -> bool:
+        """Return whether to sample the run, and log it when it starts."""
+        every = self._every.get(task_name)
+        if every is not None:
+            return next(self._counters[task_name]) % every == 0
+
+        rate = self._rates.get(task_name, self._default_rate)
+        if rate >= 1.0:
+            return True
+
+        return rate > 0.0 and random.random() < rate  # noqa: S311
+
+    def should_log_end(
+        self, *, sampled: bool, state: str, duration_ms: float | None
+    ) -> bool:
+        """
+        Return whether to log the run when it completes.
+
+        `sampled` is what `should_log_start` returned for the run, and `duration_ms`
+        is None if the duration of the run is unknown.
+        """
+        if sampled or state != "SUCCESS":
+            return True
+
+        slower_than_ms = self._always_log_slower_than_ms
+        return (
+            slower_than_ms is not None
+            and duration_ms is not None
+            and duration_ms > slower_than_ms
+        )
@@ -0,0 +1,682 @@
+import atexit
+import contextlib
+import io
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from collections.abc import Callable
+from typing import IO, Any
+
+from structlog import DropEvent
+
+from acidrain_logging._fork import register_after_fork
+from acidrain_logging.config import OverflowPolicy
+from acidrain_logging.formatters import BytesProcessorFormatter
+
+_funnels: "weakref.WeakSet[FunnelSink]" = weakref.WeakSet()
+
+# Header of the batches sent to a `FunnelSink`: highest level, lines dropped before it
+_FUNNEL_HEADER = struct.Struct("=BI")
+
+
+class Sink(ABC):
+    """
+    Destination for fully rendered log lines.
+
+    Lines are bytes, already terminated by a newline. The level of the event is passed
+    along so that sinks can make decisions (dropping, flushing, etc.) without parsing
+    the line.
+
+    The sinks of this module are re-initialized in forked processes, like gunicorn
+    workers: they get new locks, drop the lines still pending in the parent, which are
+    the parent's to write, and restart their thread. This way, a child never waits on a
+    lock that another thread of the parent held when forking.
+    """
+
+    @abstractmethod
+    def write(self, line: bytes, levelno: int) -> None: ...
+
+    def flush(self) -> None:  # noqa: B027 -> Optional hook
+        """Flush any pending line."""
+
+    def close(self) -> None:
+        self.flush()
+
+    def _reset_after_fork(self) -> None:  # noqa: B027 -> Optional hook
+        """Re-initialize the sink in a forked child process."""
+
+
+class StreamSink(Sink):
+    """
+    Write lines to a stream, `sys.stderr` by default.
+
+    If the stream is a text stream wrapping a binary buffer, the lines are written to
+    the buffer directly.
+    """
+
+    def __init__(self, stream: IO[Any] | None = None) -> None:
+        stream = stream if stream is not None else sys.stderr
+
+        self._stream = stream
+        self._buffer: IO[bytes] | None = getattr(stream, "buffer", None)
+        self._lock = threading.Lock()
+
+        register_after_fork(self)
+
+    def write(self, line: bytes, levelno: int) -> None:  # noqa: ARG002
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.write(line)
+                self._buffer.flush()
+            else:
+                self._stream.write(line.decode(errors="backslashreplace"))
+                self._stream.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            (self._buffer or self._stream).flush()
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
+
+
+class BatchSink(Sink):
+    """
+    Buffer lines and write them in batches, `sys.stderr` by default.
+
+    The buffer is written once it holds `max_bytes` or `max_count` lines, or at the
+    latest `max_latency_s` after the oldest buffered line was added, by a background
+    thread. Lines with a level at or above `flush_level` are written right away, along
+    with the buffer, before `write` returns.
+
+    When the stream is backed by a file descriptor, batches are written with a single
+    `os.writev` call. Otherwise, they are joined and written to the stream's buffer.
+    """
+
+    def __init__(
+        self,
+        stream: IO[Any] | None = None,
+        *,
+        max_bytes: int,
+        max_count: int,
+        max_latency_s: float,
+        flush_level: int = logging.ERROR,
+    ) -> None:
+        stream = stream if stream is not None else sys.stderr
+
+        self._stream = stream
+        self._buffer: IO[bytes] | None = getattr(stream, "buffer", None)
+        self._fd = _get_fileno(stream)
+
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_latency_s = max_latency_s
+        self.flush_level = flush_level
+
+        self._lines: list[bytes] = []
+        self._size = 0
+        self._deadline = 0.0
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+
+        self._thread = self._start_thread()
+
+        atexit.register(self.close)
+        register_after_fork(self)
+
+    def write(self, line: bytes, levelno: int) -> None:
+        with self._lock:
+            if not self._lines:
+                self._deadline = time.monotonic() + self.max_latency_s
+                self._pending.notify()
+
+            self._lines.append(line)
+            self._size += len(line)
+
+            if (
+                levelno >= self.flush_level
+                or self._size >= self.max_bytes
+                or len(self._lines) >= self.max_count
+                or self._closed
+            ):
+                self._flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._flush()
+            self._pending.notify()
+
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _flush(self) -> None:
+        """Write the buffered lines. Must be called with the lock held."""
+        if not self._lines:
+            return
+
+        lines, self._lines, self._size = self._lines, [], 0
+
+        if self._fd is not None:
+            # Anything written to the stream by others must come first
+            self._stream.flush()
+            _writev(self._fd, lines)
+        elif self._buffer is not None:
+            self._buffer.write(b"".join(lines))
+            self._buffer.flush()
+        else:
+            self._stream.write(b"".join(lines).decode(errors="backslashreplace"))
+            self._stream.flush()
+
+    def _reset_after_fork(self) -> None:
+        self._lines = []
+        self._size = 0
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+
+        if not self._closed:
+            self._thread = self._start_thread()
+
+    def _start_thread(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self._run, name="acidrain-log-batch", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        with self._lock:
+            while not self._closed:
+                if not self._lines:
+                    self._pending.wait()
+                    continue
+
+                timeout = self._deadline - time.monotonic()
+                if timeout > 0:
+                    self._pending.wait(timeout)
+                    continue
+
+                # A batch that fails to be written is lost, not the next ones
+                with contextlib.suppress(Exception):
+                    self._flush()
+
+
+class QueueSink(Sink):
+    """
+    Hand lines to a bounded queue and write them to `target` from a background thread.
+
+    Callers never wait on the target's I/O. When the queue is full, the behavior depends
+    on `overflow_policy`:
+
+    - `block`: wait for space in the queue.
+    - `drop_newest`: drop the incoming line.
+    - `drop_oldest`: drop the oldest queued line that is not protected.
+
+    Lines with a level at or above `protected_level` are never dropped: if they can't
+    be queued, the caller waits. Dropped lines are counted by level name in
+    `dropped_events`.
+
+    The queue is drained and the thread stopped at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        target: Sink,
+        *,
+        max_size: int,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        protected_level: int = logging.ERROR,
+        close_timeout_s: float = 5.0,
+    ) -> None:
+        self.target = target
+        self.max_size = max_size
+        self.overflow_policy = overflow_policy
+        self.protected_level = protected_level
+        self.close_timeout_s = close_timeout_s
+
+        self._queue: deque[tuple[bytes, int]] = deque()
+        self._dropped: Counter[str] = Counter()
+        self._closed = False
+        self._writing = False
+
+        self._init_locks()
+        self._thread = self._start_thread()
+
+        atexit.register(self.close)
+        register_after_fork(self)
+
+    @property
+    def dropped_events(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._dropped)
+
+    def write(self, line: bytes, levelno: int) -> None:
+        with self._lock:
+            while not self._closed and len(self._queue) >= self.max_size:
+                if self._apply_overflow_policy(levelno):
+                    if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+                        return
+                    break
+
+                self._not_full.wait()
+
+            if self._closed:
+                # Late events, after the writer is gone, are written synchronously.
+                self.target.write(line, levelno)
+                return
+
+            self._queue.append((line, levelno))
+            self._not_empty.notify()
+
+    def flush(self) -> None:
+        """Wait for the queued lines to be written, then flush the target."""
+        with self._lock:
+            while (self._queue or self._writing) and self._thread.is_alive():
+                self._drained.wait(timeout=self.close_timeout_s)
+
+        self.target.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+        self._thread.join(timeout=self.close_timeout_s)
+        self.target.close()
+        atexit.unregister(self.close)
+
+    def _apply_overflow_policy(self, levelno: int) -> bool:
+        """
+        Try to resolve a full queue without waiting.
+
+        Must be called with the lock held. Returns `False` if the caller has to wait.
+        """
+        if self.overflow_policy == OverflowPolicy.DROP_NEWEST:
+            if levelno < self.protected_level:
+                self._dropped[logging.getLevelName(levelno)] += 1
+                return True
+
+        elif self.overflow_policy == OverflowPolicy.DROP_OLDEST:
+            for idx, (_, queued_levelno) in enumerate(self._queue):
+                if queued_levelno < self.protected_level:
+                    del self._queue[idx]
+                    self._dropped[logging.getLevelName(queued_levelno)] += 1
+                    return True
+
+        return False
+
+    def _reset_after_fork(self) -> None:
+        # The target resets itself
+        self._queue.clear()
+        self._writing = False
+
+        self._init_locks()
+        if not self._closed:
+            self._thread = self._start_thread()
+
+    def _init_locks(self) -> None:
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+
+    def _start_thread(self) -> threading.Thread:
+        thread = threading.Thread(
+            target=self._run, name="acidrain-log-writer", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+
+                if not self._queue:
+                    return
+
+                batch = list(self._queue)
+                self._queue.clear()
+                self._writing = True
+                self._not_full.notify_all()
+
+            for line, levelno in batch:
+                try:
+                    self.target.write(line, levelno)
+                except Exception:  # noqa: BLE001 -> Counted as dropped instead
+                    with self._lock:
+                        self._dropped[logging.getLevelName(levelno)] += 1
+
+            with self._lock:
+                self._writing = False
+                if not self._queue:
+                    self._drained.notify_all()
+
+
+class FunnelSink(Sink):
+    """
+    Funnel the lines of the processes forked from this one to a single writer.
+
+    Lines written in this process go to `target` directly, and a background thread
+    writes the ones received from the children. Forked processes, like the Celery
+    prefork pool or gunicorn workers, buffer their lines instead, and send them in
+    batches, each as a single datagram over a Unix socket: batches never interleave,
+    whatever their size.
+
+    A batch is sent once it holds `max_bytes`, or at the latest `max_latency_s` after
+    its oldest line. Lines with a level at or above `flush_level` are sent right away,
+    along with the batch. When the parent can't keep up, batches are dropped, unless
+    they hold such a line, in which case the child waits. The number of dropped lines
+    is reported with the next batch, and counted in `dropped_lines`. Lines too large
+    for a datagram, or that can't be sent at all, are written to `target` by the child.
+
+    Must be created before forking. One created in a child of a funnel, when its logging
+    is configured again, sends its lines to the same parent, in batches of at most the
+    parent's `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        target: Sink,
+        *,
+        max_bytes: int,
+        max_latency_s: float,
+        flush_level: int = logging.ERROR,
+    ) -> None:
+        self.target = target
+        self.max_bytes = max_bytes
+        self.max_latency_s = max_latency_s
+        self.flush_level = flush_level
+
+        self._reader: socket.socket
+        self._writer: socket.socket
+
+        inherited = _get_inherited_funnel()
+        if inherited is not None:
+            # The parent reads datagrams of up to its own max_bytes
+            self.max_bytes = min(max_bytes, inherited.max_bytes)
+            self._reader = inherited._reader  # noqa: SLF001
+            self._writer = inherited._writer.dup()  # noqa: SLF001
+            self._in_child = True
+        else:
+            self._reader, self._writer = socket.socketpair(
+                socket.AF_UNIX, socket.SOCK_DGRAM
+            )
+            with contextlib.suppress(OSError):
+                self._writer.setsockopt(
+                    socket.SOL_SOCKET,
+                    socket.SO_SNDBUF,
+                    2 * (max_bytes + _FUNNEL_HEADER.size),
+                )
+            self._in_child = False
+
+        self._dropped = 0
+
+        # Batch of a child process
+        self._lines: list[bytes] = []
+        self._levels: list[int] = []
+        self._size = 0
+        self._deadline = 0.0
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+
+        self._thread = self._start_thread(
+            self._run_sender if self._in_child else self._run_reader
+        )
+
+        atexit.register(self.close)
+        register_after_fork(self)
+        _funnels.add(self)
+
+    @property
+    def is_inherited(self) -> bool:
+        """Whether the sink is open, in a child sending its lines to the parent."""
+        return self._in_child and not self._closed
+
+    @property
+    def dropped_lines(self) -> int:
+        """Lines dropped by the children, or by this process if it's a child."""
+        with self._lock:
+            return self._dropped
+
+    def write(self, line: bytes, levelno: int) -> None:
+        if not self._in_child:
+            self.target.write(line, levelno)
+            return
+
+        if len(line) > self.max_bytes:
+            self.target.write(line, levelno)
+            return
+
+        with self._lock:
+            if self._size + len(line) > self.max_bytes:
+                self._send()
+
+            if not self._lines:
+                self._deadline = time.monotonic() + self.max_latency_s
+                self._pending.notify()
+
+            self._lines.append(line)
+            self._levels.append(levelno)
+            self._size += len(line)
+
+            if levelno >= self.flush_level or self._closed:
+                self._send()
+
+    def flush(self) -> None:
+        if self._in_child:
+            with self._lock:
+                self._send(block=True)
+
+        self.target.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+
+            self._closed = True
+            if self._in_child:
+                self._send(block=True)
+                self._pending.notify()
+
+        if not self._in_child:
+            # Wakes the reader up, once it has written what was sent before
+            self._writer.send(b"")
+
+        self._thread.join(timeout=5)
+        self.target.close()
+        atexit.unregister(self.close)
+
+    def _send(self, *, block: bool = False) -> None:
+        """Send the batch to the parent. Must be called with the lock held."""
+        if not self._lines:
+            return
+
+        levelno = max(self._levels)
+        header = _FUNNEL_HEADER.pack(min(levelno, 255), self._dropped)
+        payload = b"".join(self._lines)
+
+        try:
+            if block or levelno >= self.flush_level:
+                self._writer.send(header + payload)
+            else:
+                self._writer.send(header + payload, socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            self._dropped += len(self._lines)
+        except OSError:
+            # Too large, or the parent is gone
+            self.target.write(payload, levelno)
+        else:
+            self._dropped = 0
+
+        self._lines, self._levels, self._size = [], [], 0
+
+    def _reset_after_fork(self) -> None:
+        self._in_child = True
+        self._dropped = 0
+        self._lines, self._levels, self._size = [], [], 0
+
+        self._lock = threading.Lock()
+        self._pending = threading.Condition(self._lock)
+
+        # Only the parent reads
+        self._reader.close()
+
+        if not self._closed:
+            self._thread = self._start_thread(self._run_sender)
+
+    def _start_thread(self, target: Callable[[], None]) -> threading.Thread:
+        thread = threading.Thread(
+            target=target, name="acidrain-log-funnel", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _run_reader(self) -> None:
+        max_size = self.max_bytes + _FUNNEL_HEADER.size
+
+        while True:
+            data = self._reader.recv(max_size)
+            if not data:
+                if self._closed:
+                    return
+                continue
+
+            levelno, dropped = _FUNNEL_HEADER.unpack_from(data)
+            if dropped:
+                with self._lock:
+                    self._dropped += dropped
+
+            # Lost, like the lines of the parent failing to be written
+            with contextlib.suppress(Exception):
+                self.target.write(data[_FUNNEL_HEADER.size :], levelno)
+
+    def _run_sender(self) -> None:
+        with self._lock:
+            while not self._closed:
+                if not self._lines:
+                    self._pending.wait()
+                    continue
+
+                timeout = self._deadline - time.monotonic()
+                if timeout > 0:
+                    self._pending.wait(timeout)
+                    continue
+
+                # Kept for the next batch, if they failed to be written
+                with contextlib.suppress(Exception):
+                    self._send()
+
+
+def _get_inherited_funnel() -> FunnelSink | None:
+    """Return the open `FunnelSink` this process inherited from its parent, if any."""
+    for funnel in _funnels:
+        if funnel.is_inherited:
+            return funnel
+
+    return None
+
+
+def _get_fileno(stream: IO[Any]) -> int | None:
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
+
+
+def _writev(fd: int, lines: list[bytes]) -> None:
+    """Write all the lines to the file descriptor, with as few calls as possible."""
+    if not hasattr(os, "writev"):  # pragma: no cover: Not available on Windows
+        os.write(fd, b"".join(lines))
+        return
+
+    iov_max = os.sysconf("SC_IOV_MAX")
+    views = [memoryview(line) for line in lines]
+    idx = 0
+
+    while idx < len(views):
+        written = os.writev(fd, views[idx : idx + iov_max])
+
+        # Skip what was written. There can be a partial write, in which case we resume
+        # in the middle of a line.
+        while idx < len(views) and written >= len(views[idx]):
+            written -= len(views[idx])
+            idx += 1
+
+        if written:
+            views[idx] = views[idx][written:]
+
+
+class SinkHandler(logging.Handler):
+    """
+    Logging handler that formats records and hands the lines to a `Sink`.
+
+    Unlike `logging.StreamHandler`, the handler lock is not held while formatting: sinks
+    are responsible for their own synchronization.
+
+    With a `BytesProcessorFormatter`, the rendered bytes are handed to the sink as is.
+    Other formatters produce a `str`, which is encoded and terminated.
+    """
+
+    terminator = b"\n"
+
+    def __init__(self, sink: Sink, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self.sink = sink
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        rv = bool(self.filter(record))
+        if rv:
+            self.emit(record)
+
+        return rv
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.sink.write(self.format_line(record), record.levelno)
+        except DropEvent:
+            # Dropped by a pre-processor, like the rate limiter
+            return
+        except RecursionError:  # pragma: no cover: same as logging.StreamHandler
+            raise
+        except Exception:  # noqa: BLE001
+            self.handleError(record)
+
+    def format_line(self, record: logging.LogRecord) -> bytes:
+        if isinstance(self.formatter, BytesProcessorFormatter):
+            return self.formatter.format_bytes(record)
+
+        line = self.format(record).encode(errors="backslashreplace")
+        return line + self.terminator
+
+    def flush(self) -> None:
+        self.sink.flush()
+
+    def close(self) -> None:
+        self.sink.close()
+        super().close()
@@ -5,15 +5,117 @@ from polyfactory import Use
 from polyfactory.factories.pydantic_factory import ModelFactory
 
 from acidrain_logging import LogConfig
-from acidrain_logging.config import DatadogSettings
+from acidrain_logging.config import (
+    AccessLogSettings,
+    BatchSettings,
+    DatadogSettings,
+    ExceptionFormat,
+    ExceptionSettings,
+    FlightRecorderSettings,
+    FunnelSettings,
+    LevelElevationSettings,
+    LogControlSettings,
+    QueueSettings,
+    RateLimitSettings,
+    TaskLogSettings,
+    TraceIdFormat,
+    TraceIdSettings,
+)
 
 EmptyDictFactory: Use[Any, dict[Any, Any]] = Use(dict)
+EmptySetFactory: Use[Any, set[Any]] = Use(set)
 
 
 class DatadogSettingsFactory(ModelFactory[DatadogSettings]):
     __model__ = DatadogSettings
 
 
+class QueueSettingsFactory(ModelFactory[QueueSettings]):
+    __model__ = QueueSettings
+
+    enabled = False
+    protected_level = "ERROR"
+
+
+class BatchSettingsFactory(ModelFactory[BatchSettings]):
+    __model__ = BatchSettings
+
+    enabled = False
+    flush_level = "ERROR"
+
+
+class FunnelSettingsFactory(ModelFactory[FunnelSettings]):
+    __model__ = FunnelSettings
+
+    enabled = False
+    flush_level = "ERROR"
+
+
+class RateLimitSettingsFactory(ModelFactory[RateLimitSettings]):
+    __model__ = RateLimitSettings
+
+    enabled = False
+
+
+class ExceptionSettingsFactory(ModelFactory[ExceptionSettings]):
+    __model__ = ExceptionSettings
+
+    format = ExceptionFormat.TEXT
+    show_locals = False
+
+
+class FlightRecorderSettingsFactory(ModelFactory[FlightRecorderSettings]):
+    __model__ = FlightRecorderSettings
+
+    enabled = False
+    level = "DEBUG"
+
+
+class LevelElevationSettingsFactory(ModelFactory[LevelElevationSettings]):
+    __model__ = LevelElevationSettings
+
+    enabled = False
+    level = "DEBUG"
+
+
+class LogControlSettingsFactory(ModelFactory[LogControlSettings]):
+    __model__ = LogControlSettings
+
+    levels_file = None
+    signal = "SIGUSR2"
+    socket_path = None
+
+
+class AccessLogSettingsFactory(ModelFactory[AccessLogSettings]):
+    __model__ = AccessLogSettings
+
+    default_sample_rate = 1.0
+    sample_rates = EmptyDictFactory
+    exclude = EmptySetFactory
+    always_log_status = 500
+    always_log_slower_than_ms = None
+    aggregate = False
+
+
+class TaskLogSettingsFactory(ModelFactory[TaskLogSettings]):
+    __model__ = TaskLogSettings
+
+    default_sample_rate = 1.0
+    sample_rates = EmptyDictFactory
+    sample_every = EmptyDictFactory
+    always_log_slower_than_ms = None
+    aggregate = False
+    args_allow = EmptyDictFactory
+    args_deny = EmptyDictFactory
+
+
+class TraceIdSettingsFactory(ModelFactory[TraceIdSettings]):
+    __model__ = TraceIdSettings
+
+    format = TraceIdFormat.UUID
+    from_datadog = False
+
+
 class LogConfigFactory(ModelFactory[LogConfig]):
     __model__ = LogConfig
 
@@ -23,7 +125,20 @@ class LogConfigFactory(ModelFactory[LogConfig]):
         )
     )
     logger_levels = EmptyDictFactory
+    static_fields = EmptyDictFactory
     # TODO: check if needed
     timestamp_key = "timestamp"
     timestamp_fmt = "iso"
+    fast_path = False
     datadog = DatadogSettingsFactory
+    queue = QueueSettingsFactory
+    batching = BatchSettingsFactory
+    funnel = FunnelSettingsFactory
+    rate_limit = RateLimitSettingsFactory
+    exceptions = ExceptionSettingsFactory
+    flight_recorder = FlightRecorderSettingsFactory
+    level_elevation = LevelElevationSettingsFactory
+    control = LogControlSettingsFactory
+    access_log = AccessLogSettingsFactory
+    task_log = TaskLogSettingsFactory
+    trace_id = TraceIdSettingsFactory
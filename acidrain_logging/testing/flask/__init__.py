@@ -31,6 +31,6 @@ def create_app(log_config: LogConfig | None = None) -> Flask:
     log_config = log_config or LogConfig()
 
     configure_logger(log_config)
-    add_log_middlewares(app)
+    add_log_middlewares(app, log_config)
 
     return app
@@ -0,0 +1,144 @@
+"""
+Trace ids, for the requests and the published tasks that don't come with one.
+
+`new_trace_id` returns an id from the generator set up by `configure_trace_ids`, which
+`configure_logger` calls with the `trace_id` settings. By default, ids are random UUIDs
+(version 4), like `str(uuid4())` but without a system call and a `UUID` object per id.
+"""
+
+import os
+from collections.abc import Callable
+from uuid import UUID
+
+from acidrain_logging._fork import register_after_fork
+from acidrain_logging.config import TraceIdFormat, TraceIdSettings
+
+try:
+    from ddtrace.trace import tracer
+except ImportError:  # pragma: no cover
+    tracer = None  # type: ignore[assignment]
+
+TraceIdGenerator = Callable[[], str]
+
+
+# Digit of the variant 1 for any random hex digit, by keeping its two lowest bits
+_UUID_VARIANTS = {digit: "89ab"[int(digit, 16) & 3] for digit in "0123456789abcdef"}
+
+
+def _format_uuid(digits: str) -> str:
+    # Version 4, variant 1, like `uuid4`
+    return (
+        f"{digits[:8]}-{digits[8:12]}-4{digits[13:16]}-"
+        f"{_UUID_VARIANTS[digits[16]]}{digits[17:20]}-{digits[20:32]}"
+    )
+
+
+def _format_hex(digits: str) -> str:
+    return digits
+
+
+def _format_traceparent(digits: str) -> str:
+    # Version 00, sampled
+    return f"00-{digits[:32]}-{digits[32:48]}-01"
+
+
+# Number of random bytes per id, and how they're turned into an id
+_FORMATTERS: dict[TraceIdFormat, tuple[int, Callable[[str], str]]] = {
+    TraceIdFormat.UUID: (16, _format_uuid),
+    TraceIdFormat.HEX: (16, _format_hex),
+    TraceIdFormat.TRACEPARENT: (24, _format_traceparent),
+}
+
+
+class RandomTraceIdGenerator:
+    """
+    Generate random trace ids, in the given format.
+
+    Ids are generated in batches of `batch_size`, from a single `os.urandom` call, and
+    handed out one by one. Taking one from the batch is atomic, so the generator can be
+    shared by threads without a lock. Batches are dropped in forked processes, so that
+    they don't hand out the same ids as their parent.
+    """
+
+    def __init__(
+        self, fmt: TraceIdFormat = TraceIdFormat.UUID, *, batch_size: int = 256
+    ) -> None:
+        self.fmt = fmt
+        self.batch_size = batch_size
+
+        self._size, self._formatter = _FORMATTERS[fmt]
+        self._ids: list[str] = []
+
+        register_after_fork(self)
+
+    def __call__(self) -> str:
+        while True:
+            try:
+                return self._ids.pop()
+            except IndexError:
+                self._refill()
+
+    def _refill(self) -> None:
+        digits = os.urandom(self._size * self.batch_size).hex()
+        width = self._size * 2
+        formatter = self._formatter
+
+        # Threads refilling at the same time each replace the batch: some ids are
+        # skipped, none are handed out twice.
+        self._ids = [
+            formatter(digits[i : i + width]) for i in range(0, len(digits), width)
+        ]
+
+    def clear(self) -> None:
+        """Drop the current batch."""
+        self._ids = []
+
+    def _reset_after_fork(self) -> None:
+        self.clear()
+
+
+class DatadogTraceIdGenerator:
+    """
+    Reuse the id of the active Datadog trace, if any, in the given format.
+
+    Otherwise, the id comes from `fallback`.
+    """
+
+    def __init__(self, fmt: TraceIdFormat, fallback: TraceIdGenerator) -> None:
+        self.fmt = fmt
+        self.fallback = fallback
+
+    def __call__(self) -> str:
+        span = tracer and tracer.current_span()
+        if not span:
+            return self.fallback()
+
+        if self.fmt == TraceIdFormat.TRACEPARENT:
+            return f"00-{span.trace_id:032x}-{span.span_id:016x}-01"
+
+        digits = f"{span.trace_id:032x}"
+        if self.fmt == TraceIdFormat.UUID:
+            # Not a version 4 UUID, but the same trace id as Datadog's
+            return str(UUID(digits))
+
+        return digits
+
+
+def get_trace_id_generator(settings: TraceIdSettings) -> TraceIdGenerator:
+    generator: TraceIdGenerator = RandomTraceIdGenerator(settings.format)
+    if settings.from_datadog and tracer is not None:
+        generator = DatadogTraceIdGenerator(settings.format, generator)
+
+    return generator
+
+
+_generator: TraceIdGenerator = RandomTraceIdGenerator()
+
+
+def configure_trace_ids(settings: TraceIdSettings) -> None:
+    global _generator  # noqa: PLW0603
+    _generator = get_trace_id_generator(settings)
+
+
+def new_trace_id() -> str:
+    return _generator()
@@ -0,0 +1,178 @@
+"""
+Formatting of the exceptions of the events, from a cache of their tracebacks.
+
+The text of a traceback only depends on the code locations the exception went through:
+its frames are formatted once, with the source lines looked up, and cached per
+exception type and locations. Only the message of the exception, and the messages of
+the exceptions it was chained to, are formatted per event.
+"""
+
+import threading
+import traceback
+from collections import OrderedDict
+from types import CodeType, TracebackType
+
+from structlog.typing import ExcInfo
+
+from acidrain_logging._fork import register_after_fork
+
+_CAUSE_MESSAGE = (
+    "\nThe above exception was the direct cause of the following exception:\n\n"
+)
+_CONTEXT_MESSAGE = (
+    "\nDuring handling of the above exception, another exception occurred:\n\n"
+)
+
+# Per chained exception: its type, the message introducing it and the locations it went
+# through, as code objects and offsets of their last instruction.
+TracebackKey = tuple[
+    tuple[type[BaseException], str | None, tuple[tuple[CodeType, int], ...]], ...
+]
+
+
+def format_exception(exc_info: ExcInfo) -> str:
+    """Format an exception like `structlog.processors.format_exc_info`."""
+    return "".join(traceback.format_exception(*exc_info)).removesuffix("\n")
+
+
+def _get_chain(exc: BaseException) -> list[tuple[BaseException, str | None]] | None:
+    """
+    Return the chained exceptions in the order they are printed, with their message.
+
+    Return None for the exceptions that aren't formatted as a simple chain: exception
+    groups and cycles.
+    """
+    chain: list[tuple[BaseException, str | None]] = []
+    seen: set[int] = set()
+
+    current: BaseException | None = exc
+    while current is not None:
+        if isinstance(current, BaseExceptionGroup) or id(current) in seen:
+            return None
+        seen.add(id(current))
+
+        if current.__cause__ is not None:
+            chain.append((current, _CAUSE_MESSAGE))
+            current = current.__cause__
+        elif current.__context__ is not None and not current.__suppress_context__:
+            chain.append((current, _CONTEXT_MESSAGE))
+            current = current.__context__
+        else:
+            chain.append((current, None))
+            current = None
+
+    chain.reverse()
+    return chain
+
+
+def _get_locations(tb: TracebackType | None) -> tuple[tuple[CodeType, int], ...]:
+    locations = []
+    while tb is not None:
+        locations.append((tb.tb_frame.f_code, tb.tb_lasti))
+        tb = tb.tb_next
+
+    return tuple(locations)
+
+
+def _format_exception_only(exc: BaseException) -> str:
+    """
+    Format the last line of a traceback, like `traceback.format_exception_only`.
+
+    That one would extract the stacks of the exceptions chained to `exc`, to ignore
+    them: it's only used for the exceptions formatted with more than a message.
+    """
+    exc_type = type(exc)
+    name = exc_type.__qualname__
+    module = exc_type.__module__
+
+    try:
+        value = str(exc)
+    except Exception:  # noqa: BLE001
+        value = None
+
+    if (
+        value is None
+        or issubclass(exc_type, SyntaxError)
+        or getattr(exc, "__notes__", None) is not None
+        or not isinstance(module, str)
+    ):
+        return "".join(traceback.format_exception_only(exc_type, exc))
+
+    if module not in {"__main__", "builtins"}:
+        name = f"{module}.{name}"
+
+    return f"{name}: {value}\n" if value else f"{name}\n"
+
+
+def _format_stacks(exc: BaseException) -> list[str]:
+    """Format the traceback of each chained exception, in the order they are printed."""
+    stacks = []
+
+    te: traceback.TracebackException | None = traceback.TracebackException(
+        type(exc), exc, exc.__traceback__, compact=True
+    )
+    while te is not None:
+        if te.stack:
+            stacks.append(
+                "Traceback (most recent call last):\n" + "".join(te.stack.format())
+            )
+        else:
+            stacks.append("")
+
+        te = te.__cause__ or te.__context__
+
+    stacks.reverse()
+    return stacks
+
+
+class CachedExceptionFormatter:
+    """
+    Format exceptions like `structlog.processors.format_exc_info`, with a cache.
+
+    The formatted tracebacks of the `max_size` most recently logged exception types and
+    code locations are kept, in LRU order.
+    """
+
+    __slots__ = ("__weakref__", "_cache", "_lock", "max_size")
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+
+        self._cache: OrderedDict[TracebackKey, list[str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        register_after_fork(self)
+
+    def __call__(self, exc_info: ExcInfo) -> str:
+        exc = exc_info[1]
+        chain = _get_chain(exc) if exc is not None else None
+        if exc is None or chain is None:
+            return format_exception(exc_info)
+
+        key = tuple(
+            (type(e), message, _get_locations(e.__traceback__)) for e, message in chain
+        )
+
+        with self._lock:
+            stacks = self._cache.get(key)
+            if stacks is not None:
+                self._cache.move_to_end(key)
+
+        if stacks is None:
+            stacks = _format_stacks(exc)
+            with self._lock:
+                self._cache[key] = stacks
+                if len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        parts: list[str] = []
+        for (e, message), stack in zip(chain, stacks, strict=True):
+            if message is not None:
+                parts.append(message)
+            parts.append(stack)
+            parts.append(_format_exception_only(e))
+
+        return "".join(parts).removesuffix("\n")
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.Lock()
@@ -0,0 +1,182 @@
+"""
+Values truncated when they are rendered, for the arguments of the Celery tasks.
+
+A `BoundedValue` wraps a value as is. It is only walked when the log line is rendered,
+through `__structlog__` for the JSON renderer or `__repr__` for the console one, and
+the walk builds the truncated copy directly, stopping once the limits are reached:
+nothing is copied up front, and nothing at all for the lines that are filtered out.
+"""
+
+from collections.abc import Collection, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, time
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+from acidrain_logging.config import TaskLogSettings
+
+# Rendered as is, for about the size of their `str`
+_SCALAR_TYPES = (type(None), bool, int, float, date, time, UUID, Enum)
+_EXACT_SCALAR_TYPES = frozenset((type(None), bool, int, float))
+
+
+@dataclass(frozen=True)
+class ValueLimits:
+    """
+    Limits of a truncated value.
+
+    Containers nested deeper than `max_depth` are replaced by a description, and only
+    the first `max_length` items of a container are kept. `max_bytes` is a budget for
+    the whole value, counted in characters of JSON, roughly: once spent, strings are
+    cut and no more items are added.
+    """
+
+    max_depth: int
+    max_length: int
+    max_bytes: int
+
+
+class _Truncator:
+    """Walk a value once, spending the byte budget as it goes."""
+
+    __slots__ = ("max_depth", "max_length", "remaining")
+
+    def __init__(self, limits: ValueLimits) -> None:
+        self.max_depth = limits.max_depth
+        self.max_length = limits.max_length
+        self.remaining = limits.max_bytes
+
+    def walk(self, value: Any, depth: int) -> Any:  # noqa: ANN401
+        cls = type(value)
+        # Exact types first, the most common by far
+        if cls is str:
+            return self.walk_str(value)
+        if cls in _EXACT_SCALAR_TYPES:
+            self.remaining -= len(str(value))
+            return value
+        if cls is dict:
+            return self.walk_mapping(value, depth)
+        if cls is list or cls is tuple:
+            return self.walk_collection(value, depth)
+
+        return self.walk_other(value, depth)
+
+    def walk_other(self, value: Any, depth: int) -> Any:  # noqa: ANN401
+        if isinstance(value, str):
+            return self.walk_str(value)
+        if isinstance(value, _SCALAR_TYPES):
+            self.remaining -= len(str(value))
+            return value
+        if isinstance(value, Mapping):
+            return self.walk_mapping(value, depth)
+        if isinstance(value, list | tuple | set | frozenset):
+            return self.walk_collection(value, depth)
+
+        # Anything else is rendered like the JSON renderer would, as a string
+        return self.walk_str(repr(value))
+
+    def walk_mapping(self, value: Mapping[Any, Any], depth: int) -> Any:  # noqa: ANN401
+        if depth >= self.max_depth:
+            return f"<{type(value).__name__} of {len(value)} items>"
+
+        result: dict[str, Any] = {}
+        max_length = self.max_length
+        for i, (key, item) in enumerate(value.items()):
+            if i >= max_length or self.remaining <= 0:
+                result["..."] = f"{len(value) - i} more"
+                break
+
+            # Quotes, colon and comma
+            str_key = key if type(key) is str else str(key)
+            self.remaining -= len(str_key) + 4
+            result[str_key] = self.walk(item, depth + 1)
+
+        return result
+
+    def walk_collection(self, value: Collection[Any], depth: int) -> Any:  # noqa: ANN401
+        if depth >= self.max_depth:
+            return f"<{type(value).__name__} of {len(value)} items>"
+
+        items: list[Any] = []
+        max_length = self.max_length
+        for i, item in enumerate(value):
+            if i >= max_length or self.remaining <= 0:
+                items.append(f"... {len(value) - i} more")
+                break
+
+            # Comma
+            self.remaining -= 1
+            items.append(self.walk(item, depth + 1))
+
+        return items
+
+    def walk_str(self, value: str) -> str:
+        size = max(self.remaining - 2, 0)
+        self.remaining -= len(value) + 2
+        if len(value) <= size:
+            return value
+
+        return f"{value[:size]}... {len(value) - size} more chars"
+
+
+def truncate(value: Any, limits: ValueLimits) -> Any:  # noqa: ANN401
+    """Return a copy of `value` within `limits`, as lists, dicts and scalars."""
+    return _Truncator(limits).walk(value, 0)
+
+
+class BoundedValue:
+    """Value rendered truncated to `limits`, see `truncate`."""
+
+    __slots__ = ("limits", "value")
+
+    def __init__(self, value: Any, limits: ValueLimits) -> None:  # noqa: ANN401
+        self.value = value
+        self.limits = limits
+
+    def __structlog__(self) -> Any:  # noqa: ANN401
+        return truncate(self.value, self.limits)
+
+    def __repr__(self) -> str:
+        return repr(self.__structlog__())
+
+
+class TaskArgsFormatter:
+    """
+    Prepare the arguments of a task for its logs, from its name.
+
+    See `TaskLogSettings` for the allow and deny lists. They are applied right away,
+    to the keyword arguments only, without a copy for the tasks that have none. The
+    arguments are then truncated when rendered, see `BoundedValue`.
+    """
+
+    __slots__ = ("_allow", "_deny", "_limits")
+
+    def __init__(self, settings: TaskLogSettings) -> None:
+        self._allow = settings.args_allow
+        self._deny = settings.args_deny
+        self._limits = ValueLimits(
+            max_depth=settings.args_max_depth,
+            max_length=settings.args_max_length,
+            max_bytes=settings.args_max_bytes,
+        )
+
+    def format(
+        self, task_name: str, args: Sequence[Any], kwargs: Mapping[str, Any]
+    ) -> tuple[BoundedValue | None, BoundedValue | None]:
+        """Return the args and kwargs to log, None for the hidden ones."""
+        allowed = self._allow.get(task_name)
+        denied = self._deny.get(task_name)
+
+        if denied is not None:
+            if "*" in denied:
+                return None, None
+
+            kwargs = {k: v for k, v in kwargs.items() if k not in denied}
+
+        if allowed is not None:
+            # Positional arguments have no name to be allowed by
+            kwargs = {k: v for k, v in kwargs.items() if k in allowed}
+            return None, BoundedValue(kwargs, self._limits)
+
+        return BoundedValue(args, self._limits), BoundedValue(kwargs, self._limits)
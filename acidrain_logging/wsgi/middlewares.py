@@ -0,0 +1,222 @@
+import time
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
+from typing import TYPE_CHECKING, Any
+from urllib.parse import parse_qsl
+
+import structlog
+from structlog.stdlib import BoundLogger
+
+from acidrain_logging.access_log import ResponseData, get_elapsed_ms
+from acidrain_logging.aggregation import create_aggregator
+from acidrain_logging.config import AccessLogSettings
+from acidrain_logging.context import bind_contextvars, clear_contextvars
+from acidrain_logging.levels import (
+    get_level_header,
+    parse_level_header,
+    set_elevated_level,
+)
+from acidrain_logging.recorder import FlightRecorder, start_recording, stop_recording
+from acidrain_logging.sampling import AccessLogSampler
+from acidrain_logging.trace_ids import new_trace_id
+
+if TYPE_CHECKING:
+    from _typeshed import OptExcInfo
+    from _typeshed.wsgi import StartResponse, WSGIApplication, WSGIEnvironment
+
+log: BoundLogger = structlog.get_logger()
+
+# Set by the framework integrations, like Flask's, for the access log: the template of
+# the matched route and the path params.
+ROUTE_ENVIRON_KEY = "acidrain_logging.route"
+PATH_PARAMS_ENVIRON_KEY = "acidrain_logging.path_params"
+
+
+class LogMiddleware:
+    """
+    WSGI middleware resetting the context, binding the trace id and logging requests.
+
+    Works with any WSGI app. The trace id is read from the environ as is, and the
+    request is logged once the server closes the response iterable, so the timing
+    covers the streaming of the body, whose size is counted on the way. Files returned
+    with the server's `wsgi.file_wrapper` are passed through as is, for the server to
+    send them efficiently: those requests are logged as soon as the app returns.
+
+    Which requests are logged, or aggregated, is decided by the `access_log` settings,
+    before building anything for the log. With the flight recorder enabled, the
+    verbose events of the request are logged before it if it failed, see
+    `acidrain_logging.recorder`. With the level elevation enabled, the level of the
+    request is raised from its header, see `acidrain_logging.levels`.
+    """
+
+    def __init__(
+        self, app: "WSGIApplication", access_log: AccessLogSettings | None = None
+    ) -> None:
+        access_log = access_log or AccessLogSettings()
+
+        self.app = app
+        self.sampler = AccessLogSampler(access_log)
+        self.aggregator = create_aggregator(access_log)
+
+    def __call__(
+        self, environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> Iterable[bytes]:
+        start_time = time.perf_counter()
+
+        clear_contextvars()
+        bind_contextvars(trace_id=environ.get("HTTP_X_TRACE_ID") or new_trace_id())
+        level_header = get_level_header()
+        if level_header is not None:
+            set_elevated_level(
+                parse_level_header(environ.get(_environ_key(level_header)))
+            )
+        recorder = start_recording()
+
+        response = ResponseData(start_time)
+
+        def _start_response(
+            status: str,
+            headers: list[tuple[str, str]],
+            exc_info: "OptExcInfo | None" = None,
+        ) -> Callable[[bytes], object]:
+            response.status_code = int(status[:3])
+            response.headers_time = time.perf_counter()
+            write = start_response(status, headers, exc_info)
+
+            def _write(data: bytes) -> object:
+                response.bytes_sent += len(data)
+                return write(data)
+
+            return _write
+
+        try:
+            iterable = self.app(environ, _start_response)
+        except BaseException:
+            self._log_request(environ, response, recorder, failed=True)
+            raise
+
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if isinstance(file_wrapper, type) and isinstance(iterable, file_wrapper):
+            self._log_request(environ, response, recorder)
+            return iterable
+
+        return _ResponseIterable(
+            iterable,
+            response,
+            partial(self._log_request, environ, response, recorder),
+        )
+
+    def _log_request(
+        self,
+        environ: "WSGIEnvironment",
+        response: ResponseData,
+        recorder: FlightRecorder | None,
+        *,
+        failed: bool = False,
+    ) -> None:
+        if response.logged:
+            return
+
+        response.logged = True
+        elapsed_ms = get_elapsed_ms(response.start_time, time.perf_counter())
+
+        stop_recording(
+            recorder,
+            failed=failed or response.status_code >= 500,  # noqa: PLR2004
+            elapsed_ms=elapsed_ms,
+        )
+
+        method = environ["REQUEST_METHOD"]
+        route = environ.get(ROUTE_ENVIRON_KEY)
+
+        if self.aggregator is not None:
+            self.aggregator.record(method, route, response.status_code, elapsed_ms)
+
+        if not self.sampler.should_log(route, response.status_code, elapsed_ms):
+            return
+
+        path = get_path(environ)
+        msg = f"{method} {path} {response.status_code}"
+
+        log.info(
+            msg, http=get_request_data(environ, path, response.to_dict(elapsed_ms))
+        )
+
+
+class _ResponseIterable:
+    """
+    Count the bytes of the response, and call `log_request` once it's closed.
+
+    If iterating over the response fails, it is called right away, with `failed`.
+    """
+
+    __slots__ = ("_iterable", "_log_request", "_response")
+
+    def __init__(
+        self,
+        iterable: Iterable[bytes],
+        response: ResponseData,
+        log_request: Callable[..., None],
+    ) -> None:
+        self._iterable = iterable
+        self._response = response
+        self._log_request = log_request
+
+    def __iter__(self) -> Iterator[bytes]:
+        response = self._response
+        try:
+            for chunk in self._iterable:
+                response.bytes_sent += len(chunk)
+                yield chunk
+        except Exception:
+            self._log_request(failed=True)
+            raise
+
+    def close(self) -> None:
+        try:
+            close = getattr(self._iterable, "close", None)
+            if close is not None:
+                close()
+        finally:
+            self._log_request()
+
+
+def _environ_key(header: str) -> str:
+    return f"HTTP_{header.upper().replace('-', '_')}"
+
+
+def get_path(environ: "WSGIEnvironment") -> str:
+    # PEP 3333 strings are bytes decoded as latin-1
+    path: str = environ.get("PATH_INFO", "")
+    return "/" + path.encode("latin-1").decode(errors="replace").lstrip("/")
+
+
+def get_request_data(
+    environ: "WSGIEnvironment", path: str, response_data: dict[str, Any]
+) -> dict[str, Any]:
+    host = environ.get("HTTP_HOST") or environ.get("SERVER_NAME", "")
+
+    query_params: dict[str, str] = {}
+    for key, value in parse_qsl(
+        environ.get("QUERY_STRING", ""), keep_blank_values=True
+    ):
+        # Like Flask's `request.args`, keep the first value
+        query_params.setdefault(key, value)
+
+    return {
+        "method": environ["REQUEST_METHOD"],
+        "client": {
+            "remote_ip": environ.get("REMOTE_ADDR"),
+            "user_agent": environ.get("HTTP_USER_AGENT"),
+        },
+        "request": {
+            "path_params": environ.get(PATH_PARAMS_ENVIRON_KEY),
+            "query_params": query_params,
+        },
+        "url": {
+            "host": host.split(":")[0],
+            "path": path,
+            "scheme": environ.get("wsgi.url_scheme"),
+        },
+        "response": response_data,
+    }
@@ -0,0 +1,65 @@
+"""
+Cost of rendering the "Received task" line of a task with a large payload.
+
+Compares the raw arguments, logged so far, with the same arguments truncated at render
+time with the default `TaskLogSettings`, for a task called with a list of ids and a
+dict of options, at two sizes. The cost of the raw arguments grows with the payload,
+while the truncated ones only walk what fits in the limits.
+
+Usage: python -m benchmarks.celery_task_args
+"""
+
+from logging import Logger
+from typing import Any
+from unittest.mock import Mock
+
+from acidrain_logging.config import TaskLogSettings
+from acidrain_logging.renderers import JSONLineRenderer
+from acidrain_logging.truncation import TaskArgsFormatter
+from benchmarks.utils import bench, compare
+
+
+def _payload(size: int) -> tuple[list[Any], dict[str, Any]]:
+    args = [list(range(size * 10))]
+    kwargs = {
+        "options": {f"key_{i}": {"value": i, "tags": ["a", "b"]} for i in range(size)}
+    }
+    return args, kwargs
+
+
+def main() -> None:
+    renderer = JSONLineRenderer()
+    logger = Mock(Logger)
+    formatter = TaskArgsFormatter(TaskLogSettings())
+
+    for size in (1000, 10_000):
+        args, kwargs = _payload(size)
+
+        def _raw(args: list[Any] = args, kwargs: dict[str, Any] = kwargs) -> bytes:
+            event_dict = {
+                "event": "Received task",
+                "task_args": args,
+                "task_kwargs": kwargs,
+            }
+            return renderer(logger, "info", event_dict)
+
+        def _bounded(args: list[Any] = args, kwargs: dict[str, Any] = kwargs) -> bytes:
+            task_args, task_kwargs = formatter.format("tasks.import", args, kwargs)
+            event_dict = {
+                "event": "Received task",
+                "task_args": task_args,
+                "task_kwargs": task_kwargs,
+            }
+            return renderer(logger, "info", event_dict)
+
+        print(
+            f"{size:,} options: {len(_raw()):,} bytes raw, "
+            f"{len(_bounded()):,} bytes bounded"
+        )
+        baseline = bench("raw arguments", _raw)
+        candidate = bench("bounded arguments", _bounded)
+        compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Cost per task of the publish timestamp header, published then read by the worker.
+
+Compares the ISO string produced with `pytz` and parsed with `datetime.fromisoformat`,
+used so far, with the epoch in µs.
+
+Usage: python -m benchmarks.celery_task_meta
+"""
+
+import time
+from datetime import UTC, datetime
+
+import pytz
+
+from benchmarks.utils import bench, compare
+
+
+def _iso_header() -> float:
+    start_time = datetime.now(tz=pytz.UTC)
+    publish_tm = datetime.now(tz=pytz.UTC).isoformat()
+    return (start_time - datetime.fromisoformat(publish_tm)).total_seconds()
+
+
+def _epoch_header() -> float:
+    start = time.time()
+    publish_us = time.time_ns() // 1000
+    return start - publish_us / 1_000_000
+
+
+def _epoch_header_logged() -> datetime:
+    # The worker also turns it into a datetime, for the log
+    publish_us = time.time_ns() // 1000
+    return datetime.fromtimestamp(publish_us / 1_000_000, tz=UTC)
+
+
+def main() -> None:
+    baseline = bench("ISO string, pytz", _iso_header)
+    candidate = bench("epoch in µs", _epoch_header)
+    bench("epoch in µs, with the logged datetime", _epoch_header_logged)
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cost per event of processing and rendering a bound context, on the JSON fast path.
+
+Compares binding the context with `structlog.contextvars`, merged and serialized with
+every event, with `acidrain_logging.context`, serialized once and spliced. Output is
+left out, to only measure the processors and the renderer.
+
+Usage: python -m benchmarks.context
+"""
+
+import logging
+from contextlib import AbstractContextManager
+from datetime import UTC, datetime
+from typing import Any
+
+import structlog
+
+from acidrain_logging import LogConfig, context
+from acidrain_logging.pipeline import compile_pre_processors
+from acidrain_logging.processors import SHARED_PRE_PROCESSORS
+from acidrain_logging.renderers import JSONLineRenderer
+from benchmarks.utils import bench, compare
+
+CONTEXT: dict[str, Any] = {
+    "trace_id": "9b2f1c1e-8f4e-4f6e-9d0b-2c1a6b9e5f3a",
+    "task": {
+        "id": "0f6a2b8e-4c1d-4e7a-9b3f-5d2c8a1e6f47",
+        "name": "acidrain.tasks.process_order",
+        "start_time": datetime(2024, 1, 1, 12, 34, 56, 789012, tzinfo=UTC),
+    },
+}
+
+
+def main() -> None:
+    logger = logging.getLogger("benchmark")
+
+    pre_processor = compile_pre_processors(
+        LogConfig(fast_path=True), SHARED_PRE_PROCESSORS
+    )
+    renderer = JSONLineRenderer()
+
+    def _log() -> None:
+        event_dict = pre_processor(logger, "info", {"event": "message", "user_id": 42})
+        renderer(logger, "info", event_dict)
+
+    def _bench(name: str, bound: AbstractContextManager[Any]) -> float:
+        with bound:
+            return bench(name, _log)
+
+    baseline = _bench(
+        "structlog.contextvars", structlog.contextvars.bound_contextvars(**CONTEXT)
+    )
+    candidate = _bench("acidrain_logging.context", context.bound_contextvars(**CONTEXT))
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
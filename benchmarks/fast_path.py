@@ -0,0 +1,53 @@
+"""
+Cost per event of a structlog call, with and without the fast path.
+
+Both configurations write the same bytes to /dev/null.
+
+Usage: python -m benchmarks.fast_path
+"""
+
+import logging
+import os
+import sys
+
+import structlog
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging import LogConfig, configure_logger
+from benchmarks.utils import bench, compare
+
+
+def _configure(*, fast_path: bool) -> None:
+    logging.getLogger().handlers.clear()
+    configure_logger(LogConfig(level="INFO", fast_path=fast_path))
+
+
+def main() -> None:
+    results: dict[tuple[str, bool], float] = {}
+
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        sys.stderr = devnull
+        try:
+            for fast_path in (False, True):
+                _configure(fast_path=fast_path)
+                log = structlog.get_logger("benchmark")
+                label = "fast path" if fast_path else "stdlib path"
+
+                def _info(log: FilteringBoundLogger = log) -> None:
+                    log.info("message", user_id=42, items=[1, 2, 3])
+
+                def _debug(log: FilteringBoundLogger = log) -> None:
+                    log.debug("message", user_id=42)
+
+                results["info", fast_path] = bench(f"{label}: info with kwargs", _info)
+                results["debug", fast_path] = bench(f"{label}: filtered debug", _debug)
+        finally:
+            sys.stderr = sys.__stderr__
+
+    for name in ("info", "debug"):
+        print(f"{name}:")
+        compare(results[name, False], results[name, True])
+
+
+if __name__ == "__main__":
+    main()
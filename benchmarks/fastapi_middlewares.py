@@ -0,0 +1,85 @@
+"""
+Overhead per request of the FastAPI log middlewares.
+
+Compares the three `BaseHTTPMiddleware` layers with the single pure ASGI
+`LogMiddleware`, around the same app. The ASGI app is called directly, without a
+server nor a test client, and the logs are discarded, to only measure the middlewares.
+
+Usage: python -m benchmarks.fastapi_middlewares
+"""
+
+import asyncio
+import logging
+from typing import Any
+
+from fastapi import FastAPI
+from starlette.types import Message
+
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.fastapi import middlewares
+from benchmarks.utils import bench, compare
+
+SCOPE: dict[str, Any] = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/value/abc",
+    "raw_path": b"/value/abc",
+    "query_string": b"default=xyz",
+    "root_path": "",
+    "headers": [
+        (b"host", b"testserver"),
+        (b"user-agent", b"benchmark"),
+        (b"x-trace-id", b"9b2f1c1e-8f4e-4f6e-9d0b-2c1a6b9e5f3a"),
+    ],
+    "client": ("127.0.0.1", 12345),
+    "server": ("testserver", 80),
+}
+
+
+def _create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/value/{key}")
+    def _get_value(key: str) -> str:
+        return key
+
+    return app
+
+
+async def _receive() -> Message:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(_message: Message) -> None:
+    pass
+
+
+def main() -> None:
+    configure_logger(LogConfig(level="INFO"))
+    logging.getLogger().handlers = [logging.NullHandler()]
+
+    legacy_app = _create_app()
+    legacy_app.add_middleware(middlewares.LogRequestMiddleware)
+    legacy_app.add_middleware(middlewares.TraceIdMiddleware)
+    legacy_app.add_middleware(middlewares.ContextResetMiddleware)
+
+    app = _create_app()
+    middlewares.add_log_middlewares(app)
+
+    loop = asyncio.new_event_loop()
+
+    def _request(app: FastAPI) -> None:
+        loop.run_until_complete(app(SCOPE.copy(), _receive, _send))
+
+    baseline = bench("BaseHTTPMiddleware x3", lambda: _request(legacy_app))
+    candidate = bench("LogMiddleware", lambda: _request(app))
+    compare(baseline, candidate)
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
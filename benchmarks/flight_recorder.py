@@ -0,0 +1,67 @@
+"""
+Cost of the DEBUG trail of a request of 20 DEBUG events, with the fast path.
+
+Compares running at DEBUG, every event rendered and written, with running at INFO and
+the flight recorder: the events are recorded, then dropped with the buffer, the request
+having succeeded. The cost of a filtered DEBUG event, outside of a request, is shown
+for reference. The lines are written to /dev/null.
+
+Usage: python -m benchmarks.flight_recorder
+"""
+
+import logging
+import os
+import sys
+
+import structlog
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.config import FlightRecorderSettings
+from acidrain_logging.recorder import start_recording, stop_recording
+from benchmarks.utils import bench, compare
+
+
+def _configure(level: str, *, recorder: bool) -> FilteringBoundLogger:
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level=level,
+            fast_path=True,
+            flight_recorder=FlightRecorderSettings(enabled=recorder),
+        )
+    )
+    log: FilteringBoundLogger = structlog.get_logger("benchmark")
+    return log
+
+
+def _request(log: FilteringBoundLogger) -> None:
+    recorder = start_recording()
+    for i in range(20):
+        log.debug("step", step=i, user_id=42)
+    stop_recording(recorder, failed=False, elapsed_ms=1)
+
+
+def main() -> None:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        sys.stderr = devnull
+        try:
+            log = _configure("DEBUG", recorder=False)
+            baseline = bench("DEBUG level: 20 events written", lambda: _request(log))
+
+            log = _configure("INFO", recorder=True)
+            candidate = bench(
+                "INFO level, recorder: 20 events dropped", lambda: _request(log)
+            )
+            bench(
+                "INFO level, recorder: 1 event outside of requests",
+                lambda: log.debug("step"),
+            )
+        finally:
+            sys.stderr = sys.__stderr__
+
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cost per event of rendering and writing a JSON line.
+
+Compares the previous path (orjson output decoded to a `str`, encoded again by
+`logging.StreamHandler`) with the bytes path used by `configure_logger`.
+
+Usage: python -m benchmarks.json_output
+"""
+
+import logging
+import os
+from functools import partial
+from typing import Any
+
+import orjson
+from structlog.processors import JSONRenderer
+from structlog.stdlib import ProcessorFormatter
+
+from acidrain_logging.formatters import BytesProcessorFormatter
+from acidrain_logging.sinks import SinkHandler, StreamSink
+from benchmarks.utils import bench, compare
+
+EVENT: dict[str, Any] = {
+    "event": "GET /value/foo/bar 200",
+    "logger": "acidrain_logging.fastapi.middlewares",
+    "level": "info",
+    "timestamp": "2024-01-01T12:34:56.789012Z",
+    "trace_id": "9b2f1c1e-8f4e-4f6e-9d0b-2c1a6b9e5f3a",
+    "http": {
+        "method": "GET",
+        "client": {"remote_ip": "10.0.0.1", "user_agent": "x" * 200},
+        "request": {
+            "path_params": {"key1": "foo", "key2": "bar"},
+            "query_params": {f"param_{i}": "value" * 10 for i in range(20)},
+        },
+        "url": {"host": "api.example.com", "path": "/value/foo/bar", "scheme": "https"},
+        "response": {"elapsed": 12.345, "status_code": 200},
+    },
+}
+
+
+def _record() -> logging.LogRecord:
+    record = logging.makeLogRecord({"msg": EVENT, "levelno": logging.INFO})
+    record._logger = logging.getLogger()  # noqa: SLF001
+    record._name = "info"  # noqa: SLF001
+    return record
+
+
+def main() -> None:
+    record = _record()
+
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        str_handler = logging.StreamHandler(devnull)
+        str_handler.setFormatter(
+            ProcessorFormatter(
+                processors=[
+                    ProcessorFormatter.remove_processors_meta,
+                    JSONRenderer(
+                        serializer=lambda *a, **kw: orjson.dumps(*a, **kw).decode()
+                    ),
+                ]
+            )
+        )
+
+        bytes_handler = SinkHandler(StreamSink(devnull))
+        bytes_handler.setFormatter(
+            BytesProcessorFormatter(
+                processors=[
+                    ProcessorFormatter.remove_processors_meta,
+                    JSONRenderer(
+                        serializer=partial(
+                            orjson.dumps, option=orjson.OPT_APPEND_NEWLINE
+                        )
+                    ),
+                ]
+            )
+        )
+
+        print(f"line size: {len(bytes_handler.format_line(record))} bytes")
+        baseline = bench(
+            "str round trip (StreamHandler)", lambda: str_handler.handle(record)
+        )
+        candidate = bench("bytes (SinkHandler)", lambda: bytes_handler.handle(record))
+        compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Cost of a DEBUG call outside of a raised request, with the fast path at INFO level.
+
+Compares the level elevation enabled, where the call checks the level of its context,
+with the elevation disabled, where it is a no-op. The cost of the same call in a request
+raised to DEBUG is shown for reference. The lines are written to /dev/null.
+
+Usage: python -m benchmarks.level_elevation
+"""
+
+import logging
+import os
+import sys
+
+import structlog
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.config import LevelElevationSettings
+from acidrain_logging.levels import reset_elevated_level, set_elevated_level
+from benchmarks.utils import bench, compare
+
+
+def _configure(*, elevation: bool) -> FilteringBoundLogger:
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            fast_path=True,
+            level_elevation=LevelElevationSettings(enabled=elevation),
+        )
+    )
+    # Bound once, not through the lazy proxy on each call
+    log: FilteringBoundLogger = structlog.get_logger("benchmark").bind()
+    return log
+
+
+def main() -> None:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        sys.stderr = devnull
+        try:
+            log = _configure(elevation=False)
+            baseline = bench("elevation disabled: DEBUG call", lambda: log.debug("x"))
+
+            log = _configure(elevation=True)
+            candidate = bench("elevation enabled: DEBUG call", lambda: log.debug("x"))
+
+            token = set_elevated_level(logging.DEBUG)
+            bench("elevation enabled: DEBUG call, raised", lambda: log.debug("x"))
+            reset_elevated_level(token)
+        finally:
+            sys.stderr = sys.__stderr__
+
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
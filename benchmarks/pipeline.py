@@ -0,0 +1,56 @@
+"""
+Cost per event of the pre-processors, run one by one or compiled into one processor.
+
+Uses a JSON config with renamed levels and the Datadog injection enabled, so that all
+the fusable processors are part of the chain.
+
+Usage: python -m benchmarks.pipeline
+"""
+
+import logging
+from typing import TYPE_CHECKING
+
+from acidrain_logging import LogConfig, OutputFormat
+from acidrain_logging.config import DatadogSettings
+from acidrain_logging.pipeline import compile_pre_processors
+from acidrain_logging.processors import SHARED_PRE_PROCESSORS, LogProcessorFactory
+from benchmarks.utils import bench, compare
+
+if TYPE_CHECKING:
+    from structlog.typing import EventDict
+
+
+def main() -> None:
+    config = LogConfig(
+        output_format=OutputFormat.JSON,
+        level_names={"warning": "warn"},
+        datadog=DatadogSettings(injection_enabled=True, env="prod", service="app"),
+    )
+    logger = logging.getLogger("benchmark")
+
+    processors = []
+    for processor in SHARED_PRE_PROCESSORS:
+        if isinstance(processor, LogProcessorFactory):
+            resolved = processor(config)
+            if resolved is not None:
+                processors.append(resolved)
+        else:
+            processors.append(processor)
+
+    compiled = compile_pre_processors(config, SHARED_PRE_PROCESSORS)
+
+    def _one_by_one() -> None:
+        event_dict: EventDict = {"event": "message", "user_id": 42}
+        for processor in processors:
+            event_dict = processor(logger, "info", event_dict)
+
+    def _compiled() -> None:
+        compiled(logger, "info", {"event": "message", "user_id": 42})
+
+    baseline = bench("pre-processors, one by one", _one_by_one)
+    candidate = bench("pre-processors, compiled", _compiled)
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
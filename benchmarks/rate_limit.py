@@ -0,0 +1,61 @@
+"""
+Cost of an error logged with its traceback on each call, while a dependency is down.
+
+Compares the rate limit disabled, where each call formats the traceback and writes a
+line, with the rate limit enabled, where the calls over the limit are dropped before
+any processing. The lines are written to /dev/null.
+
+Usage: python -m benchmarks.rate_limit
+"""
+
+import logging
+import os
+import sys
+
+import structlog
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.config import RateLimitSettings
+from benchmarks.utils import bench, compare
+
+
+def _configure(*, rate_limit: bool) -> FilteringBoundLogger:
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            fast_path=True,
+            rate_limit=RateLimitSettings(enabled=rate_limit),
+        )
+    )
+    # Bound once, not through the lazy proxy on each call
+    log: FilteringBoundLogger = structlog.get_logger("benchmark").bind()
+    return log
+
+
+def _fail(log: FilteringBoundLogger) -> None:
+    try:
+        msg = "Connection refused"
+        raise ConnectionError(msg)  # noqa: TRY301
+    except ConnectionError:
+        log.exception("Failed to call the dependency")
+
+
+def main() -> None:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        sys.stderr = devnull
+        try:
+            log = _configure(rate_limit=False)
+            baseline = bench("rate limit disabled: exception", lambda: _fail(log))
+
+            log = _configure(rate_limit=True)
+            candidate = bench("rate limit enabled: exception", lambda: _fail(log))
+        finally:
+            sys.stderr = sys.__stderr__
+
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
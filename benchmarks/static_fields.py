@@ -0,0 +1,54 @@
+"""
+Cost per event of adding constant fields to a JSON line.
+
+Compares inserting them in the event dict before rendering, like the Datadog injector
+used to, with splicing them pre-serialized in the rendered line.
+
+Usage: python -m benchmarks.static_fields
+"""
+
+import logging
+from typing import Any
+
+from acidrain_logging.processors import KeyOps
+from acidrain_logging.renderers import JSONLineRenderer
+from benchmarks.utils import bench, compare
+
+STATIC_FIELDS = {
+    "dd.env": "production",
+    "dd.service": "acidrain-api",
+    "dd.version": "1.42.0",
+    "host": "ip-10-0-0-1.ec2.internal",
+    "pod": "acidrain-api-7d9f8b6c5-x2v4q",
+    "region": "us-east-1",
+}
+
+EVENT: dict[str, Any] = {
+    "event": "message",
+    "logger": "benchmark",
+    "level": "info",
+    "timestamp": "2024-01-01T12:34:56.789012Z",
+    "user_id": 42,
+}
+
+
+def main() -> None:
+    logger = logging.getLogger("benchmark")
+
+    insert = KeyOps(insert=tuple(STATIC_FIELDS.items()))
+    renderer = JSONLineRenderer()
+    splicing_renderer = JSONLineRenderer(STATIC_FIELDS)
+
+    def _inserted() -> None:
+        renderer(logger, "info", insert(logger, "info", EVENT.copy()))
+
+    def _spliced() -> None:
+        splicing_renderer(logger, "info", EVENT.copy())
+
+    baseline = bench("inserted in the event dict", _inserted)
+    candidate = bench("spliced in the rendered line", _spliced)
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Cost per event of structlog's TimeStamper and of the CachedTimeStamper.
+
+Usage: python -m benchmarks.timestamper
+"""
+
+import logging
+
+from structlog.processors import TimeStamper
+
+from acidrain_logging.processors import CachedTimeStamper
+from benchmarks.utils import bench, compare
+
+
+def main() -> None:
+    logger = logging.getLogger("benchmark")
+
+    timestamper = TimeStamper(fmt="iso")
+    baseline = bench("TimeStamper, iso", lambda: timestamper(logger, "info", {}))
+
+    results: dict[str, float] = {}
+
+    for fmt in ("iso", "epoch", "epoch_ns"):
+        stamper = CachedTimeStamper(fmt)
+        results[fmt] = bench(
+            f"CachedTimeStamper, {fmt}",
+            lambda stamper=stamper: stamper(logger, "info", {}),  # type: ignore[misc]
+        )
+
+    compare(baseline, results["iso"])
+
+
+if __name__ == "__main__":
+    main()
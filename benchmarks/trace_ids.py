@@ -0,0 +1,37 @@
+"""
+Cost per id of generating a trace id.
+
+Compares `str(uuid4())`, used by the integrations so far, with the buffered random
+generator, in each of its formats, and with the reuse of the active Datadog trace id.
+
+Usage: python -m benchmarks.trace_ids
+"""
+
+from uuid import uuid4
+
+from ddtrace.trace import tracer
+
+from acidrain_logging.config import TraceIdFormat
+from acidrain_logging.trace_ids import DatadogTraceIdGenerator, RandomTraceIdGenerator
+from benchmarks.utils import bench, compare
+
+
+def main() -> None:
+    baseline = bench("str(uuid4())", lambda: str(uuid4()))
+
+    results: dict[TraceIdFormat, float] = {}
+    for fmt in TraceIdFormat:
+        generator = RandomTraceIdGenerator(fmt)
+        results[fmt] = bench(f"RandomTraceIdGenerator, {fmt}", generator)
+
+    fallback = RandomTraceIdGenerator()
+    datadog_generator = DatadogTraceIdGenerator(TraceIdFormat.UUID, fallback)
+    bench("DatadogTraceIdGenerator, no active span", datadog_generator)
+    with tracer.trace("benchmark"):
+        bench("DatadogTraceIdGenerator, active span", datadog_generator)
+
+    compare(baseline, results[TraceIdFormat.UUID])
+
+
+if __name__ == "__main__":
+    main()
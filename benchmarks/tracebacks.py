@@ -0,0 +1,67 @@
+"""
+Cost of an error logged with its traceback, raised again and again from the same place.
+
+Compares `structlog.processors.format_exc_info`, which formats the whole traceback on
+each call, with the cached formatter, which only formats the message of the exception.
+The compact dict rendering of the JSON output, with the default limits, is shown for
+reference. The lines are written to /dev/null.
+
+Usage: python -m benchmarks.tracebacks
+"""
+
+import logging
+import os
+import sys
+
+import structlog
+from structlog.typing import FilteringBoundLogger
+
+from acidrain_logging import LogConfig, configure_logger
+from acidrain_logging.config import ExceptionFormat, ExceptionSettings
+from benchmarks.utils import bench, compare
+
+
+def _configure(exceptions: ExceptionSettings) -> FilteringBoundLogger:
+    logging.getLogger().handlers.clear()
+    configure_logger(LogConfig(level="INFO", fast_path=True, exceptions=exceptions))
+    # Bound once, not through the lazy proxy on each call
+    log: FilteringBoundLogger = structlog.get_logger("benchmark").bind()
+    return log
+
+
+def _connect() -> None:
+    msg = "Connection refused"
+    raise ConnectionError(msg)
+
+
+def _fail(log: FilteringBoundLogger) -> None:
+    try:
+        try:
+            _connect()
+        except ConnectionError as e:
+            msg = "Failed to call the dependency"
+            raise RuntimeError(msg) from e
+    except RuntimeError:
+        log.exception("Request failed")
+
+
+def main() -> None:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        sys.stderr = devnull
+        try:
+            log = _configure(ExceptionSettings(cache_size=0))
+            baseline = bench("format_exc_info: chained exception", lambda: _fail(log))
+
+            log = _configure(ExceptionSettings())
+            candidate = bench("cached: chained exception", lambda: _fail(log))
+
+            log = _configure(ExceptionSettings(format=ExceptionFormat.DICT))
+            bench("dict: chained exception", lambda: _fail(log))
+        finally:
+            sys.stderr = sys.__stderr__
+
+    compare(baseline, candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+
+def bench(name: str, func: Callable[[], Any], *, repeat: int = 5) -> float:
+    """Run `func` repeatedly, print and return the best time per call, in ns."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+
+    best = min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+    print(f"{name:<50} {best:>12,.0f} ns/call")
+
+    return best
+
+
+def compare(baseline: float, candidate: float) -> None:
+    print(
+        f"{'saving':<50} {baseline - candidate:>12,.0f} ns/call"
+        f" ({(1 - candidate / baseline):.1%})"
+    )
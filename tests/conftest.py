@@ -1,10 +1,36 @@
+import calendar
+from collections.abc import Generator
 from time import time
+from unittest.mock import patch
 
+import freezegun
 import pytest
+from freezegun.api import FrozenDateTimeFactory
 
 pytest_plugins = ("celery.contrib.pytest",)
 
+# The session worker polls its broker in a thread: time frozen by a test while it
+# waits would make it wait forever.
+freezegun.configure(extend_ignore_list=["kombu"])
+
 
 @pytest.fixture(scope="session", autouse=True)
 def faker_seed() -> float:
     return time()
+
+
+@pytest.fixture
+def freezer(freezer: FrozenDateTimeFactory) -> Generator[FrozenDateTimeFactory]:
+    """
+    Freeze `time.time_ns()` to the exact microsecond too.
+
+    freezegun derives it from a float, which can fall just below the microsecond.
+    """
+
+    def time_ns() -> int:
+        frozen = freezer.time_to_freeze
+        micros = calendar.timegm(frozen.timetuple()) * 1_000_000 + frozen.microsecond
+        return micros * 1000
+
+    with patch("time.time_ns", time_ns):
+        yield freezer
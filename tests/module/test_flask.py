@@ -61,7 +61,12 @@ async def test_request_logging_includes_all_metadata(
             "path_params": {},
             "query_params": {},
         },
-        "response": {"elapsed": ANY, "status_code": 200},
+        "response": {
+            "elapsed": ANY,
+            "time_to_headers": ANY,
+            "bytes_sent": ANY,
+            "status_code": 200,
+        },
         "url": {
             "host": parsed_url.hostname,
             "path": "/",
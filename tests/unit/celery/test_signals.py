@@ -1,5 +1,8 @@
+import logging
+from collections.abc import Generator
+from datetime import timedelta
 from typing import TYPE_CHECKING, Any, cast
-from unittest.mock import ANY
+from unittest.mock import ANY, Mock, patch
 from uuid import UUID
 
 import pytest
@@ -10,7 +13,23 @@ from celery.contrib.testing.worker import TestWorkController
 from freezegun import freeze_time
 from structlog.contextvars import bound_contextvars
 
-from acidrain_logging.celery.signals import connect_signals, utcnow
+from acidrain_logging.celery import signals
+from acidrain_logging.celery.signals import (
+    _add_task_meta,
+    _get_publish_time,
+    _task_postrun,
+    _task_prerun,
+    configure_task_logs,
+    connect_signals,
+    utcnow,
+)
+from acidrain_logging.config import LevelElevationSettings, TaskLogSettings
+from acidrain_logging.levels import (
+    configure_level_elevation,
+    get_elevated_level,
+    reset_elevated_level,
+    set_elevated_level,
+)
 from acidrain_logging.testing.utils import retry
 
 if TYPE_CHECKING:
@@ -64,12 +83,15 @@ def test_task_metadata_is_logged_when_task_starts(
     assert isinstance(record, dict)  # type guard
 
     assert record["data"] == {
-        "task_args": list(args),  # celery converts it to a list
-        "task_kwargs": kwargs,
+        "task_args": ANY,
+        "task_kwargs": ANY,
         "queue": "celery",
         "publish_tm": ANY,
         "start_delay": ANY,
     }
+    # Truncated when rendered
+    assert record["data"]["task_args"].__structlog__() == list(args)
+    assert record["data"]["task_kwargs"].__structlog__() == kwargs
     assert record["task"] == {
         "id": result_future.task_id,
         "name": task_name,
@@ -99,10 +121,19 @@ def test_task_metadata_is_logged_when_task_completes(
         "state": "SUCCESS",
         "start_time": ANY,
         "duration": ANY,
+        "timing": {"queue_wait": ANY, "execution": ANY, "postrun": ANY},
     }
     assert min_start <= record["task"]["start_time"] <= max_start
     assert 0 < record["task"]["duration"] <= (max_start - min_start).total_seconds()
 
+    timing = record["task"]["timing"]
+    assert 0 < timing["queue_wait"] <= (max_start - min_start).total_seconds()
+    assert timing["execution"] > 0
+    assert timing["postrun"] >= 0
+    assert timing["execution"] + timing["postrun"] == pytest.approx(
+        record["task"]["duration"]
+    )
+
 
 @pytest.mark.parametrize("current_trace_id", [None, "some-trace-id"])
 def test_trace_id_is_propagated_to_all_task_logs(
@@ -162,12 +193,41 @@ def test_task_publish_time_is_logged_when_task_starts(
         f"Received task: {__name__}.{logging_task.__name__}",
         result_future.task_id,
     )
-    assert record["data"]["publish_tm"] == timestamp.isoformat()
+    # The epoch in ns of freezegun goes through a float
+    assert abs(record["data"]["publish_tm"] - timestamp) <= timedelta(microseconds=1)
 
     start_delay = record["data"]["start_delay"]
     assert 0 < start_delay <= (utcnow() - timestamp).total_seconds()
 
 
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"x_publish_us": 1_700_000_000_123_456},
+        # Published by an older version
+        {"x_publish_tm": "2023-11-14T22:13:20.123456+00:00"},
+    ],
+)
+def test_publish_time_is_read_from_the_task_headers(headers: dict[str, Any]) -> None:
+    task = Mock(request=headers)
+
+    assert _get_publish_time(task) == 1_700_000_000.123456
+
+
+def test_publish_time_is_also_written_for_the_previous_release() -> None:
+    headers: dict[str, Any] = {}
+
+    with patch("time.time_ns", return_value=1_700_000_000_123_456_789):
+        _add_task_meta(headers)
+
+    assert headers["x_publish_us"] == 1_700_000_000_123_456
+    assert headers["x_publish_tm"] == "2023-11-14T22:13:20.123456+00:00"
+
+
+def test_publish_time_is_none_without_headers() -> None:
+    assert _get_publish_time(Mock(request={})) is None
+
+
 @pytest.mark.parametrize("trace_id", [None, "some-trace-id"])
 def test_task_can_be_run_sync(
     logging_task: "LoggingTask", caplog: LogCaptureFixture, trace_id: str | None
@@ -195,6 +255,118 @@ def test_task_can_be_run_sync(
         assert "trace_id" not in record
 
 
+@pytest.fixture
+def reset_task_logs() -> Generator[None, None, None]:
+    yield
+    configure_task_logs(TaskLogSettings())
+
+
+@pytest.mark.usefixtures("reset_task_logs")
+def test_task_runs_out_of_the_sample_are_not_logged(
+    logging_task: "LoggingTask", caplog: LogCaptureFixture
+) -> None:
+    configure_task_logs(TaskLogSettings(sample_rates={logging_task.name: 0}))
+
+    result = logging_task.apply()
+
+    assert result.get() == 0
+    assert f"Received task: {logging_task.name}" not in caplog.text
+    assert f"Task complete: {logging_task.name}" not in caplog.text
+    # The context is still bound for the logs of the task
+    assert "Test task is running" in caplog.text
+
+
+@pytest.mark.usefixtures("reset_task_logs")
+@patch(f"{signals.__name__}.TaskAggregator")
+def test_task_runs_are_recorded_when_aggregating(
+    aggregator_cls_mock: Mock, logging_task: "LoggingTask", caplog: LogCaptureFixture
+) -> None:
+    configure_task_logs(TaskLogSettings(aggregate=True, aggregate_interval_s=10))
+    aggregator_cls_mock.assert_called_once_with(10)
+
+    result = logging_task.apply()
+
+    assert result.get() == 0
+    aggregator_cls_mock.return_value.record.assert_called_once_with(
+        logging_task.name, "SUCCESS", ANY, None
+    )
+    assert f"Task complete: {logging_task.name}" not in caplog.text
+
+
+@pytest.mark.usefixtures("reset_task_logs")
+@patch(f"{signals.__name__}.TaskAggregator")
+def test_pool_processes_flush_their_logs_when_shutting_down(
+    aggregator_cls_mock: Mock,
+) -> None:
+    configure_task_logs(TaskLogSettings(aggregate=True))
+    handler = Mock(logging.Handler)
+
+    with patch.object(logging.getLogger(), "handlers", [handler]):
+        signals._flush_logs()  # noqa: SLF001
+
+    aggregator_cls_mock.return_value.emit.assert_called_once_with()
+    handler.flush.assert_called_once_with()
+
+
+@pytest.fixture
+def level_elevation() -> Generator[None, None, None]:
+    configure_level_elevation(LevelElevationSettings(enabled=True, level="INFO"))
+    yield
+    configure_level_elevation(LevelElevationSettings())
+
+
+def test_raised_log_level_is_propagated_to_the_published_tasks() -> None:
+    headers: dict[str, Any] = {}
+    _add_task_meta(headers)
+    assert "x_log_level" not in headers
+
+    token = set_elevated_level(logging.DEBUG)
+    _add_task_meta(headers)
+    reset_elevated_level(token)
+    assert headers["x_log_level"] == "DEBUG"
+
+
+@pytest.mark.usefixtures("level_elevation")
+@pytest.mark.parametrize(
+    ("level_name", "expected"),
+    [
+        (None, None),
+        ("invalid", None),
+        ("warning", logging.WARNING),
+        # Capped to the settings' level
+        ("DEBUG", logging.INFO),
+    ],
+)
+def test_task_runs_with_the_log_level_of_its_headers(
+    level_name: str | None, expected: int | None
+) -> None:
+    task = Mock(request={"x_log_level": level_name})
+    task.name = "tasks.add"
+
+    _task_prerun("task-id", task, [], {})
+    assert get_elevated_level() == expected
+
+    _task_postrun("task-id", task, "SUCCESS")
+    assert get_elevated_level() is None
+
+
+@pytest.mark.parametrize(("state", "failed"), [("SUCCESS", False), ("FAILURE", True)])
+@patch(f"{signals.__name__}.stop_recording")
+@patch(f"{signals.__name__}.start_recording")
+def test_task_runs_are_recorded_until_they_complete(
+    start_recording_mock: Mock, stop_recording_mock: Mock, state: str, failed: bool
+) -> None:
+    task = Mock(request={})
+    task.name = "tasks.add"
+
+    _task_prerun("task-id", task, [], {})
+    _task_postrun("task-id", task, state)
+
+    stop_recording_mock.assert_called_once_with(
+        start_recording_mock.return_value, failed=failed, elapsed_ms=ANY
+    )
+
+
 def find_log_record(
     caplog: LogCaptureFixture, msg: str, task_id: str
 ) -> dict[str, Any]:
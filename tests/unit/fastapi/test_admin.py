@@ -0,0 +1,57 @@
+import logging
+from collections.abc import Generator
+from http import HTTPStatus
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from acidrain_logging import LogConfig
+from acidrain_logging.control import configure_log_control
+from acidrain_logging.fastapi.admin import create_log_levels_router
+
+
+@pytest.fixture(autouse=True)
+def _log_restore() -> Generator[None, None, None]:
+    level = logging.getLogger().level
+    configure_log_control(LogConfig(logger_levels={"test.admin": "INFO"}), None)
+
+    yield
+
+    logging.getLogger().setLevel(level)
+    logging.getLogger("test.admin").setLevel(logging.NOTSET)
+    configure_log_control(LogConfig(), None)
+
+
+@pytest.fixture
+def api_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(create_log_levels_router())
+    return TestClient(app)
+
+
+def test_get_log_levels(api_client: TestClient) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+
+    resp = api_client.get("/log-levels")
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"root": "WARNING", "test.admin": "NOTSET"}
+
+
+def test_set_log_levels(api_client: TestClient) -> None:
+    resp = api_client.put("/log-levels", json={"root": "ERROR", "test.admin": "debug"})
+
+    assert resp.status_code == HTTPStatus.OK
+    assert resp.json() == {"root": "ERROR", "test.admin": "DEBUG"}
+    assert logging.getLogger("test.admin").level == logging.DEBUG
+
+
+@pytest.mark.parametrize("body", [{"root": "invalid"}, {"root": 10}, ["DEBUG"]])
+def test_set_invalid_log_levels(api_client: TestClient, body: object) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+
+    resp = api_client.put("/log-levels", json=body)
+
+    assert resp.status_code == HTTPStatus.UNPROCESSABLE_ENTITY
+    assert logging.getLogger().level == logging.WARNING
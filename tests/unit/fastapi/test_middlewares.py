@@ -1,18 +1,26 @@
+from collections.abc import Iterator
+from typing import Any, cast
 from unittest.mock import Mock, patch
 from uuid import uuid4
 
 import pytest
+import structlog
 from _pytest.logging import LogCaptureFixture
 from faker import Faker
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from fastapi.testclient import TestClient
 from structlog.contextvars import bound_contextvars
+from structlog.stdlib import BoundLogger
 
-from acidrain_logging import LogConfig, OutputFormat
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import AccessLogSettings, LevelElevationSettings
 from acidrain_logging.fastapi import middlewares
 from acidrain_logging.testing.factories import LogConfigFactory
 from acidrain_logging.testing.fastapi import create_app
 
+log: BoundLogger = structlog.get_logger()
+
 
 @pytest.fixture(scope="module")
 def log_config() -> LogConfig:
@@ -54,8 +62,8 @@ def test_trace_id_middleware_adds_trace_id_when_no_header(
 ) -> None:
     trace_id = uuid4()
 
-    with patch(f"{middlewares.__name__}.uuid4") as uuid4_mock:
-        uuid4_mock.return_value = trace_id
+    with patch(f"{middlewares.__name__}.new_trace_id") as new_trace_id_mock:
+        new_trace_id_mock.return_value = str(trace_id)
         resp = api_client.get("/")
 
     assert resp.is_success
@@ -86,7 +94,7 @@ def test_trace_id_middleware_re_uses_trace_id_from_headers(
 def test_log_request_middleware(
     time_mock: Mock, api_client: TestClient, caplog: LogCaptureFixture, faker: Faker
 ) -> None:
-    time_mock.perf_counter.side_effect = [1.23456789, 9.87654321]
+    time_mock.perf_counter.side_effect = [1.23456789, 5.67891234, 9.87654321]
 
     key1, key2, default, other = (faker.pystr() for _ in range(4))
 
@@ -107,6 +115,246 @@ def test_log_request_middleware(
             "path_params": {"key1": key1, "key2": key2},
             "query_params": {"default": default, "other": other},
         },
-        "response": {"elapsed": 8641.975, "status_code": 200},
+        "response": {
+            "elapsed": 8641.975,
+            "time_to_headers": 4444.344,
+            "bytes_sent": 15,
+            "status_code": 200,
+        },
         "url": {"host": "testserver", "path": expected_path, "scheme": "http"},
     }
+
+
+def test_log_middleware_logs_the_response_status_code(
+    api_client: TestClient, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    path = f"/{faker.pystr()}"
+
+    resp = api_client.get(path)
+    assert resp.status_code == 404
+
+    assert len(caplog.records) == 1
+
+    log_values = caplog.records[0].msg
+    assert isinstance(log_values, dict)  # type check
+    assert log_values["event"] == f"GET {path} 404"
+    assert log_values["http"]["response"]["status_code"] == 404
+
+
+def test_log_middleware_ignores_non_http_scopes(
+    api_app: FastAPI, caplog: LogCaptureFixture
+) -> None:
+    # Runs the lifespan events
+    with TestClient(api_app):
+        pass
+
+    assert caplog.records == []
+
+
+def _legacy_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/value/{key1}/{key2}")
+    def _get_value(key1: str, key2: str) -> str:
+        return key1 + key2
+
+    app.add_middleware(middlewares.LogRequestMiddleware)
+    app.add_middleware(middlewares.TraceIdMiddleware)
+    app.add_middleware(middlewares.ContextResetMiddleware)
+
+    return app
+
+
+@patch(f"{middlewares.__name__}.time")
+def test_log_middleware_logs_like_the_legacy_middlewares(
+    time_mock: Mock, api_app: FastAPI, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    time_mock.perf_counter.side_effect = [1.0, 1.5, 2.0, 1.0, 2.0]
+    url = f"/value/{faker.pystr()}/{faker.pystr()}?default={faker.pystr()}"
+    headers = {"x-trace-id": faker.pystr()}
+
+    TestClient(api_app).get(url, headers=headers)
+    with pytest.warns(DeprecationWarning, match="is deprecated") as warnings:
+        TestClient(_legacy_app()).get(url, headers=headers)
+
+    assert sorted(str(w.message).split()[0] for w in warnings) == [
+        "ContextResetMiddleware",
+        "LogRequestMiddleware",
+        "TraceIdMiddleware",
+    ]
+
+    assert len(caplog.records) == 2
+
+    new, legacy = (record.msg for record in caplog.records)
+    assert isinstance(new, dict)  # type check
+    assert isinstance(legacy, dict)  # type check
+    assert new["event"] == legacy["event"]
+    assert new["trace_id"] == legacy["trace_id"]
+    # The legacy middleware only times the app, not the sending of the response
+    assert new["http"]["response"].pop("time_to_headers") == 500.0
+    assert new["http"]["response"].pop("bytes_sent") == 15
+    assert new["http"] == legacy["http"]
+
+
+@pytest.fixture
+def streaming_client(log_config: LogConfig) -> TestClient:
+    configure_logger(log_config)
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    def _stream() -> StreamingResponse:
+        def _chunks() -> Iterator[bytes]:
+            for i in range(3):
+                log.info("chunk %d", i)
+                yield b"x" * 10
+
+        return StreamingResponse(_chunks())
+
+    @app.get("/error")
+    def _error() -> None:
+        raise RuntimeError
+
+    middlewares.add_log_middlewares(app)
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_log_middleware_logs_after_the_last_chunk_of_a_streamed_body(
+    streaming_client: TestClient, caplog: LogCaptureFixture
+) -> None:
+    resp = streaming_client.get("/stream")
+    assert resp.is_success
+
+    events = [cast("dict[str, Any]", r.msg)["event"] for r in caplog.records]
+    assert events == ["chunk 0", "chunk 1", "chunk 2", "GET /stream 200"]
+
+    response_data = cast("dict[str, Any]", caplog.records[-1].msg)["http"]["response"]
+    assert response_data["bytes_sent"] == 30
+    assert 0 <= response_data["time_to_headers"] <= response_data["elapsed"]
+
+
+def test_log_middleware_logs_requests_that_fail(
+    streaming_client: TestClient, caplog: LogCaptureFixture
+) -> None:
+    resp = streaming_client.get("/error")
+    assert resp.status_code == 500
+
+    access_logs = [
+        r for r in caplog.records if r.name == "acidrain_logging.fastapi.middlewares"
+    ]
+    assert len(access_logs) == 1
+
+    log_values = cast("dict[str, Any]", access_logs[0].msg)
+    assert log_values["event"] == "GET /error 500"
+    assert log_values["http"]["response"]["time_to_headers"] is None
+    assert log_values["http"]["response"]["bytes_sent"] == 0
+
+
+def test_log_middleware_skips_excluded_routes(
+    log_config: LogConfig, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    app = FastAPI()
+
+    @app.get("/health")
+    def _health() -> str:
+        return "OK"
+
+    @app.get("/value/{key}")
+    def _get_value(key: str) -> str:
+        return key
+
+    access_log = AccessLogSettings(exclude={"/value/{key}"})
+    middlewares.add_log_middlewares(
+        app, log_config.model_copy(update={"access_log": access_log})
+    )
+    client = TestClient(app)
+
+    assert client.get(f"/value/{faker.pystr()}").is_success
+    assert client.get("/health").is_success
+
+    assert len(caplog.records) == 1
+
+    log_values = caplog.records[0].msg
+    assert isinstance(log_values, dict)  # type check
+    assert log_values["event"] == "GET /health 200"
+
+
+def test_log_middleware_aggregates_requests(
+    log_config: LogConfig, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    app = FastAPI()
+
+    @app.get("/value/{key}")
+    def _get_value(key: str) -> str:
+        return key
+
+    @app.get("/error")
+    def _error() -> None:
+        raise RuntimeError
+
+    access_log = AccessLogSettings(aggregate=True, aggregate_interval_s=3600)
+    middlewares.add_log_middlewares(
+        app, log_config.model_copy(update={"access_log": access_log})
+    )
+    client = TestClient(app, raise_server_exceptions=False)
+
+    for _ in range(3):
+        assert client.get(f"/value/{faker.pystr()}").is_success
+    assert client.get("/error").status_code == 500
+
+    # Only the error is logged right away
+    access_logs = [r for r in caplog.records if r.name == middlewares.__name__]
+    assert [cast("dict[str, Any]", r.msg)["event"] for r in access_logs] == [
+        "GET /error 500"
+    ]
+
+    middleware = app.middleware_stack.app  # type: ignore[union-attr]
+    assert isinstance(middleware, middlewares.LogMiddleware)
+    assert middleware.aggregator is not None
+
+    caplog.clear()
+    middleware.aggregator.close()
+
+    assert len(caplog.records) == 1
+
+    log_values = cast("dict[str, Any]", caplog.records[0].msg)
+    assert log_values["event"] == "HTTP requests summary"
+    assert [
+        (r["method"], r["route"], r["status_code"], r["count"])
+        for r in log_values["http_summary"]["requests"]
+    ] == [("GET", "/error", 500, 1), ("GET", "/value/{key}", 200, 3)]
+
+
+@pytest.mark.parametrize(
+    ("headers", "logged"),
+    [({}, []), ({"X-Debug-Log": "info"}, []), ({"X-Debug-Log": "debug"}, ["debug"])],
+)
+def test_log_middleware_raises_the_level_of_requests_from_the_header(
+    log_config: LogConfig,
+    caplog: LogCaptureFixture,
+    headers: dict[str, str],
+    logged: list[str],
+) -> None:
+    log_config = log_config.model_copy(
+        update={"level_elevation": LevelElevationSettings(enabled=True)}
+    )
+    configure_logger(log_config)
+
+    app = FastAPI()
+
+    @app.get("/")
+    def _index() -> str:
+        # Not the module's logger, cached with the processors of its first use
+        structlog.get_logger().debug("debug")
+        return "OK"
+
+    middlewares.add_log_middlewares(app, log_config)
+    client = TestClient(app)
+
+    assert client.get("/", headers=headers).is_success
+    # The next request is back to the global level
+    assert client.get("/").is_success
+
+    events = [cast("dict[str, Any]", r.msg)["event"] for r in caplog.records]
+    assert events == [*logged, "GET / 200", "GET / 200"]
@@ -1,19 +1,28 @@
 import importlib.metadata
+from collections.abc import Iterator
 from http import HTTPStatus
+from typing import Any, cast
 from unittest.mock import Mock, patch
 from uuid import uuid4
 
 import pytest
+import structlog
 from _pytest.logging import LogCaptureFixture
 from faker import Faker
-from flask import Flask
+from flask import Flask, Response
 from flask.testing import FlaskClient
 from structlog.contextvars import bound_contextvars
+from structlog.stdlib import BoundLogger
 
 from acidrain_logging import LogConfig, OutputFormat
+from acidrain_logging.config import AccessLogSettings
+from acidrain_logging.context import get_contextvars
 from acidrain_logging.flask import middlewares
 from acidrain_logging.testing.factories import LogConfigFactory
 from acidrain_logging.testing.flask import create_app
+from acidrain_logging.wsgi import middlewares as wsgi_middlewares
+
+log: BoundLogger = structlog.get_logger()
 
 
 @pytest.fixture(scope="module")
@@ -31,6 +40,8 @@ def api_app(log_config: LogConfig) -> Flask:
 
 @pytest.fixture
 def api_client(api_app: Flask) -> FlaskClient:
+    # Requests are logged once the response is closed: they are made with
+    # `buffered=True` so that the test client consumes and closes it, like a server.
     return api_app.test_client()
 
 
@@ -40,7 +51,7 @@ def test_context_reset_middleware(
     extra_value = faker.pystr()
 
     with bound_contextvars(extra_value=extra_value):
-        resp = api_client.get("/")
+        resp = api_client.get("/", buffered=True)
 
     assert resp.status_code == HTTPStatus.OK
 
@@ -56,9 +67,9 @@ def test_trace_id_middleware_adds_trace_id_when_no_header(
 ) -> None:
     trace_id = uuid4()
 
-    with patch(f"{middlewares.__name__}.uuid4") as uuid4_mock:
-        uuid4_mock.return_value = trace_id
-        resp = api_client.get("/")
+    with patch(f"{wsgi_middlewares.__name__}.new_trace_id") as new_trace_id_mock:
+        new_trace_id_mock.return_value = str(trace_id)
+        resp = api_client.get("/", buffered=True)
 
     assert resp.status_code == HTTPStatus.OK
 
@@ -74,7 +85,7 @@ def test_trace_id_middleware_re_uses_trace_id_from_headers(
 ) -> None:
     trace_id = faker.pystr()
 
-    resp = api_client.get("/", headers={"x-trace-id": trace_id})
+    resp = api_client.get("/", headers={"x-trace-id": trace_id}, buffered=True)
     assert resp.status_code == HTTPStatus.OK
 
     assert len(caplog.records) == 1
@@ -84,15 +95,17 @@ def test_trace_id_middleware_re_uses_trace_id_from_headers(
     assert log_values["trace_id"] == str(trace_id)
 
 
-@patch(f"{middlewares.__name__}.time")
+@patch(f"{wsgi_middlewares.__name__}.time")
 def test_log_request_middleware(
     time_mock: Mock, api_client: FlaskClient, caplog: LogCaptureFixture, faker: Faker
 ) -> None:
-    time_mock.perf_counter.side_effect = [1.23456789, 9.87654321]
+    time_mock.perf_counter.side_effect = [1.23456789, 5.67891234, 9.87654321]
 
     key1, key2, default, other = (faker.pystr() for _ in range(4))
 
-    resp = api_client.get(f"/value/{key1}/{key2}?default={default}&other={other}")
+    resp = api_client.get(
+        f"/value/{key1}/{key2}?default={default}&other={other}", buffered=True
+    )
     assert resp.status_code == HTTPStatus.OK
 
     assert len(caplog.records) == 1
@@ -115,30 +128,118 @@ def test_log_request_middleware(
         },
         "response": {
             "elapsed": 8641.975,
+            "time_to_headers": 4444.344,
+            "bytes_sent": 15,
             "status_code": 200,
         },
         "url": {"host": "localhost", "path": expected_path, "scheme": "http"},
     }
 
 
-def test_log_request_middleware_ignores_elapsed_if_theres_no_start_time(
-    api_app: Flask,
-    api_client: FlaskClient,
-    caplog: LogCaptureFixture,
+def test_log_request_middleware_logs_once_the_response_is_closed(
+    log_config: LogConfig, caplog: LogCaptureFixture, faker: Faker
 ) -> None:
-    funcs = api_app.before_request_funcs
-    api_app.before_request_funcs = {}
+    app = Flask(faker.pystr())
 
-    resp = api_client.get("/")
+    @app.route("/stream")
+    def _stream() -> Response:
+        def _chunks() -> Iterator[bytes]:
+            for i in range(3):
+                log.info("chunk %d", i)
+                yield b"x" * 10
 
-    api_app.before_request_funcs = funcs
+        return Response(_chunks())
 
+    middlewares.add_log_middlewares(app, log_config)
+
+    resp = app.test_client().get("/stream", buffered=True)
     assert resp.status_code == HTTPStatus.OK
 
+    events = [cast("dict[str, Any]", r.msg)["event"] for r in caplog.records]
+    assert events == ["chunk 0", "chunk 1", "chunk 2", "GET /stream 200"]
+
+    response_data = cast("dict[str, Any]", caplog.records[-1].msg)["http"]["response"]
+    assert response_data["bytes_sent"] == 30
+    assert 0 <= response_data["time_to_headers"] <= response_data["elapsed"]
+
+
+def test_log_request_middleware_skips_excluded_routes(
+    log_config: LogConfig, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    app = Flask(faker.pystr())
+
+    @app.route("/health")
+    def _health() -> str:
+        return "OK"
+
+    @app.route("/value/<key>")
+    def _get_value(key: str) -> str:
+        return key
+
+    access_log = AccessLogSettings(exclude={"/value/<key>"})
+    middlewares.add_log_middlewares(
+        app, log_config.model_copy(update={"access_log": access_log})
+    )
+    client = app.test_client()
+
+    assert (
+        client.get(f"/value/{faker.pystr()}", buffered=True).status_code
+        == HTTPStatus.OK
+    )
+    assert client.get("/health", buffered=True).status_code == HTTPStatus.OK
+
     assert len(caplog.records) == 1
 
     log_values = caplog.records[0].msg
     assert isinstance(log_values, dict)  # type check
+    assert log_values["event"] == "GET /health 200"
+
+
+def test_log_request_middleware_aggregates_requests(
+    log_config: LogConfig, caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    app = Flask(faker.pystr())
+
+    @app.route("/value/<key>")
+    def _get_value(key: str) -> str:
+        return key
+
+    access_log = AccessLogSettings(aggregate=True, aggregate_interval_s=3600)
+    with patch(f"{wsgi_middlewares.__name__}.create_aggregator") as create_aggregator:
+        middlewares.add_log_middlewares(
+            app, log_config.model_copy(update={"access_log": access_log})
+        )
+
+    client = app.test_client()
+    keys = [faker.pystr() for _ in range(3)]
+    for key in keys:
+        assert client.get(f"/value/{key}", buffered=True).status_code == HTTPStatus.OK
+    assert client.get("/missing", buffered=True).status_code == HTTPStatus.NOT_FOUND
+
+    assert caplog.records == []
+
+    create_aggregator.assert_called_once_with(access_log)
+    aggregator = create_aggregator.return_value
+    assert [c.args[:3] for c in aggregator.record.call_args_list] == [
+        *(("GET", "/value/<key>", 200) for _ in keys),
+        ("GET", None, 404),
+    ]
+
+
+def test_legacy_middlewares_are_deprecated(faker: Faker) -> None:
+    trace_id = faker.uuid4()
+    seen = {}
+
+    def _app(_environ: object, _start_response: object) -> list[bytes]:
+        seen.update(get_contextvars())
+        return []
+
+    with pytest.warns(DeprecationWarning, match="TraceIdMiddleware is deprecated"):
+        trace_id_app = middlewares.TraceIdMiddleware(_app)
+    with pytest.warns(DeprecationWarning, match="ResetContextMiddleware is deprecated"):
+        app = middlewares.ResetContextMiddleware(trace_id_app)
+
+    with bound_contextvars(extra_value=faker.pystr()):
+        app({"HTTP_X_TRACE_ID": trace_id}, Mock())
 
-    assert log_values["event"] == "GET / 200"
-    assert "elapsed" not in log_values["http"]["response"]
+    assert seen == {"trace_id": trace_id}
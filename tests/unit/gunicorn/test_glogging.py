@@ -0,0 +1,92 @@
+import logging
+from datetime import timedelta
+from typing import Any, cast
+from unittest.mock import Mock, patch
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from _pytest.logging import LogCaptureFixture
+from gunicorn.config import Config  # type: ignore[import-untyped]
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.gunicorn import glogging
+from acidrain_logging.gunicorn.glogging import Logger
+from acidrain_logging.testing.factories import LogConfigFactory
+
+
+@pytest.fixture(autouse=True)
+def _configure_logger() -> None:
+    log_config: LogConfig = LogConfigFactory.build(
+        output_format=OutputFormat.CONSOLE, level="INFO"
+    )
+    configure_logger(log_config)
+
+
+def _create_logger(**settings: str) -> Logger:
+    cfg = Config()
+    for name, value in settings.items():
+        cfg.set(name, value)
+
+    return Logger(cfg)
+
+
+@pytest.mark.parametrize("configured", [True, False])
+def test_logger_configures_the_logging_once(*, configured: bool) -> None:
+    with (
+        patch(f"{glogging.__name__}.is_configured", return_value=configured),
+        patch(f"{glogging.__name__}.configure_logger") as configure_logger_mock,
+    ):
+        _create_logger()
+
+    assert configure_logger_mock.called is not configured
+
+
+def test_logger_propagates_the_error_log(caplog: LogCaptureFixture) -> None:
+    logger = _create_logger(loglevel="warning")
+
+    logger.info("Booting worker")
+    logger.warning("Worker timeout")
+
+    assert [(r.name, r.getMessage()) for r in caplog.records] == [
+        ("gunicorn.error", "Worker timeout")
+    ]
+    assert not logging.getLogger("gunicorn.error").handlers
+
+
+def _access(logger: Logger) -> None:
+    environ: dict[str, Any] = {
+        "PATH_INFO": "/items",
+        "QUERY_STRING": "page=2",
+        "REMOTE_ADDR": "10.0.0.1",
+        "HTTP_USER_AGENT": "test-agent",
+    }
+    setup_testing_defaults(environ)
+    resp = Mock(status="200 OK", sent=15)
+
+    logger.access(resp, Mock(), environ, timedelta(microseconds=12345))
+
+
+def test_logger_leaves_the_access_log_to_the_middlewares(
+    caplog: LogCaptureFixture,
+) -> None:
+    _access(_create_logger())
+
+    assert caplog.records == []
+
+
+def test_logger_logs_the_requests_if_the_access_log_is_enabled(
+    caplog: LogCaptureFixture,
+) -> None:
+    _access(_create_logger(accesslog="-"))
+
+    assert len(caplog.records) == 1
+    log_values = cast("dict[str, Any]", caplog.records[0].msg)
+    assert caplog.records[0].name == "gunicorn.access"
+    assert log_values["event"] == "GET /items 200"
+    assert log_values["http"] == {
+        "method": "GET",
+        "client": {"remote_ip": "10.0.0.1", "user_agent": "test-agent"},
+        "request": {"path_params": None, "query_params": {"page": "2"}},
+        "url": {"host": "127.0.0.1", "path": "/items", "scheme": "http"},
+        "response": {"elapsed": 12.345, "bytes_sent": 15, "status_code": 200},
+    }
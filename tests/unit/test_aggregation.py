@@ -0,0 +1,479 @@
+import multiprocessing
+import os
+import signal
+import time
+from collections.abc import Callable, Generator
+from typing import TYPE_CHECKING
+from unittest.mock import ANY, Mock, patch
+
+import pytest
+
+from acidrain_logging import aggregation
+from acidrain_logging.aggregation import (
+    BUCKET_BOUNDS_MS,
+    LatencyHistogram,
+    RequestAggregator,
+    SharedRequestStats,
+    TaskAggregator,
+    create_aggregator,
+    get_shared_stats,
+    get_summary,
+    set_shared_stats,
+)
+from acidrain_logging.config import AccessLogSettings
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from multiprocessing.sharedctypes import Synchronized
+
+
+@pytest.fixture
+def aggregator() -> Generator[RequestAggregator, None, None]:
+    aggregator = RequestAggregator(interval_s=3600)
+    yield aggregator
+    aggregator.close()
+
+
+def test_latency_histogram_percentiles_are_bucket_upper_bounds() -> None:
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+
+    for q in (50, 90, 99):
+        estimate = histogram.percentile(q)
+        # Within one bucket of the exact value
+        assert q <= estimate <= q * 2 ** (1 / 4)
+
+    assert histogram.percentile(100) == 100
+    assert histogram.max == 100
+
+
+def test_latency_histogram_percentiles_are_capped_by_the_max() -> None:
+    histogram = LatencyHistogram()
+    histogram.record(1.01)
+
+    assert histogram.percentile(50) == 1.01
+
+
+def test_latency_histogram_handles_values_out_of_the_buckets() -> None:
+    histogram = LatencyHistogram()
+    histogram.record(0)
+    histogram.record(BUCKET_BOUNDS_MS[-1] * 10)
+
+    assert histogram.percentile(1) == BUCKET_BOUNDS_MS[0]
+    assert histogram.percentile(99) == BUCKET_BOUNDS_MS[-1] * 10
+
+
+def test_latency_histogram_summary() -> None:
+    histogram = LatencyHistogram()
+    # Bucket bounds, for exact estimates
+    for value in (1.6, 3.2, 6.4, 25.6):
+        histogram.record(value)
+
+    assert histogram.summary() == {
+        "count": 4,
+        "mean": 9.2,
+        "p50": 3.2,
+        "p90": 25.6,
+        "p99": 25.6,
+        "max": 25.6,
+    }
+
+
+def test_latency_histogram_summary_when_empty() -> None:
+    assert LatencyHistogram().summary() == {
+        "count": 0,
+        "mean": 0.0,
+        "p50": 0.0,
+        "p90": 0.0,
+        "p99": 0.0,
+        "max": 0.0,
+    }
+
+
+def test_get_summary_is_sorted_by_route_method_and_status() -> None:
+    keys = [
+        ("POST", "/items", 201),
+        ("GET", "/items", 500),
+        ("GET", None, 404),
+        ("GET", "/items", 200),
+    ]
+
+    summary = get_summary(dict.fromkeys(keys, LatencyHistogram()), 12.3456)
+
+    assert summary["interval_s"] == 12.346
+    assert [
+        (r["method"], r["route"], r["status_code"]) for r in summary["requests"]
+    ] == [
+        ("GET", None, 404),
+        ("GET", "/items", 200),
+        ("GET", "/items", 500),
+        ("POST", "/items", 201),
+    ]
+
+
+@patch(f"{aggregation.__name__}.log")
+def test_request_aggregator_emits_a_summary_of_the_recorded_requests(
+    log_mock: Mock, aggregator: RequestAggregator
+) -> None:
+    aggregator.record("GET", "/items/{item_id}", 200, 12.8)
+    aggregator.record("GET", "/items/{item_id}", 200, 25.6)
+    aggregator.record("GET", "/items/{item_id}", 404, 1.6)
+
+    aggregator.emit()
+
+    log_mock.info.assert_called_once_with(
+        "HTTP requests summary",
+        http_summary={
+            "interval_s": ANY,
+            "requests": [
+                {
+                    "method": "GET",
+                    "route": "/items/{item_id}",
+                    "status_code": 200,
+                    "count": 2,
+                    "mean": 19.2,
+                    "p50": 12.8,
+                    "p90": 25.6,
+                    "p99": 25.6,
+                    "max": 25.6,
+                },
+                {
+                    "method": "GET",
+                    "route": "/items/{item_id}",
+                    "status_code": 404,
+                    "count": 1,
+                    "mean": 1.6,
+                    "p50": 1.6,
+                    "p90": 1.6,
+                    "p99": 1.6,
+                    "max": 1.6,
+                },
+            ],
+        },
+    )
+
+    # Starts over after each summary, and doesn't log empty ones
+    log_mock.reset_mock()
+    aggregator.emit()
+    log_mock.info.assert_not_called()
+
+
+@patch(f"{aggregation.__name__}.log")
+def test_request_aggregator_emits_periodically(log_mock: Mock) -> None:
+    aggregator = RequestAggregator(interval_s=0.01)
+    aggregator.record("GET", "/", 200, 1)
+
+    for _ in range(100):
+        if log_mock.info.called:
+            break
+        time.sleep(0.01)
+
+    aggregator.close()
+
+    log_mock.info.assert_called_once()
+
+
+@patch(f"{aggregation.__name__}.log")
+def test_request_aggregator_emits_on_close(log_mock: Mock) -> None:
+    aggregator = RequestAggregator(interval_s=3600)
+    aggregator.record("GET", "/", 200, 1)
+
+    aggregator.close()
+    aggregator.close()
+
+    log_mock.info.assert_called_once()
+
+
+@patch(f"{aggregation.__name__}.log")
+def test_task_aggregator_emits_a_summary_per_task_name(log_mock: Mock) -> None:
+    aggregator = TaskAggregator(interval_s=3600)
+    aggregator.record("tasks.send_email", "SUCCESS", 12.8, 1.6)
+    aggregator.record("tasks.send_email", "FAILURE", 25.6, None)
+    aggregator.record("tasks.cleanup", "SUCCESS", 1.6, 0.8)
+
+    aggregator.close()
+
+    histogram = {
+        "count": ANY,
+        "mean": ANY,
+        "p50": ANY,
+        "p90": ANY,
+        "p99": ANY,
+        "max": ANY,
+    }
+    log_mock.info.assert_called_once_with(
+        "Celery tasks summary",
+        task_summary={
+            "interval_s": ANY,
+            "tasks": [
+                {
+                    "name": "tasks.cleanup",
+                    "count": 1,
+                    "states": {"SUCCESS": 1},
+                    "duration": histogram,
+                    "start_delay": histogram,
+                },
+                {
+                    "name": "tasks.send_email",
+                    "count": 2,
+                    "states": {"SUCCESS": 1, "FAILURE": 1},
+                    "duration": {**histogram, "count": 2, "max": 25.6},
+                    # Only the runs with a known start delay
+                    "start_delay": {**histogram, "count": 1, "max": 1.6},
+                },
+            ],
+        },
+    )
+
+
+def _record_in_child(aggregator: RequestAggregator, conn: "Connection") -> None:
+    aggregator.record("POST", "/items", 201, 1)
+    conn.send(
+        (aggregator._thread.is_alive(), list(aggregator._data))  # noqa: SLF001
+    )
+
+
+def test_request_aggregator_starts_over_in_forked_processes(
+    aggregator: RequestAggregator,
+) -> None:
+    aggregator.record("GET", "/items", 200, 1)
+
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_record_in_child, args=(aggregator, child_conn))
+    process.start()
+    process.join()
+
+    assert parent_conn.recv() == (True, [("POST", "/items", 201)])
+
+
+def test_request_aggregator_starts_over_after_a_fork() -> None:
+    aggregator = RequestAggregator(interval_s=0.01)
+    aggregator.record("GET", "/items", 200, 1)
+    thread = aggregator._thread  # noqa: SLF001
+
+    # Like in the forked processes, where the thread of the parent is gone
+    aggregator._reset_after_fork()  # noqa: SLF001
+
+    assert aggregator._data == {}  # noqa: SLF001
+    assert aggregator._thread is not thread  # noqa: SLF001
+    assert aggregator._thread.is_alive()  # noqa: SLF001
+
+    aggregator.close()
+    thread.join()
+
+
+def _record_requests(stats: SharedRequestStats, count: int) -> None:
+    for _ in range(count):
+        stats.record("GET", "/items/{item_id}", 200, 1.6)
+    stats.record("POST", None, 404, 25.6)
+
+
+def _run_in_processes(
+    target: Callable[..., None], *args: object, processes: int = 4
+) -> None:
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=target, args=args) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+
+def test_shared_request_stats_sums_the_requests_of_all_processes() -> None:
+    stats = SharedRequestStats(max_workers=8, max_keys=8)
+
+    _run_in_processes(_record_requests, stats, 10)
+
+    histograms, interval_s = stats.collect()
+
+    assert interval_s > 0
+    assert set(histograms) == {("GET", "/items/{item_id}", 200), ("POST", None, 404)}
+
+    histogram = histograms["GET", "/items/{item_id}", 200]
+    assert histogram.summary() == {
+        "count": 40,
+        "mean": 1.6,
+        "p50": 1.6,
+        "p90": 1.6,
+        "p99": 1.6,
+        "max": 1.6,
+    }
+    assert histograms["POST", None, 404].count == 4
+
+
+def test_shared_request_stats_only_collects_the_requests_since_the_last_time() -> None:
+    stats = SharedRequestStats(max_workers=8, max_keys=8)
+
+    _run_in_processes(_record_requests, stats, 10)
+    stats.collect()
+
+    assert stats.collect() == ({}, ANY)
+
+    # The regions of the dead processes are reused, without losing any count
+    _run_in_processes(_record_requests, stats, 5, processes=2)
+    histograms, _ = stats.collect()
+
+    assert histograms["GET", "/items/{item_id}", 200].count == 10
+    assert histograms["POST", None, 404].count == 2
+
+
+def test_shared_request_stats_ignores_requests_past_its_capacity() -> None:
+    stats = SharedRequestStats(max_workers=1, max_keys=2)
+
+    stats.record("GET", "/a", 200, 1)
+    stats.record("GET", "/b", 200, 1)
+    stats.record("GET", "/c", 200, 1)
+    stats.record("GET", "/" + "x" * 300, 200, 1)
+    # No region left for another process
+    _run_in_processes(_record_requests, stats, 1, processes=1)
+
+    histograms, _ = stats.collect()
+
+    assert set(histograms) == {("GET", "/a", 200), ("GET", "/b", 200)}
+
+
+def test_shared_request_stats_takes_its_region_back_on_pid_reuse() -> None:
+    stats = SharedRequestStats(max_workers=2, max_keys=2)
+    stats.record("GET", "/", 200, 1)
+    region = stats._region  # noqa: SLF001
+
+    # Like a process reusing the pid of a dead one
+    stats._pid = 0  # noqa: SLF001
+    stats.record("GET", "/", 200, 1)
+
+    assert stats._region == region  # noqa: SLF001
+    assert stats.collect()[0]["GET", "/", 200].count == 2
+
+
+def test_shared_request_stats_does_not_inherit_the_locks_held_when_forking() -> None:
+    stats = SharedRequestStats(max_workers=2, max_keys=2)
+
+    # As if other threads were recording when forking
+    with stats._lock, stats._shared_thread_lock:  # noqa: SLF001
+        _run_in_processes(_record_requests, stats, 1, processes=1)
+
+    histograms, _ = stats.collect()
+
+    assert histograms["GET", "/items/{item_id}", 200].count == 1
+
+
+def test_shared_request_stats_restart_their_emitter_after_a_fork() -> None:
+    stats = SharedRequestStats(max_workers=2, max_keys=2)
+    stats.start_emitter(3600)
+    emitter, closed = stats._emitter, stats._closed  # noqa: SLF001
+
+    # Like in the forked processes, where the thread of the parent is gone
+    with stats._lock, stats._shared_thread_lock:  # noqa: SLF001
+        stats._reset_after_fork()  # noqa: SLF001
+
+    stats.start_emitter(3600)
+    assert stats._emitter is not emitter  # noqa: SLF001
+    stats.close()
+
+    closed.set()
+    assert emitter is not None
+    emitter.join()
+
+
+def _die_holding_the_lock(stats: SharedRequestStats) -> None:  # pragma: no cover
+    # Killed before it could save its coverage
+    with stats._shared_lock():  # noqa: SLF001
+        os.kill(os.getpid(), signal.SIGKILL)
+
+
+def test_shared_request_stats_survive_a_process_killed_holding_the_lock() -> None:
+    stats = SharedRequestStats(max_workers=2, max_keys=2)
+
+    process = multiprocessing.get_context("fork").Process(
+        target=_die_holding_the_lock, args=(stats,)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == -signal.SIGKILL
+
+    stats.record("GET", "/", 200, 1)
+
+    assert list(stats.collect()[0]) == [("GET", "/", 200)]
+
+
+def _start_emitter_and_record(
+    stats: SharedRequestStats, elected: "Synchronized[int]"
+) -> None:
+    stats.start_emitter(3600)
+    stats.record("GET", "/", 200, 1)
+    with elected.get_lock():
+        elected.value += stats._elect()  # noqa: SLF001
+
+
+def test_shared_request_stats_elects_a_single_emitter() -> None:
+    stats = SharedRequestStats(max_workers=8, max_keys=8)
+    stats.start_emitter(3600)
+    elected = multiprocessing.get_context("fork").Value("i", 0)
+
+    # The parent process was elected first
+    assert stats._elect() is True  # noqa: SLF001
+    _run_in_processes(_start_emitter_and_record, stats, elected)
+    assert elected.value == 0
+
+    with patch(f"{aggregation.__name__}.log") as log_mock:
+        stats.close()
+
+    # The parent emits what is left when it stops, and steps down
+    log_mock.info.assert_called_once()
+    assert log_mock.info.call_args.kwargs["http_summary"]["requests"][0]["count"] == 4
+
+    _run_in_processes(_start_emitter_and_record, stats, elected, processes=1)
+    assert elected.value == 1
+
+
+@patch(f"{aggregation.__name__}.log")
+def test_shared_request_stats_emits_periodically(log_mock: Mock) -> None:
+    stats = SharedRequestStats(max_workers=1, max_keys=1)
+    stats.record("GET", "/", 200, 1)
+    stats.start_emitter(0.01)
+    emitter = stats._emitter  # noqa: SLF001
+
+    # Already started
+    stats.start_emitter(0.01)
+    assert stats._emitter is emitter  # noqa: SLF001
+
+    for _ in range(100):
+        if log_mock.info.called:
+            break
+        time.sleep(0.01)
+
+    stats.close()
+    # Already stopped
+    stats.close()
+
+    log_mock.info.assert_called_once()
+
+
+@pytest.mark.parametrize("aggregate", [True, False])
+def test_create_aggregator(*, aggregate: bool) -> None:
+    settings = AccessLogSettings(aggregate=aggregate, aggregate_interval_s=3600)
+
+    aggregator = create_aggregator(settings)
+
+    if aggregate:
+        assert isinstance(aggregator, RequestAggregator)
+        aggregator.close()
+    else:
+        assert aggregator is None
+
+
+def test_create_aggregator_returns_the_shared_stats_if_installed() -> None:
+    stats = SharedRequestStats(max_workers=1, max_keys=1)
+    settings = AccessLogSettings(aggregate=True, aggregate_interval_s=3600)
+
+    set_shared_stats(stats)
+    try:
+        assert get_shared_stats() is stats
+        assert create_aggregator(settings) is stats
+        assert stats._emitter is not None  # noqa: SLF001
+    finally:
+        set_shared_stats(None)
+        stats.close()
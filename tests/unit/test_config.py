@@ -1,8 +1,27 @@
+from pathlib import Path
+
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
 from acidrain_logging import LogConfig, OutputFormat
-from acidrain_logging.config import DatadogSettings, InvalidLogLevelError
+from acidrain_logging.config import (
+    AccessLogSettings,
+    BatchSettings,
+    DatadogSettings,
+    ExceptionFormat,
+    ExceptionSettings,
+    FlightRecorderSettings,
+    FunnelSettings,
+    InvalidLogLevelError,
+    LevelElevationSettings,
+    LogControlSettings,
+    OverflowPolicy,
+    QueueSettings,
+    RateLimitSettings,
+    TaskLogSettings,
+    TraceIdFormat,
+    TraceIdSettings,
+)
 
 
 def test_log_config(monkeypatch: MonkeyPatch) -> None:
@@ -13,6 +32,8 @@ def test_log_config(monkeypatch: MonkeyPatch) -> None:
         ctx.setenv("ACIDRAIN_LOG_LOGGER_LEVELS", '{"foo.bar": "error"}')
         ctx.setenv("ACIDRAIN_LOG_TIMESTAMP_FORMAT", "%m/%d/%Y")  # derp format
         ctx.setenv("ACIDRAIN_LOG_TIMESTAMP_KEY", "asctime")
+        ctx.setenv("ACIDRAIN_LOG_STATIC_FIELDS", '{"region": "north"}')
+        ctx.setenv("ACIDRAIN_LOG_FAST_PATH", "1")
 
         config = LogConfig()
 
@@ -22,6 +43,8 @@ def test_log_config(monkeypatch: MonkeyPatch) -> None:
     assert config.logger_levels == {"foo.bar": "error"}
     assert config.timestamp_format == "%m/%d/%Y"
     assert config.timestamp_key == "asctime"
+    assert config.static_fields == {"region": "north"}
+    assert config.fast_path is True
 
 
 def test_log_config_default_values() -> None:
@@ -31,8 +54,10 @@ def test_log_config_default_values() -> None:
     assert config.output_format == OutputFormat.JSON
     assert config.color is True
     assert config.logger_levels == {}
+    assert config.static_fields == {}
     assert config.timestamp_format == "iso"
     assert config.timestamp_key == "timestamp"
+    assert config.fast_path is False
 
 
 @pytest.mark.parametrize(
@@ -104,3 +129,364 @@ def test_datadog_settings_default_values() -> None:
     assert dd.env == ""
     assert dd.service == ""
     assert dd.version == ""
+
+
+@pytest.mark.parametrize(
+    ("datadog", "expected"),
+    [
+        (DatadogSettings(injection_enabled=False, env="test"), {"host": "h"}),
+        (
+            DatadogSettings(env="test"),
+            {"dd.env": "test", "dd.service": "", "dd.version": "", "host": "h"},
+        ),
+    ],
+)
+def test_log_config_static_fields_include_the_datadog_ones(
+    datadog: DatadogSettings, expected: dict[str, str]
+) -> None:
+    config = LogConfig(datadog=datadog, static_fields={"host": "h"})
+
+    assert config.get_static_fields() == expected
+
+
+def test_queue_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_QUEUE_ENABLED", "true")
+        ctx.setenv("ACIDRAIN_LOG_QUEUE_MAX_SIZE", "42")
+        ctx.setenv("ACIDRAIN_LOG_QUEUE_OVERFLOW_POLICY", "drop_oldest")
+        ctx.setenv("ACIDRAIN_LOG_QUEUE_PROTECTED_LEVEL", "warning")
+        ctx.setenv("ACIDRAIN_LOG_QUEUE_CLOSE_TIMEOUT_S", "0.5")
+
+        queue = QueueSettings()
+
+    assert queue.enabled is True
+    assert queue.max_size == 42
+    assert queue.overflow_policy == OverflowPolicy.DROP_OLDEST
+    assert queue.protected_level == "WARNING"
+    assert queue.close_timeout_s == 0.5
+
+
+def test_queue_settings_default_values() -> None:
+    queue = QueueSettings()
+
+    assert queue.enabled is False
+    assert queue.max_size == 10_000
+    assert queue.overflow_policy == OverflowPolicy.BLOCK
+    assert queue.protected_level == "ERROR"
+    assert queue.close_timeout_s == 5.0
+
+
+def test_queue_settings_validate_protected_level() -> None:
+    with pytest.raises(InvalidLogLevelError, match="Invalid log level: invalid"):
+        QueueSettings(protected_level="invalid")
+
+
+def test_batch_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_BATCH_ENABLED", "true")
+        ctx.setenv("ACIDRAIN_LOG_BATCH_MAX_BYTES", "4096")
+        ctx.setenv("ACIDRAIN_LOG_BATCH_MAX_COUNT", "16")
+        ctx.setenv("ACIDRAIN_LOG_BATCH_MAX_LATENCY_MS", "50")
+        ctx.setenv("ACIDRAIN_LOG_BATCH_FLUSH_LEVEL", "warning")
+
+        batch = BatchSettings()
+
+    assert batch.enabled is True
+    assert batch.max_bytes == 4096
+    assert batch.max_count == 16
+    assert batch.max_latency_ms == 50
+    assert batch.flush_level == "WARNING"
+
+
+def test_batch_settings_default_values() -> None:
+    batch = BatchSettings()
+
+    assert batch.enabled is False
+    assert batch.max_bytes == 64 * 1024
+    assert batch.max_count == 1024
+    assert batch.max_latency_ms == 200
+    assert batch.flush_level == "ERROR"
+
+
+def test_batch_settings_validate_flush_level() -> None:
+    with pytest.raises(InvalidLogLevelError, match="Invalid log level: invalid"):
+        BatchSettings(flush_level="invalid")
+
+
+def test_funnel_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_FUNNEL_ENABLED", "true")
+        ctx.setenv("ACIDRAIN_LOG_FUNNEL_MAX_BYTES", "4096")
+        ctx.setenv("ACIDRAIN_LOG_FUNNEL_MAX_LATENCY_MS", "50")
+        ctx.setenv("ACIDRAIN_LOG_FUNNEL_FLUSH_LEVEL", "warning")
+
+        funnel = FunnelSettings()
+
+    assert funnel.enabled is True
+    assert funnel.max_bytes == 4096
+    assert funnel.max_latency_ms == 50
+    assert funnel.flush_level == "WARNING"
+
+
+def test_funnel_settings_default_values() -> None:
+    funnel = FunnelSettings()
+
+    assert funnel.enabled is False
+    assert funnel.max_bytes == 64 * 1024
+    assert funnel.max_latency_ms == 100
+    assert funnel.flush_level == "ERROR"
+
+
+def test_access_log_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_DEFAULT_SAMPLE_RATE", "0.5")
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_SAMPLE_RATES", '{"/metrics": 0.01}')
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_EXCLUDE", '["/health"]')
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_ALWAYS_LOG_STATUS", "400")
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_ALWAYS_LOG_SLOWER_THAN_MS", "1000")
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_AGGREGATE", "true")
+        ctx.setenv("ACIDRAIN_LOG_ACCESS_AGGREGATE_INTERVAL_S", "10")
+
+        access_log = AccessLogSettings()
+
+    assert access_log.default_sample_rate == 0.5
+    assert access_log.sample_rates == {"/metrics": 0.01}
+    assert access_log.exclude == {"/health"}
+    assert access_log.always_log_status == 400
+    assert access_log.always_log_slower_than_ms == 1000
+    assert access_log.aggregate is True
+    assert access_log.aggregate_interval_s == 10
+
+
+def test_access_log_settings_default_values() -> None:
+    access_log = AccessLogSettings()
+
+    assert access_log.default_sample_rate == 1.0
+    assert access_log.sample_rates == {}
+    assert access_log.exclude == set()
+    assert access_log.always_log_status == 500
+    assert access_log.always_log_slower_than_ms is None
+    assert access_log.aggregate is False
+    assert access_log.aggregate_interval_s == 60
+
+
+@pytest.mark.parametrize("rate", [-0.1, 1.1])
+def test_access_log_settings_validate_sample_rates(rate: float) -> None:
+    with pytest.raises(ValueError, match="1 validation error"):
+        AccessLogSettings(default_sample_rate=rate)
+
+    with pytest.raises(ValueError, match="1 validation error"):
+        AccessLogSettings(sample_rates={"/": rate})
+
+
+def test_rate_limit_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_RATE_LIMIT_ENABLED", "1")
+        ctx.setenv("ACIDRAIN_LOG_RATE_LIMIT_RATE", "0.5")
+        ctx.setenv("ACIDRAIN_LOG_RATE_LIMIT_BURST", "100")
+        ctx.setenv("ACIDRAIN_LOG_RATE_LIMIT_MAX_KEYS", "10")
+
+        rate_limit = RateLimitSettings()
+
+    assert rate_limit.enabled is True
+    assert rate_limit.rate == 0.5
+    assert rate_limit.burst == 100
+    assert rate_limit.max_keys == 10
+
+
+def test_rate_limit_settings_default_values() -> None:
+    rate_limit = RateLimitSettings()
+
+    assert rate_limit.enabled is False
+    assert rate_limit.rate == 1.0
+    assert rate_limit.burst == 10
+    assert rate_limit.max_keys == 1024
+
+
+def test_exception_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_FORMAT", "dict")
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_CACHE_SIZE", "0")
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_MAX_FRAMES", "10")
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_SHOW_LOCALS", "1")
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_LOCALS_MAX_LENGTH", "5")
+        ctx.setenv("ACIDRAIN_LOG_EXCEPTION_LOCALS_MAX_STRING", "40")
+
+        exceptions = ExceptionSettings()
+
+    assert exceptions.format == ExceptionFormat.DICT
+    assert exceptions.cache_size == 0
+    assert exceptions.max_frames == 10
+    assert exceptions.show_locals is True
+    assert exceptions.locals_max_length == 5
+    assert exceptions.locals_max_string == 40
+
+
+def test_exception_settings_default_values() -> None:
+    exceptions = ExceptionSettings()
+
+    assert exceptions.format == ExceptionFormat.TEXT
+    assert exceptions.cache_size == 256
+    assert exceptions.max_frames == 20
+    assert exceptions.show_locals is False
+    assert exceptions.locals_max_length == 10
+    assert exceptions.locals_max_string == 80
+
+
+def test_flight_recorder_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_RECORDER_ENABLED", "true")
+        ctx.setenv("ACIDRAIN_LOG_RECORDER_LEVEL", "info")
+        ctx.setenv("ACIDRAIN_LOG_RECORDER_MAX_EVENTS", "50")
+        ctx.setenv("ACIDRAIN_LOG_RECORDER_FLUSH_SLOWER_THAN_MS", "1000")
+
+        recorder = FlightRecorderSettings()
+
+    assert recorder.enabled is True
+    assert recorder.level == "INFO"
+    assert recorder.max_events == 50
+    assert recorder.flush_slower_than_ms == 1000
+
+
+def test_flight_recorder_settings_default_values() -> None:
+    recorder = FlightRecorderSettings()
+
+    assert recorder.enabled is False
+    assert recorder.level == "DEBUG"
+    assert recorder.max_events == 1000
+    assert recorder.flush_slower_than_ms is None
+
+
+def test_flight_recorder_settings_validate_level() -> None:
+    with pytest.raises(InvalidLogLevelError):
+        FlightRecorderSettings(level="invalid")
+
+
+def test_level_elevation_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_ELEVATION_ENABLED", "true")
+        ctx.setenv("ACIDRAIN_LOG_ELEVATION_HEADER", "X-Verbose")
+        ctx.setenv("ACIDRAIN_LOG_ELEVATION_LEVEL", "info")
+        ctx.setenv("ACIDRAIN_LOG_ELEVATION_SECRET", "s3cr3t")
+
+        elevation = LevelElevationSettings()
+
+    assert elevation.enabled is True
+    assert elevation.header == "X-Verbose"
+    assert elevation.level == "INFO"
+    assert elevation.secret is not None
+    assert elevation.secret.get_secret_value() == "s3cr3t"
+
+
+def test_level_elevation_settings_default_values() -> None:
+    elevation = LevelElevationSettings()
+
+    assert elevation.enabled is False
+    assert elevation.header == "X-Debug-Log"
+    assert elevation.level == "DEBUG"
+    assert elevation.secret is None
+
+
+def test_level_elevation_settings_validate_level() -> None:
+    with pytest.raises(InvalidLogLevelError):
+        LevelElevationSettings(level="invalid")
+
+
+def test_log_control_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_CONTROL_LEVELS_FILE", "/etc/app/log-levels.json")
+        ctx.setenv("ACIDRAIN_LOG_CONTROL_SIGNAL", "sighup")
+        ctx.setenv("ACIDRAIN_LOG_CONTROL_SOCKET_PATH", "/run/app/log-{pid}.sock")
+
+        control = LogControlSettings()
+
+    assert control.levels_file == Path("/etc/app/log-levels.json")
+    assert control.signal == "SIGHUP"
+    assert control.socket_path == "/run/app/log-{pid}.sock"
+
+
+def test_log_control_settings_default_values() -> None:
+    control = LogControlSettings()
+
+    assert control.levels_file is None
+    assert control.signal is None
+    assert control.socket_path is None
+
+
+def test_log_control_settings_signal_can_omit_its_prefix() -> None:
+    assert LogControlSettings(signal="usr1").signal == "SIGUSR1"
+
+
+@pytest.mark.parametrize("signal", ["SIGINVALID", "12"])
+def test_log_control_settings_validate_signal(signal: str) -> None:
+    with pytest.raises(ValueError, match=signal):
+        LogControlSettings(signal=signal)
+
+
+def test_task_log_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_TASK_DEFAULT_SAMPLE_RATE", "0.5")
+        ctx.setenv("ACIDRAIN_LOG_TASK_SAMPLE_RATES", '{"tasks.add": 0.01}')
+        ctx.setenv("ACIDRAIN_LOG_TASK_SAMPLE_EVERY", '{"tasks.ping": 100}')
+        ctx.setenv("ACIDRAIN_LOG_TASK_ALWAYS_LOG_SLOWER_THAN_MS", "1000")
+        ctx.setenv("ACIDRAIN_LOG_TASK_AGGREGATE", "true")
+        ctx.setenv("ACIDRAIN_LOG_TASK_AGGREGATE_INTERVAL_S", "10")
+        ctx.setenv("ACIDRAIN_LOG_TASK_ARGS_MAX_DEPTH", "2")
+        ctx.setenv("ACIDRAIN_LOG_TASK_ARGS_MAX_LENGTH", "10")
+        ctx.setenv("ACIDRAIN_LOG_TASK_ARGS_MAX_BYTES", "512")
+        ctx.setenv("ACIDRAIN_LOG_TASK_ARGS_ALLOW", '{"tasks.add": ["x"]}')
+        ctx.setenv("ACIDRAIN_LOG_TASK_ARGS_DENY", '{"tasks.login": ["*"]}')
+
+        task_log = TaskLogSettings()
+
+    assert task_log.default_sample_rate == 0.5
+    assert task_log.sample_rates == {"tasks.add": 0.01}
+    assert task_log.sample_every == {"tasks.ping": 100}
+    assert task_log.always_log_slower_than_ms == 1000
+    assert task_log.aggregate is True
+    assert task_log.aggregate_interval_s == 10
+    assert task_log.args_max_depth == 2
+    assert task_log.args_max_length == 10
+    assert task_log.args_max_bytes == 512
+    assert task_log.args_allow == {"tasks.add": {"x"}}
+    assert task_log.args_deny == {"tasks.login": {"*"}}
+
+
+def test_task_log_settings_default_values() -> None:
+    task_log = TaskLogSettings()
+
+    assert task_log.default_sample_rate == 1.0
+    assert task_log.sample_rates == {}
+    assert task_log.sample_every == {}
+    assert task_log.always_log_slower_than_ms is None
+    assert task_log.aggregate is False
+    assert task_log.aggregate_interval_s == 60
+    assert task_log.args_max_depth == 4
+    assert task_log.args_max_length == 50
+    assert task_log.args_max_bytes == 4096
+    assert task_log.args_allow == {}
+    assert task_log.args_deny == {}
+
+
+@pytest.mark.parametrize("every", [0, -1])
+def test_task_log_settings_validate_sample_every(every: int) -> None:
+    with pytest.raises(ValueError, match="1 validation error"):
+        TaskLogSettings(sample_every={"tasks.add": every})
+
+
+def test_trace_id_settings(monkeypatch: MonkeyPatch) -> None:
+    with monkeypatch.context() as ctx:
+        ctx.setenv("ACIDRAIN_LOG_TRACE_ID_FORMAT", "traceparent")
+        ctx.setenv("ACIDRAIN_LOG_TRACE_ID_FROM_DATADOG", "true")
+
+        trace_id = TraceIdSettings()
+
+    assert trace_id.format == TraceIdFormat.TRACEPARENT
+    assert trace_id.from_datadog is True
+
+
+def test_trace_id_settings_default_values() -> None:
+    trace_id = TraceIdSettings()
+
+    assert trace_id.format == TraceIdFormat.UUID
+    assert trace_id.from_datadog is False
@@ -0,0 +1,171 @@
+import threading
+from logging import Logger
+from unittest.mock import Mock
+
+import structlog
+from faker import Faker
+
+from acidrain_logging.context import (
+    bind_contextvars,
+    bound_contextvars,
+    clear_contextvars,
+    get_bound_context,
+    get_contextvars,
+    merge_contextvars,
+    merge_structlog_contextvars,
+    reset_contextvars,
+    unbind_contextvars,
+)
+
+
+def test_bind_creates_a_new_context(faker: Faker) -> None:
+    key, value = faker.pystr(), faker.pystr()
+
+    before = get_bound_context()
+    token = bind_contextvars(**{key: value})
+
+    after = get_bound_context()
+    assert after is not before
+    assert after.fragment is None
+    assert get_contextvars() == {**before.values, key: value}
+
+    reset_contextvars(token)
+    assert get_bound_context() is before
+
+
+def test_unbind_removes_the_keys(faker: Faker) -> None:
+    key1, key2 = faker.pystr(), faker.pystr()
+
+    with bound_contextvars(**{key1: 1, key2: 2}):
+        context = get_bound_context()
+
+        unbind_contextvars(faker.pystr())  # Unknown keys are ignored
+        assert get_bound_context() is context
+
+        unbind_contextvars(key1)
+        assert get_contextvars().items() >= {key2: 2}.items()
+        assert key1 not in get_contextvars()
+
+
+def test_unbind_removes_the_keys_bound_with_structlog(faker: Faker) -> None:
+    key = faker.pystr()
+
+    structlog.contextvars.bind_contextvars(**{key: faker.pystr()})
+    unbind_contextvars(key)
+
+    assert key not in structlog.contextvars.get_contextvars()
+
+
+def test_bound_contextvars_restores_the_context(faker: Faker) -> None:
+    key = faker.pystr()
+
+    with bound_contextvars(**{key: 1}):
+        with bound_contextvars(**{key: 2}):
+            assert get_contextvars()[key] == 2
+
+        assert get_contextvars()[key] == 1
+
+    assert key not in get_contextvars()
+
+
+def test_bound_values_are_mirrored_in_the_structlog_contextvars(faker: Faker) -> None:
+    key1, key2 = faker.pystr(), faker.pystr()
+    before = structlog.contextvars.get_contextvars()
+
+    with bound_contextvars(**{key1: 1}):
+        token = bind_contextvars(**{key1: 2, key2: 3})
+        assert structlog.contextvars.get_contextvars() == {**before, key1: 2, key2: 3}
+
+        unbind_contextvars(key2)
+        assert structlog.contextvars.get_contextvars() == {**before, key1: 2}
+
+        reset_contextvars(token)
+        assert structlog.contextvars.get_contextvars() == {**before, key1: 1}
+
+    assert structlog.contextvars.get_contextvars() == before
+
+
+def test_clear_also_clears_the_structlog_contextvars(faker: Faker) -> None:
+    bind_contextvars(**{faker.pystr(): faker.pystr()})
+    structlog.contextvars.bind_contextvars(**{faker.pystr(): faker.pystr()})
+
+    clear_contextvars()
+
+    assert get_contextvars() == {}
+    assert structlog.contextvars.get_contextvars() == {}
+
+
+def test_context_is_bound_per_thread(faker: Faker) -> None:
+    key = faker.pystr()
+    seen = {}
+
+    def _in_thread() -> None:
+        seen.update(get_contextvars())
+
+    with bound_contextvars(**{key: faker.pystr()}):
+        thread = threading.Thread(target=_in_thread)
+        thread.start()
+        thread.join()
+
+    assert key not in seen
+
+
+def test_merge_contextvars_keeps_the_event_values(faker: Faker) -> None:
+    key1, key2 = faker.pystr(), faker.pystr()
+    value = faker.pystr()
+
+    with bound_contextvars(**{key1: 1, key2: 2}):
+        event_dict = merge_contextvars(
+            Mock(Logger), "info", {"event": value, key1: value}
+        )
+
+    # The bound values first, like structlog's contextvars
+    assert list(event_dict.items()) == [(key1, value), (key2, 2), ("event", value)]
+
+
+def test_merge_structlog_contextvars_leaves_the_mirrored_values(faker: Faker) -> None:
+    key1, key2, key3 = faker.pystr(), faker.pystr(), faker.pystr()
+
+    with (
+        bound_contextvars(**{key1: 1, key2: 2}),
+        structlog.contextvars.bound_contextvars(**{key2: "overridden", key3: 3}),
+    ):
+        event_dict = merge_structlog_contextvars(Mock(Logger), "info", {})
+
+    assert event_dict == {key2: "overridden", key3: 3}
+
+
+def test_merge_structlog_contextvars_adds_the_values_first(faker: Faker) -> None:
+    key1, key2 = faker.pystr(), faker.pystr()
+
+    with structlog.contextvars.bound_contextvars(**{key1: 1}):
+        event_dict = merge_structlog_contextvars(
+            Mock(Logger), "info", {"event": "message", key2: 2}
+        )
+
+    assert list(event_dict) == [key1, "event", key2]
+
+
+def test_structlog_keeps_its_context_variables_by_key(faker: Faker) -> None:
+    # Read by merge_structlog_contextvars, though not part of structlog's API
+    key = faker.pystr()
+    structlog.contextvars.bind_contextvars(**{key: 1})
+
+    var = structlog.contextvars._CONTEXT_VARS[f"structlog_{key}"]  # noqa: SLF001
+    assert var.get() == 1
+
+    structlog.contextvars.unbind_contextvars(key)
+    assert var.get() is Ellipsis
+
+
+def test_merge_structlog_contextvars_merges_the_keys_bound_since(faker: Faker) -> None:
+    key1, key2 = faker.pystr(), faker.pystr()
+
+    with structlog.contextvars.bound_contextvars(**{key1: 1}):
+        assert merge_structlog_contextvars(Mock(Logger), "info", {}) == {key1: 1}
+
+        with structlog.contextvars.bound_contextvars(**{key2: 2}):
+            event_dict = merge_structlog_contextvars(Mock(Logger), "info", {})
+            assert event_dict == {key1: 1, key2: 2}
+
+    assert merge_structlog_contextvars(Mock(Logger), "info", {}) == {}
@@ -0,0 +1,289 @@
+import json
+import logging
+import os
+import runpy
+import signal
+import socket
+import stat
+import sys
+import threading
+from collections.abc import Generator
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+import structlog
+from _pytest.capture import CaptureFixture
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import InvalidLogLevelError, LogControlSettings
+from acidrain_logging.control import (
+    LevelControlServer,
+    configure_log_control,
+    get_log_levels,
+    install_signal_handler,
+    main,
+    request_log_levels,
+    set_log_levels,
+)
+from acidrain_logging.testing.utils import retry
+
+
+@pytest.fixture(autouse=True)
+def _log_restore() -> Generator[None, None, None]:
+    logger = logging.getLogger()
+    handlers = [*logger.handlers]
+    level = logger.level
+    config = structlog.get_config()
+
+    yield
+
+    logger.handlers = handlers
+    logger.setLevel(level)
+    structlog.configure(**config)
+    for name in ("test.control", "test.other"):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    configure_log_control(LogConfig(), None)
+
+
+def _configure(*, fast_path: bool = False, **control: object) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            output_format=OutputFormat.JSON,
+            fast_path=fast_path,
+            logger_levels={"test.control": "WARNING"},
+            control=LogControlSettings(**control),  # type: ignore[arg-type]
+        )
+    )
+
+
+def _messages(capsys: CaptureFixture[str]) -> list[str]:
+    return [
+        json.loads(line)["message"] for line in capsys.readouterr().err.splitlines()
+    ]
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_set_log_levels_changes_the_levels_of_cached_loggers(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+    log = structlog.get_logger("test.other")
+    stdlib_logger = logging.getLogger("test.other")
+
+    log.debug("before")
+    assert not stdlib_logger.isEnabledFor(logging.DEBUG)
+
+    set_log_levels({"root": "DEBUG"})
+    log.debug("debug")
+    assert stdlib_logger.isEnabledFor(logging.DEBUG)
+
+    set_log_levels({"": "ERROR"})
+    log.warning("after")
+
+    assert _messages(capsys) == ["debug"]
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_set_log_levels_changes_the_levels_of_other_loggers(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+    log = structlog.get_logger("test.control")
+
+    log.info("before")
+    set_log_levels({"test.control": "debug"})
+    log.debug("debug")
+    structlog.get_logger("test.other").debug("other")
+
+    assert _messages(capsys) == ["debug"]
+
+
+def test_set_log_levels_checks_all_levels_first() -> None:
+    _configure()
+
+    with pytest.raises(InvalidLogLevelError):
+        set_log_levels({"root": "DEBUG", "test.control": "invalid"})
+
+    assert get_log_levels() == {"root": "INFO", "test.control": "WARNING"}
+
+
+def test_get_log_levels_includes_the_loggers_set_since() -> None:
+    _configure()
+
+    levels = set_log_levels({"test.other": "ERROR"})
+
+    assert levels == get_log_levels()
+    assert levels == {"root": "INFO", "test.control": "WARNING", "test.other": "ERROR"}
+
+
+def test_levels_can_be_set_through_the_socket(tmp_path: Path) -> None:
+    _configure(socket_path=str(tmp_path / "{pid}.sock"))
+    path = str(tmp_path / f"{os.getpid()}.sock")
+
+    assert request_log_levels(path) == {
+        "levels": {"root": "INFO", "test.control": "WARNING"}
+    }
+    assert request_log_levels(path, {"test.control": "DEBUG"}) == {
+        "levels": {"root": "INFO", "test.control": "DEBUG"}
+    }
+    assert request_log_levels(path, {"root": "invalid"}) == {
+        "error": "Invalid log level: invalid"
+    }
+    assert logging.getLogger("test.control").level == logging.DEBUG
+
+
+def test_socket_is_removed_on_close(tmp_path: Path) -> None:
+    server = LevelControlServer(str(tmp_path / "control.sock"))
+    assert Path(server.socket_path).exists()
+
+    server.close()
+
+    assert not Path(server.socket_path).exists()
+
+
+def test_socket_is_only_accessible_to_the_user(tmp_path: Path) -> None:
+    umask = os.umask(0o022)
+    try:
+        server = LevelControlServer(str(tmp_path / "control.sock"))
+    finally:
+        assert os.umask(umask) == 0o022
+
+    assert stat.S_IMODE(Path(server.socket_path).stat().st_mode) == 0o600
+    server.close()
+
+
+def test_socket_reads_requests_without_a_new_line(tmp_path: Path) -> None:
+    _configure(socket_path=str(tmp_path / "control.sock"))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(str(tmp_path / "control.sock"))
+        conn.sendall(b'{"test.control": "ERROR"}')
+        conn.shutdown(socket.SHUT_WR)
+
+        assert json.loads(conn.makefile().read()) == {
+            "levels": {"root": "INFO", "test.control": "ERROR"}
+        }
+
+
+def test_socket_of_a_forked_process_has_its_pid(tmp_path: Path) -> None:
+    server = LevelControlServer(str(tmp_path / "{pid}.sock"))
+
+    # As in a forked process, that would have another pid
+    server._reset_after_fork()  # noqa: SLF001
+
+    assert request_log_levels(server.socket_path)["levels"]["root"]
+    server.close()
+
+
+def test_socket_is_not_served_by_forked_processes_without_a_pid(
+    tmp_path: Path,
+) -> None:
+    server = LevelControlServer(str(tmp_path / "control.sock"))
+
+    server._reset_after_fork()  # noqa: SLF001
+    server.close()
+
+    # Left to the parent
+    assert Path(server.socket_path).exists()
+
+
+def test_server_stops_on_socket_errors(tmp_path: Path) -> None:
+    server = LevelControlServer(str(tmp_path / "control.sock"))
+    server.close()
+
+    # As if the socket failed under the thread
+    server._closed = False  # noqa: SLF001
+    server._run()  # noqa: SLF001
+
+
+def test_levels_are_reloaded_from_the_file_on_signal(tmp_path: Path) -> None:
+    levels_file = tmp_path / "levels.json"
+    levels_file.write_text('{"test.control": "ERROR"}')
+
+    previous = signal.getsignal(signal.SIGUSR1)
+    try:
+        _configure(levels_file=levels_file, signal="SIGUSR1")
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        retry(lambda: logging.getLogger("test.control").level).until(
+            lambda level: level == logging.ERROR
+        )
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def test_levels_file_is_not_reloaded_without_a_signal(tmp_path: Path) -> None:
+    previous = signal.getsignal(signal.SIGUSR2)
+
+    _configure(levels_file=tmp_path / "levels.json")
+
+    assert signal.getsignal(signal.SIGUSR2) is previous
+
+
+def test_levels_file_errors_are_logged(
+    tmp_path: Path, capsys: CaptureFixture[str]
+) -> None:
+    _configure()
+    levels_file = tmp_path / "levels.json"
+    levels_file.write_text('["ERROR"]')
+
+    previous = signal.getsignal(signal.SIGUSR1)
+    try:
+        install_signal_handler(levels_file, signal.SIGUSR1)
+        os.kill(os.getpid(), signal.SIGUSR1)
+
+        retry(lambda: _messages(capsys)).until(
+            lambda messages: messages == ["Failed to reload the log levels"]
+        )
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+
+
+def test_signal_is_not_installed_outside_of_the_main_thread(
+    tmp_path: Path, capsys: CaptureFixture[str]
+) -> None:
+    _configure()
+    config = LogConfig(
+        control=LogControlSettings(levels_file=tmp_path / "levels.json", signal="USR1")
+    )
+
+    thread = threading.Thread(target=configure_log_control, args=(config, None))
+    thread.start()
+    thread.join()
+
+    assert _messages(capsys) == [
+        "Log levels signal not installed outside of the main thread"
+    ]
+
+
+def test_control_cli(tmp_path: Path, capsys: CaptureFixture[str]) -> None:
+    path = str(tmp_path / "control.sock")
+    _configure(socket_path=path)
+
+    main([path, "root=WARNING"])
+
+    assert json.loads(capsys.readouterr().out) == {
+        "levels": {"root": "WARNING", "test.control": "WARNING"}
+    }
+
+    with pytest.raises(SystemExit):
+        main([path, "root=invalid"])
+
+
+@pytest.mark.filterwarnings("ignore:'acidrain_logging.control' found in sys.modules")
+def test_control_cli_runs_as_a_module(
+    tmp_path: Path, capsys: CaptureFixture[str]
+) -> None:
+    path = str(tmp_path / "control.sock")
+    _configure(socket_path=path)
+
+    with patch.object(sys, "argv", ["control", path]):
+        runpy.run_module("acidrain_logging.control", run_name="__main__")
+
+    assert json.loads(capsys.readouterr().out) == {
+        "levels": {"root": "INFO", "test.control": "WARNING"}
+    }
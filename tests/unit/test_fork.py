@@ -0,0 +1,59 @@
+import gc
+import multiprocessing
+import weakref
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+from acidrain_logging import _fork
+from acidrain_logging._fork import register_after_fork, reset_after_fork
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+
+class _Resettable:
+    def __init__(self, resets: list["_Resettable"]) -> None:
+        self.resets = resets
+
+    def _reset_after_fork(self) -> None:
+        self.resets.append(self)
+
+
+def _send_resets(obj: _Resettable, conn: "Connection") -> None:
+    conn.send(len(obj.resets))
+
+
+def test_registered_objects_are_reset_in_forked_processes() -> None:
+    obj = _Resettable([])
+    register_after_fork(obj)
+
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_send_resets, args=(obj, child_conn))
+    process.start()
+    process.join()
+
+    assert parent_conn.recv() == 1
+    assert obj.resets == []
+
+
+def test_registered_objects_are_reset_in_order() -> None:
+    resets: list[_Resettable] = []
+    first, second = _Resettable(resets), _Resettable(resets)
+
+    with patch.object(_fork, "_registered", weakref.WeakValueDictionary()):
+        register_after_fork(first)
+        register_after_fork(second)
+        reset_after_fork()
+
+    assert resets == [first, second]
+
+
+def test_registered_objects_are_not_kept_alive() -> None:
+    registered = weakref.WeakValueDictionary[int, _Resettable]()
+
+    with patch.object(_fork, "_registered", registered):
+        register_after_fork(_Resettable([]))
+        gc.collect()
+
+        assert len(registered) == 0
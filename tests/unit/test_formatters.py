@@ -0,0 +1,130 @@
+import logging
+import sys
+from functools import partial
+from typing import Any
+
+import orjson
+import pytest
+from faker import Faker
+from structlog.processors import JSONRenderer
+from structlog.stdlib import ProcessorFormatter
+from structlog.typing import EventDict, WrappedLogger
+
+from acidrain_logging.formatters import BytesProcessorFormatter
+
+
+@pytest.fixture
+def formatter() -> BytesProcessorFormatter:
+    return BytesProcessorFormatter(
+        processors=[
+            ProcessorFormatter.remove_processors_meta,
+            JSONRenderer(
+                serializer=partial(orjson.dumps, option=orjson.OPT_APPEND_NEWLINE)
+            ),
+        ],
+    )
+
+
+@pytest.fixture
+def str_formatter() -> ProcessorFormatter:
+    """Equivalent formatter, producing a str."""
+    return ProcessorFormatter(
+        processors=[
+            ProcessorFormatter.remove_processors_meta,
+            JSONRenderer(serializer=lambda *a, **kw: orjson.dumps(*a, **kw).decode()),
+        ],
+    )
+
+
+def _structlog_record(event_dict: dict[str, Any]) -> logging.LogRecord:
+    """Build a record like `ProcessorFormatter.wrap_for_formatter` would."""
+    record = logging.makeLogRecord({"msg": event_dict, "levelno": logging.INFO})
+    record._logger = logging.getLogger()  # noqa: SLF001
+    record._name = "info"  # noqa: SLF001
+    return record
+
+
+def test_format_bytes_renders_structlog_events(
+    formatter: BytesProcessorFormatter, faker: Faker
+) -> None:
+    event_dict = {"event": faker.pystr(), faker.pystr(): faker.pyint()}
+    record = _structlog_record(event_dict)
+
+    assert formatter.format_bytes(record) == orjson.dumps(event_dict) + b"\n"
+
+    # The original event dict is left untouched
+    assert record.msg == event_dict
+
+
+def test_format_bytes_renders_foreign_records(
+    formatter: BytesProcessorFormatter, faker: Faker
+) -> None:
+    value = faker.pystr()
+    record = logging.makeLogRecord({"msg": "value=%s", "args": (value,)})
+
+    assert formatter.format_bytes(record) == orjson.dumps(
+        {"event": f"value={value}"}
+    ) + (b"\n")
+
+
+def test_format_bytes_passes_foreign_stack_info_to_the_pre_chain(faker: Faker) -> None:
+    seen: dict[str, Any] = {}
+
+    def _spy(_: WrappedLogger, method_name: str, event_dict: EventDict) -> EventDict:
+        seen.update(event_dict, method_name=method_name)
+        return event_dict
+
+    formatter = BytesProcessorFormatter(
+        processors=[ProcessorFormatter.remove_processors_meta, JSONRenderer()],
+        foreign_pre_chain=[_spy],
+        pass_foreign_args=True,
+        use_get_message=False,
+    )
+
+    args = (faker.pystr(),)
+    stack_info = faker.pystr()
+    try:
+        raise ValueError  # noqa: TRY301
+    except ValueError:
+        exc_info = sys.exc_info()
+
+    record = logging.makeLogRecord(
+        {
+            "msg": "%s",
+            "args": args,
+            "levelname": "WARNING",
+            "exc_info": exc_info,
+            "stack_info": stack_info,
+        }
+    )
+    formatter.format_bytes(record)
+
+    assert seen["event"] == "%s"
+    assert seen["positional_args"] == args
+    assert seen["exc_info"] == exc_info
+    assert seen["stack_info"] == stack_info
+    assert seen["method_name"] == "warning"
+
+
+def test_format_returns_a_str_without_the_line_terminator(
+    formatter: BytesProcessorFormatter, faker: Faker
+) -> None:
+    event_dict = {"event": faker.pystr()}
+
+    assert (
+        formatter.format(_structlog_record(event_dict))
+        == orjson.dumps(event_dict).decode()
+    )
+
+
+def test_output_is_identical_to_the_str_formatter(
+    formatter: BytesProcessorFormatter, str_formatter: ProcessorFormatter, faker: Faker
+) -> None:
+    records = [
+        _structlog_record({"event": faker.pystr(), "data": faker.pydict()}),
+        logging.makeLogRecord({"msg": faker.pystr()}),
+    ]
+
+    for record in records:
+        expected = str_formatter.format(record).encode() + b"\n"
+        assert formatter.format_bytes(record) == expected
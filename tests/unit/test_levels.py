@@ -0,0 +1,201 @@
+import json
+import logging
+from collections.abc import Generator
+from unittest.mock import Mock
+
+import pytest
+import structlog
+from _pytest.capture import CaptureFixture
+from pydantic import SecretStr
+from structlog import DropEvent
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import LevelElevationSettings
+from acidrain_logging.levels import (
+    configure_level_elevation,
+    filter_by_level_or_elevated,
+    get_allowed_level,
+    get_level_header,
+    make_elevating_bound_logger,
+    parse_level_header,
+    reset_elevated_level,
+    set_elevated_level,
+)
+
+
+@pytest.fixture(autouse=True)
+def _log_restore() -> Generator[None, None, None]:
+    logger = logging.getLogger()
+    handlers = [*logger.handlers]
+    level = logger.level
+    config = structlog.get_config()
+
+    yield
+
+    logger.handlers = handlers
+    logger.setLevel(level)
+    structlog.configure(**config)
+    configure_level_elevation(LevelElevationSettings())
+
+
+def _configure(*, fast_path: bool, level: str = "DEBUG") -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="WARNING",
+            output_format=OutputFormat.JSON,
+            fast_path=fast_path,
+            level_elevation=LevelElevationSettings(enabled=True, level=level),
+        )
+    )
+
+
+def _messages(capsys: CaptureFixture[str]) -> list[str]:
+    return [
+        json.loads(line)["message"] for line in capsys.readouterr().err.splitlines()
+    ]
+
+
+def _log_all(name: str) -> None:
+    log = structlog.get_logger(name)
+    log.debug("debug")
+    log.info("info")
+    log.warning("warning")
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_events_are_logged_from_the_level_of_the_context(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+
+    _log_all("test.levels")
+    assert _messages(capsys) == ["warning"]
+
+    token = set_elevated_level(logging.INFO)
+    _log_all("test.levels")
+    assert _messages(capsys) == ["info", "warning"]
+
+    reset_elevated_level(token)
+    _log_all("test.levels")
+    assert _messages(capsys) == ["warning"]
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_events_are_not_logged_below_the_elevation_level(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path, level="INFO")
+
+    token = set_elevated_level(get_allowed_level("debug"))
+    _log_all("test.levels")
+    reset_elevated_level(token)
+
+    assert _messages(capsys) == ["info", "warning"]
+
+
+def test_stdlib_loggers_keep_their_level(capsys: CaptureFixture[str]) -> None:
+    _configure(fast_path=False)
+
+    token = set_elevated_level(logging.DEBUG)
+    logging.getLogger("test.levels").info("info")
+    reset_elevated_level(token)
+
+    assert _messages(capsys) == []
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_events_are_not_logged_when_logging_is_disabled(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+
+    token = set_elevated_level(logging.DEBUG)
+    logging.disable(logging.WARNING)
+    try:
+        _log_all("test.levels")
+    finally:
+        logging.disable(logging.NOTSET)
+        reset_elevated_level(token)
+
+    assert _messages(capsys) == []
+
+
+def test_events_of_the_notset_level_are_filtered() -> None:
+    _configure(fast_path=False)
+    logger = logging.getLogger("test.levels")
+
+    token = set_elevated_level(logging.DEBUG)
+    with pytest.raises(DropEvent):
+        filter_by_level_or_elevated(logger, "notset", {})
+    reset_elevated_level(token)
+
+
+def test_elevating_bound_logger_is_a_no_op_outside_of_raised_contexts() -> None:
+    processor = Mock(return_value="line")
+    wrapper_class = make_elevating_bound_logger(logging.WARNING, logging.DEBUG)
+    log = wrapper_class(Mock(), [processor], {})  # type: ignore[call-arg]
+
+    log.debug("debug")
+    log.info("info")
+    assert not processor.called
+    assert not log.is_enabled_for(logging.INFO)
+    assert log.get_effective_level() == logging.WARNING
+
+    token = set_elevated_level(logging.INFO)
+    log.debug("debug")
+    log.info("info")
+    log.msg("msg")
+    assert [c.args[1] for c in processor.call_args_list] == ["info", "info"]
+    assert log.is_enabled_for(logging.INFO)
+    assert log.get_effective_level() == logging.INFO
+    reset_elevated_level(token)
+
+
+def test_elevating_bound_logger_is_the_filtering_one_without_levels_to_raise() -> None:
+    wrapper_class = make_elevating_bound_logger(logging.DEBUG, logging.INFO)
+
+    assert wrapper_class is structlog.make_filtering_bound_logger(logging.DEBUG)
+
+
+def test_level_header_is_ignored_when_disabled() -> None:
+    assert get_level_header() is None
+    assert parse_level_header("debug") is None
+    assert get_allowed_level("debug") is None
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("unknown", None),
+        ("warning", logging.WARNING),
+        (" Info ", logging.INFO),
+        # Capped to the settings' level
+        ("debug", logging.INFO),
+    ],
+)
+def test_parse_level_header(value: str | None, expected: int | None) -> None:
+    configure_level_elevation(LevelElevationSettings(enabled=True, level="INFO"))
+
+    assert get_level_header() == "X-Debug-Log"
+    assert parse_level_header(value) == expected
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("debug", None),
+        ("debug:wrong", None),
+        ("debug:s3cr3t:", None),
+        ("debug:s3cr3t", logging.DEBUG),
+    ],
+)
+def test_parse_level_header_checks_the_secret(value: str, expected: int | None) -> None:
+    configure_level_elevation(
+        LevelElevationSettings(enabled=True, secret=SecretStr("s3cr3t"))
+    )
+
+    assert parse_level_header(value) == expected
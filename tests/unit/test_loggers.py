@@ -0,0 +1,78 @@
+import logging
+from unittest.mock import Mock
+
+import pytest
+from _pytest.capture import CaptureFixture
+from faker import Faker
+
+from acidrain_logging.loggers import SinkLogger, SinkLoggerFactory
+from acidrain_logging.sinks import Sink
+
+
+@pytest.mark.parametrize(
+    ("method_name", "levelno"),
+    [
+        ("debug", logging.DEBUG),
+        ("info", logging.INFO),
+        ("warning", logging.WARNING),
+        ("error", logging.ERROR),
+        ("critical", logging.CRITICAL),
+    ],
+)
+def test_sink_logger_writes_bytes_as_is(
+    faker: Faker, method_name: str, levelno: int
+) -> None:
+    sink = Mock(Sink)
+    logger = SinkLogger(logging.getLogger(f"{__name__}.{faker.pystr()}"), sink)
+    line = f"{faker.pystr()}\n".encode()
+
+    getattr(logger, method_name)(line)
+
+    sink.write.assert_called_once_with(line, levelno)
+
+
+def test_sink_logger_encodes_and_terminates_str(faker: Faker) -> None:
+    sink = Mock(Sink)
+    logger = SinkLogger(logging.getLogger(f"{__name__}.{faker.pystr()}"), sink)
+    msg = faker.pystr()
+
+    logger.info(msg)
+
+    sink.write.assert_called_once_with(f"{msg}\n".encode(), logging.INFO)
+
+
+def test_sink_logger_reports_sink_errors(
+    capsys: CaptureFixture[str], faker: Faker
+) -> None:
+    sink = Mock(Sink)
+    sink.write.side_effect = OSError(faker.pystr())
+    logger = SinkLogger(logging.getLogger(f"{__name__}.{faker.pystr()}"), sink)
+
+    logger.info(faker.pystr())
+
+    err = capsys.readouterr().err
+    assert "--- Logging error ---" in err
+    assert str(sink.write.side_effect) in err
+
+
+def test_sink_logger_uses_the_stdlib_logger_name_and_level(faker: Faker) -> None:
+    stdlib_logger = logging.getLogger(f"{__name__}.{faker.pystr()}")
+    stdlib_logger.setLevel(logging.WARNING)
+
+    logger = SinkLogger(stdlib_logger, Mock(Sink))
+
+    assert logger.name == stdlib_logger.name
+    assert logger.disabled is False
+    assert logger.getEffectiveLevel() == logging.WARNING
+    assert logger.isEnabledFor(logging.WARNING) is True
+    assert logger.isEnabledFor(logging.INFO) is False
+
+
+def test_sink_logger_factory_names_loggers_like_the_stdlib_factory(
+    faker: Faker,
+) -> None:
+    factory = SinkLoggerFactory(Mock(Sink))
+    name = faker.pystr()
+
+    assert factory(name).name == name
+    assert factory().name == __name__
@@ -1,16 +1,32 @@
 import json
 import logging
-from collections.abc import Generator
+import multiprocessing
+from collections.abc import Callable, Generator
+from contextlib import AbstractContextManager
 from datetime import UTC, datetime
+from typing import TYPE_CHECKING
 
 import pytest
 import structlog
 from _pytest.capture import CaptureFixture
 from _pytest.logging import LogCaptureFixture
 from faker import Faker
-from structlog.contextvars import bound_contextvars
+from structlog.typing import EventDict, WrappedLogger
 
 from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging import context as acidrain_context
+from acidrain_logging.config import (
+    BatchSettings,
+    DatadogSettings,
+    FunnelSettings,
+    QueueSettings,
+)
+from acidrain_logging.logging import is_configured
+from acidrain_logging.processors import SHARED_PRE_PROCESSORS, EventRenamerFactory
+from acidrain_logging.sinks import BatchSink, FunnelSink, QueueSink, SinkHandler
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
 
 
 @pytest.fixture
@@ -25,6 +41,15 @@ def _log_restore() -> Generator[None, None, None]:
         logger.handlers = handlers
 
 
+@pytest.fixture
+def _structlog_restore() -> Generator[None, None, None]:
+    config = structlog.get_config()
+
+    yield
+
+    structlog.configure(**config)
+
+
 @pytest.fixture
 def caplog(caplog: LogCaptureFixture, _log_restore: None) -> LogCaptureFixture:
     return caplog
@@ -108,7 +133,7 @@ def test_context_values_are_present_in_the_log(
     context = {faker.pystr(): faker.pystr()}
     extra_value = {faker.pystr(): faker.pystr()}
 
-    with bound_contextvars(context=context):
+    with structlog.contextvars.bound_contextvars(context=context):
         structlog.get_logger().info(msg, extra_value=extra_value)
 
     log_values = caplog.records[0].msg
@@ -147,6 +172,224 @@ def test_extra_values_are_added_to_the_event_dict(
     assert log_record[key] == val
 
 
+@pytest.mark.usefixtures("_log_restore")
+def test_queue_mode_writes_the_logs_from_a_background_thread(
+    capsys: CaptureFixture[str], faker: Faker
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+
+    configure_logger(
+        LogConfig(output_format=OutputFormat.JSON, queue=QueueSettings(enabled=True))
+    )
+
+    (handler,) = logging.getLogger().handlers
+    assert isinstance(handler, SinkHandler)
+    assert isinstance(handler.sink, QueueSink)
+
+    messages = [faker.pystr() for _ in range(10)]
+    for msg in messages:
+        structlog.get_logger().info(msg)
+
+    handler.close()
+
+    log_records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [r["message"] for r in log_records] == messages
+
+
+@pytest.mark.usefixtures("_log_restore")
+def test_batch_mode_writes_the_logs_in_batches(
+    capsys: CaptureFixture[str], faker: Faker
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+
+    configure_logger(
+        LogConfig(
+            output_format=OutputFormat.JSON,
+            batching=BatchSettings(enabled=True, max_count=5),
+            queue=QueueSettings(enabled=True),
+        )
+    )
+
+    (handler,) = logging.getLogger().handlers
+    assert isinstance(handler, SinkHandler)
+    assert isinstance(handler.sink, QueueSink)
+    assert isinstance(handler.sink.target, BatchSink)
+
+    messages = [faker.pystr() for _ in range(12)]
+    for msg in messages:
+        structlog.get_logger().info(msg)
+
+    handler.close()
+
+    log_records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [r["message"] for r in log_records] == messages
+
+
+@pytest.mark.usefixtures("_log_restore")
+def test_funnel_mode_wraps_the_sink(capsys: CaptureFixture[str], faker: Faker) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+
+    configure_logger(
+        LogConfig(output_format=OutputFormat.JSON, funnel=FunnelSettings(enabled=True))
+    )
+
+    (handler,) = logging.getLogger().handlers
+    assert isinstance(handler, SinkHandler)
+    assert isinstance(handler.sink, FunnelSink)
+
+    msg = faker.pystr()
+    structlog.get_logger().info(msg)
+
+    handler.close()
+
+    assert json.loads(capsys.readouterr().err)["message"] == msg
+
+
+def _configure_and_log(config: LogConfig, conn: "Connection", msg: str) -> None:
+    (handler,) = logging.getLogger().handlers
+    configure_logger(config)
+
+    (new_handler,) = logging.getLogger().handlers
+    assert isinstance(new_handler, SinkHandler)
+    assert isinstance(new_handler.sink, FunnelSink)
+    conn.send((new_handler is handler, new_handler.sink.is_inherited))
+
+    structlog.get_logger().info(msg)
+    new_handler.close()
+
+
+@pytest.mark.parametrize("same_config", [True, False])
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_configure_logger_keeps_the_configuration_inherited_by_forked_processes(
+    capsys: CaptureFixture[str], faker: Faker, *, same_config: bool
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    config = LogConfig(
+        output_format=OutputFormat.JSON, funnel=FunnelSettings(enabled=True)
+    )
+    configure_logger(config)
+    (handler,) = logging.getLogger().handlers
+
+    child_config = config
+    if not same_config:
+        child_config = config.model_copy(update={"level": "DEBUG"})
+
+    msg = faker.pystr()
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(
+        target=_configure_and_log, args=(child_config, child_conn, msg)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+
+    handler.close()
+
+    # Sent to the parent, by the sink it was configured with, or by a new one
+    assert parent_conn.recv() == (same_config, True)
+    assert json.loads(capsys.readouterr().err)["message"] == msg
+
+
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_configure_logger_replaces_its_previous_handler() -> None:
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    assert not is_configured()
+
+    configure_logger()
+    first_handler = root_logger.handlers[0]
+    configure_logger()
+
+    assert is_configured()
+    assert len(root_logger.handlers) == 1
+    assert root_logger.handlers[0] is not first_handler
+
+
+@pytest.mark.parametrize("output_format", [OutputFormat.JSON, OutputFormat.CONSOLE])
+@pytest.mark.parametrize(
+    "bound_contextvars",
+    [structlog.contextvars.bound_contextvars, acidrain_context.bound_contextvars],
+    ids=["structlog", "acidrain"],
+)
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore", "freezer")
+def test_fast_path_output_is_identical_to_the_stdlib_path(
+    capsys: CaptureFixture[str],
+    faker: Faker,
+    output_format: OutputFormat,
+    bound_contextvars: Callable[..., AbstractContextManager[None]],
+) -> None:
+    logger_name = f"fast-path.{faker.pystr()}"
+    context = {faker.pystr(): faker.pystr(), faker.pystr(): faker.pyint()}
+    direct = faker.pystr()
+    kwargs = {faker.pystr(): faker.pydict(value_types=[str, int])}
+
+    def _log_all() -> str:
+        log = structlog.get_logger(logger_name)
+        with (
+            bound_contextvars(**context),
+            structlog.contextvars.bound_contextvars(direct=direct),
+        ):
+            log.debug("filtered out")
+            log.info("message", **kwargs)
+            log.warning("int=%d, str=%s", 42, "foo")
+            log.info("mapping=%(key)s", {"key": "value"})
+            try:
+                raise ValueError(logger_name)  # noqa: TRY301
+            except ValueError:
+                log.exception("failure")
+
+        logging.getLogger(logger_name).info("from stdlib=%s", "value")
+
+        return capsys.readouterr().err
+
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    config = LogConfig(output_format=output_format, color=False, level="INFO")
+
+    configure_logger(config)
+    expected = _log_all()
+
+    logging.getLogger().handlers.clear()
+    configure_logger(config.model_copy(update={"fast_path": True}))
+    output = _log_all()
+
+    assert len(output.splitlines()) >= 5
+    assert output == expected
+
+
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_fast_path_respects_the_logger_levels(
+    capsys: CaptureFixture[str], faker: Faker
+) -> None:
+    verbose_logger = f"fast-path.{faker.pystr()}"
+    quiet_logger = f"fast-path.{faker.pystr()}"
+
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            logger_levels={verbose_logger: "debug", quiet_logger: "error"},
+            fast_path=True,
+        )
+    )
+
+    structlog.get_logger().debug("root debug")
+    structlog.get_logger().info("root info")
+    structlog.get_logger(verbose_logger).debug("verbose debug")
+    structlog.get_logger(quiet_logger).warning("quiet warning")
+    structlog.get_logger(quiet_logger).error("quiet error")
+
+    messages = [
+        json.loads(line)["message"] for line in capsys.readouterr().err.splitlines()
+    ]
+    assert messages == ["root info", "verbose debug", "quiet error"]
+
+
 def test_exc_info_is_added_to_the_log_if_requested(
     caplog: LogCaptureFixture, faker: Faker
 ) -> None:
@@ -209,3 +452,130 @@ def test_the_event_key_is_renamed_to_message_if_json(
     log_values = caplog.records[0].msg
     assert isinstance(log_values, dict)  # type check
     assert log_values[key] == msg
+
+
+def test_custom_pre_processors_can_be_inserted(
+    caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    key = faker.pystr()
+    value = faker.pystr()
+
+    def _add_value(_: WrappedLogger, __: str, event_dict: EventDict) -> EventDict:
+        # Runs before the event is renamed to message
+        event_dict[key] = f"{value}-{event_dict['event']}"
+        return event_dict
+
+    idx = SHARED_PRE_PROCESSORS.index(EventRenamerFactory)
+    configure_logger(
+        LogConfig(output_format=OutputFormat.JSON),
+        pre_processors=[
+            *SHARED_PRE_PROCESSORS[:idx],
+            _add_value,
+            *SHARED_PRE_PROCESSORS[idx:],
+        ],
+    )
+
+    msg = faker.pystr()
+    structlog.get_logger().info(msg)
+
+    log_values = caplog.records[0].msg
+    assert isinstance(log_values, dict)  # type check
+    assert log_values["message"] == msg
+    assert log_values[key] == f"{value}-{msg}"
+
+
+@pytest.mark.parametrize("output_format", [OutputFormat.JSON, OutputFormat.CONSOLE])
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_static_fields_are_added_to_every_log(
+    capsys: CaptureFixture[str],
+    faker: Faker,
+    output_format: OutputFormat,
+    fast_path: bool,
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+
+    host = faker.pystr()
+    config = LogConfig(
+        output_format=output_format,
+        color=False,
+        fast_path=fast_path,
+        static_fields={"host": host},
+        datadog=DatadogSettings(injection_enabled=True, env="test-env"),
+    )
+    configure_logger(config)
+
+    structlog.get_logger().info(faker.pystr())
+    logging.getLogger(__name__).warning(faker.pystr())
+
+    lines = capsys.readouterr().err.splitlines()
+    assert len(lines) == 2
+
+    for line in lines:
+        if output_format == OutputFormat.JSON:
+            assert (
+                json.loads(line).items()
+                >= {
+                    "dd.env": "test-env",
+                    "host": host,
+                }.items()
+            )
+        else:
+            assert "dd.env=test-env" in line
+            assert f"host={host}" in line
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_bound_context_values_are_added_to_every_log(
+    capsys: CaptureFixture[str], faker: Faker, fast_path: bool
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(LogConfig(output_format=OutputFormat.JSON, fast_path=fast_path))
+
+    context = {"trace_id": faker.uuid4(), "task": {"id": faker.pystr()}}
+    messages = [faker.pystr() for _ in range(3)]
+
+    with acidrain_context.bound_contextvars(**context):
+        for msg in messages:
+            structlog.get_logger().info(msg)
+        logging.getLogger(__name__).info(messages[0])
+
+        # Serialized once, for all of them
+        assert acidrain_context.get_bound_context().fragment is not None
+
+    log_records = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [r["message"] for r in log_records] == [*messages, messages[0]]
+    for record in log_records:
+        assert record.items() >= context.items()
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.usefixtures("_log_restore", "_structlog_restore")
+def test_inserted_pre_processors_see_the_bound_context(
+    capsys: CaptureFixture[str], faker: Faker, fast_path: bool
+) -> None:
+    seen = []
+
+    def _spy(_logger: WrappedLogger, _name: str, event_dict: EventDict) -> EventDict:
+        seen.append(event_dict.get("trace_id"))
+        return event_dict
+
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(output_format=OutputFormat.JSON, fast_path=fast_path),
+        pre_processors=[*SHARED_PRE_PROCESSORS[:2], _spy, *SHARED_PRE_PROCESSORS[2:]],
+    )
+
+    trace_id = faker.uuid4()
+    with acidrain_context.bound_contextvars(trace_id=trace_id):
+        structlog.get_logger().info(faker.pystr())
+        # Foreign record
+        logging.getLogger(__name__).info(faker.pystr())
+
+    assert seen == [trace_id, trace_id]
+    for line in capsys.readouterr().err.splitlines():
+        assert json.loads(line)["trace_id"] == trace_id
@@ -0,0 +1,251 @@
+import logging
+from logging import Logger
+from typing import Any
+from unittest.mock import Mock, patch
+
+import pytest
+import structlog
+from faker import Faker
+from structlog.typing import EventDict
+
+from acidrain_logging import LogConfig, OutputFormat, context
+from acidrain_logging.config import DatadogSettings
+from acidrain_logging.pipeline import CompiledPipeline, compile_pre_processors
+from acidrain_logging.processors import (
+    SHARED_PRE_PROCESSORS,
+    DatadogInjector,
+    KeyOps,
+    LevelRenamer,
+    LogProcessor,
+    LogProcessorFactory,
+    datadog_span_injector,
+    drop_color_message_key,
+    event_renamer,
+)
+
+
+def _user_processor(_: Logger, __: str, event_dict: EventDict) -> EventDict:
+    event_dict["user"] = True
+    return event_dict
+
+
+def _processors(compiled: LogProcessor) -> tuple[LogProcessor, ...]:
+    assert isinstance(compiled, CompiledPipeline)
+    return compiled.processors
+
+
+def test_compile_pre_processors_fuses_the_key_operations() -> None:
+    compiled = compile_pre_processors(
+        LogConfig(),
+        [
+            structlog.stdlib.add_log_level,
+            drop_color_message_key,
+            event_renamer,
+            LevelRenamer({"info": "ofni"}),
+        ],
+    )
+
+    assert _processors(compiled) == (
+        structlog.stdlib.add_log_level,
+        KeyOps(
+            pop=("color_message",),
+            rename=(("event", "message"),),
+            remap=(("level", {"info": "ofni"}),),
+        ),
+    )
+
+
+def test_compile_pre_processors_keeps_user_processors_in_place() -> None:
+    compiled = compile_pre_processors(
+        LogConfig(),
+        [drop_color_message_key, _user_processor, event_renamer],
+    )
+
+    assert _processors(compiled) == (
+        KeyOps(pop=("color_message",)),
+        _user_processor,
+        KeyOps(rename=(("event", "message"),)),
+    )
+    assert compiled(Mock(Logger), "info", {"event": "msg"}) == {
+        "message": "msg",
+        "user": True,
+    }
+
+
+def test_compile_pre_processors_does_not_fuse_operations_on_the_same_keys() -> None:
+    compiled = compile_pre_processors(
+        LogConfig(),
+        [event_renamer, KeyOps(pop=("message",))],
+    )
+
+    assert _processors(compiled) == (
+        KeyOps(rename=(("event", "message"),)),
+        KeyOps(pop=("message",)),
+    )
+    assert compiled(Mock(Logger), "info", {"event": "msg"}) == {}
+
+
+def test_compile_pre_processors_keeps_the_order_of_overlapping_operations() -> None:
+    compiled = compile_pre_processors(
+        LogConfig(),
+        [
+            KeyOps(insert=(("key", "value"),)),
+            KeyOps(rename=(("key", "renamed"),)),
+            drop_color_message_key,
+        ],
+    )
+
+    assert _processors(compiled) == (
+        KeyOps(insert=(("key", "value"),)),
+        KeyOps(rename=(("key", "renamed"),), pop=("color_message",)),
+    )
+    # Fused in a single pass, the rename would run before the insert and fail
+    assert compiled(Mock(Logger), "info", {"color_message": "msg"}) == {
+        "renamed": "value"
+    }
+
+
+@patch("acidrain_logging.processors.tracer", new=Mock())
+def test_compile_pre_processors_runs_the_residual_after_the_key_operations() -> None:
+    datadog_settings = DatadogSettings(injection_enabled=True, env="env")
+    injector = DatadogInjector(datadog_settings)
+
+    compiled = compile_pre_processors(
+        LogConfig(), [drop_color_message_key, injector, event_renamer]
+    )
+
+    assert _processors(compiled) == (
+        KeyOps(pop=("color_message",)).merge(injector.key_ops),
+        datadog_span_injector,
+        KeyOps(rename=(("event", "message"),)),
+    )
+
+
+def test_compile_pre_processors_resolves_factories_and_drops_noops(
+    faker: Faker,
+) -> None:
+    processor = Mock()
+    compiled = compile_pre_processors(
+        LogConfig(),
+        [
+            LogProcessorFactory(builder=lambda _: None),
+            LogProcessorFactory(builder=lambda _: processor),
+            KeyOps(),
+        ],
+    )
+
+    assert compiled is processor
+
+    # An empty chain is a no-op too
+    compiled = compile_pre_processors(LogConfig(), [])
+    event_dict = {faker.pystr(): faker.pystr()}
+    assert compiled(Mock(Logger), "info", event_dict) == event_dict
+
+
+@pytest.mark.parametrize(
+    ("fast_path", "foreign", "expected"),
+    [
+        (False, False, (structlog.stdlib.PositionalArgumentsFormatter,)),
+        (False, True, (structlog.stdlib.ExtraAdder,)),
+        (True, False, ()),
+        (True, True, (structlog.stdlib.ExtraAdder,)),
+    ],
+)
+def test_compile_pre_processors_drops_the_stdlib_processors_that_do_not_apply(
+    fast_path: bool, foreign: bool, expected: tuple[type, ...]
+) -> None:
+    compiled = compile_pre_processors(
+        LogConfig(fast_path=fast_path),
+        [
+            _user_processor,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.stdlib.ExtraAdder(),
+        ],
+        foreign=foreign,
+    )
+
+    if not expected:
+        assert compiled is _user_processor
+        return
+
+    processors = _processors(compiled)
+    assert tuple(type(p) for p in processors[1:]) == expected
+
+
+@pytest.mark.parametrize("output_format", [OutputFormat.JSON, OutputFormat.CONSOLE])
+@pytest.mark.usefixtures("freezer")
+def test_compiled_pipeline_output_is_identical_to_the_processors(
+    faker: Faker, output_format: OutputFormat
+) -> None:
+    config = LogConfig(
+        output_format=output_format,
+        level_names={"info": faker.pystr()},
+        datadog=DatadogSettings(
+            injection_enabled=True, env=faker.pystr(), service=faker.pystr()
+        ),
+    )
+    logger = logging.getLogger(f"{__name__}.{faker.pystr()}")
+
+    event_dict: dict[str, Any] = {
+        "event": faker.pystr(),
+        "color_message": faker.pystr(),
+        faker.pystr(): faker.pystr(),
+    }
+
+    compiled = compile_pre_processors(config, SHARED_PRE_PROCESSORS)
+
+    expected: EventDict = event_dict.copy()
+    for processor in SHARED_PRE_PROCESSORS:
+        if isinstance(processor, LogProcessorFactory):
+            resolved = processor(config)
+            if resolved is None:
+                continue
+            processor = resolved  # noqa: PLW2901
+        expected = processor(logger, "info", expected)
+
+    # Keys and their order must be the same
+    output = compiled(logger, "info", event_dict.copy())
+    assert list(output.items()) == list(expected.items())
+
+
+@pytest.mark.parametrize(
+    ("output_format", "fast_path", "foreign", "should_merge"),
+    [
+        (OutputFormat.CONSOLE, True, False, True),
+        (OutputFormat.CONSOLE, False, True, True),
+        (OutputFormat.JSON, False, False, True),
+        (OutputFormat.JSON, False, True, False),
+        (OutputFormat.JSON, True, False, False),
+    ],
+)
+def test_compile_pre_processors_leaves_the_context_to_the_json_renderer(
+    output_format: OutputFormat, fast_path: bool, foreign: bool, should_merge: bool
+) -> None:
+    compiled = compile_pre_processors(
+        LogConfig(output_format=output_format, fast_path=fast_path),
+        [_user_processor, context.merge_contextvars],
+        foreign=foreign,
+    )
+
+    if should_merge:
+        assert _processors(compiled) == (_user_processor, context.merge_contextvars)
+    else:
+        assert compiled is _user_processor
+
+
+@pytest.mark.parametrize(("fast_path", "foreign"), [(True, False), (False, True)])
+def test_compile_pre_processors_merges_the_context_for_the_processors_after_it(
+    fast_path: bool, foreign: bool
+) -> None:
+    compiled = compile_pre_processors(
+        LogConfig(output_format=OutputFormat.JSON, fast_path=fast_path),
+        [*SHARED_PRE_PROCESSORS[:2], _user_processor, *SHARED_PRE_PROCESSORS[2:]],
+        foreign=foreign,
+    )
+
+    processors = _processors(compiled)
+    assert processors[:3] == (
+        context.merge_structlog_contextvars,
+        context.merge_contextvars,
+        _user_processor,
+    )
@@ -1,24 +1,40 @@
 from collections.abc import Callable
+from datetime import UTC
 from logging import Logger
 from unittest.mock import Mock, patch
 
 import pytest
+import structlog
 from faker import Faker
+from freezegun.api import FrozenDateTimeFactory
 from structlog.processors import TimeStamper
 
 from acidrain_logging import LogConfig, OutputFormat
-from acidrain_logging.config import DatadogSettings
+from acidrain_logging.config import (
+    DatadogSettings,
+    ExceptionFormat,
+    ExceptionSettings,
+    RateLimitSettings,
+)
 from acidrain_logging.processors import (
+    CachedTimeStamper,
     LevelRenamer,
+    LogProcessor,
     datadog_injector,
     datadog_injector_builder,
+    datadog_span_injector,
     drop_color_message_key,
     event_renamer,
     event_renamer_builder,
+    exception_renderer_builder,
     level_renamer_builder,
+    rate_limiter_builder,
+    static_fields_builder,
     timestamper_builder,
 )
+from acidrain_logging.ratelimit import RateLimiter
 from acidrain_logging.testing.factories import DatadogSettingsFactory
+from acidrain_logging.tracebacks import CachedExceptionFormatter
 
 
 @pytest.mark.parametrize(
@@ -48,6 +64,91 @@ def test_timestamper_builder_creates_a_timestamper_from_config(
     assert processor.utc is expected_utc
 
 
+@pytest.mark.parametrize("timestamp_format", ["iso", "ISO", "epoch", "epoch_ns"])
+@pytest.mark.parametrize(
+    ("output_format", "expected_key", "expected_utc"),
+    [
+        (OutputFormat.CONSOLE, lambda _: "timestamp", False),
+        (OutputFormat.JSON, lambda c: c.timestamp_key, True),
+    ],
+)
+def test_timestamper_builder_creates_a_cached_timestamper_for_known_formats(
+    faker: Faker,
+    timestamp_format: str,
+    output_format: OutputFormat,
+    expected_key: Callable[[LogConfig], str],
+    expected_utc: bool,
+) -> None:
+    config = LogConfig(
+        output_format=output_format,
+        timestamp_format=timestamp_format,
+        timestamp_key=faker.pystr(),
+    )
+
+    processor = timestamper_builder(config)
+
+    assert isinstance(processor, CachedTimeStamper)
+    assert processor.fmt == timestamp_format
+    assert processor.key == expected_key(config)
+    assert processor.utc is expected_utc
+
+
+@pytest.mark.parametrize("utc", [True, False])
+def test_cached_timestamper_iso_output_is_identical_to_timestamper(
+    freezer: FrozenDateTimeFactory, faker: Faker, utc: bool
+) -> None:
+    logger = Mock(Logger)
+    cached = CachedTimeStamper("iso", utc=utc)
+    reference = TimeStamper(fmt="iso", utc=utc)
+
+    for _ in range(20):
+        # Include whole seconds, for which isoformat() omits the fraction
+        moment = faker.date_time(tzinfo=UTC)
+        freezer.move_to(moment)
+        assert cached(logger, "info", {}) == reference(logger, "info", {})
+
+        freezer.move_to(moment.replace(microsecond=0))
+        assert cached(logger, "info", {}) == reference(logger, "info", {})
+
+
+@pytest.mark.parametrize(
+    ("time_ns", "expected"),
+    [
+        (1_700_000_000_123_456_000, "2023-11-14T22:13:20.123456Z"),
+        (1_700_000_000_123_456_500, "2023-11-14T22:13:20.123456Z"),
+        (1_700_000_000_123_456_999, "2023-11-14T22:13:20.123456Z"),
+        (1_700_000_000_999_999_999, "2023-11-14T22:13:20.999999Z"),
+        (1_700_000_001_000_000_999, "2023-11-14T22:13:21Z"),
+        (1_700_000_002_000_001_000, "2023-11-14T22:13:22.000001Z"),
+    ],
+)
+def test_cached_timestamper_truncates_like_datetime_now(
+    time_ns: int, expected: str
+) -> None:
+    stamper = CachedTimeStamper("iso")
+
+    with patch("time.time_ns", return_value=time_ns):
+        assert stamper(Mock(Logger), "info", {}) == {"timestamp": expected}
+
+
+def test_cached_timestamper_supports_epoch_formats(faker: Faker) -> None:
+    logger = Mock(Logger)
+    time_ns = faker.pyint(min_value=10**18, max_value=2 * 10**18)
+
+    with patch("time.time_ns", return_value=time_ns):
+        stamper = CachedTimeStamper("epoch_ns")
+        assert stamper(logger, "info", {}) == {"timestamp": time_ns}
+
+    with patch("time.time", return_value=time_ns / 1e9):
+        stamper = CachedTimeStamper("epoch")
+        assert stamper(logger, "info", {}) == {"timestamp": time_ns / 1e9}
+
+
+def test_cached_timestamper_rejects_unknown_formats(faker: Faker) -> None:
+    with pytest.raises(ValueError, match="%Y"):
+        CachedTimeStamper(f"%Y-{faker.pystr()}")
+
+
 def test_event_renamer_renames_event_to_message(faker: Faker) -> None:
     logger = Mock(Logger)
     method_name = faker.pystr()
@@ -135,6 +236,85 @@ def test_level_renamer_builder_returns_the_right_processor(
     assert processor(logger, method_name, level_dict) == {"level": "ofni"}
 
 
+@pytest.mark.parametrize("enabled", [False, True])
+def test_rate_limiter_builder_returns_the_right_processor(*, enabled: bool) -> None:
+    config = LogConfig(
+        rate_limit=RateLimitSettings(enabled=enabled, rate=5, burst=20, max_keys=100)
+    )
+    processor = rate_limiter_builder(config)
+
+    if not enabled:
+        assert processor is None
+        return
+
+    assert isinstance(processor, RateLimiter)
+    assert (processor.rate, processor.burst, processor.max_keys) == (5, 20, 100)
+
+
+def test_exception_renderer_builder_returns_a_cached_formatter() -> None:
+    config = LogConfig(exceptions=ExceptionSettings(cache_size=10))
+    processor = exception_renderer_builder(config)
+
+    assert isinstance(processor, structlog.processors.ExceptionRenderer)
+    assert isinstance(processor.format_exception, CachedExceptionFormatter)
+    assert processor.format_exception.max_size == 10
+
+
+@pytest.mark.parametrize(
+    ("output_format", "exception_format"),
+    [
+        (OutputFormat.JSON, ExceptionFormat.TEXT),
+        (OutputFormat.CONSOLE, ExceptionFormat.TEXT),
+        # The console renderer expects a text
+        (OutputFormat.CONSOLE, ExceptionFormat.DICT),
+    ],
+)
+def test_exception_renderer_builder_returns_format_exc_info_without_cache(
+    output_format: OutputFormat, exception_format: ExceptionFormat
+) -> None:
+    config = LogConfig(
+        output_format=output_format,
+        exceptions=ExceptionSettings(format=exception_format, cache_size=0),
+    )
+
+    assert exception_renderer_builder(config) is structlog.processors.format_exc_info
+
+
+def _recurse(depth: int) -> None:
+    if depth == 0:
+        values = list(range(100))
+        raise ValueError(values)
+
+    _recurse(depth - 1)
+
+
+def test_exception_renderer_builder_renders_limited_dicts() -> None:
+    config = LogConfig(
+        output_format=OutputFormat.JSON,
+        exceptions=ExceptionSettings(
+            format=ExceptionFormat.DICT,
+            max_frames=4,
+            show_locals=True,
+            locals_max_length=5,
+            locals_max_string=20,
+        ),
+    )
+    processor = exception_renderer_builder(config)
+    assert processor is not None
+
+    try:
+        _recurse(10)
+    except ValueError:
+        event_dict = processor(Mock(Logger), "error", {"exc_info": True})
+
+    (exception,) = event_dict["exception"]
+    assert exception["exc_type"] == "ValueError"
+    assert len(exception["frames"]) == 5
+    assert exception["frames"][2]["name"] == "Skipped frames: 8"
+    # Cut at 20 characters, followed by the number of the others
+    assert exception["frames"][-1]["locals"]["values"] == "'[0, 1, 2, 3, 4, 5, 6'+370"
+
+
 def test_drop_color_message_key_drops_the_color_message(faker: Faker) -> None:
     logger = Mock(Logger)
     method_name = faker.pystr()
@@ -204,12 +384,13 @@ def test_datadog_injector_builder_returns_the_right_processor(
     should_be_enabled: bool,
 ) -> None:
     config = LogConfig(
+        output_format=OutputFormat.CONSOLE,
         datadog=DatadogSettings(
             injection_enabled=dd_enabled,
             env=dd_env,
             service=dd_service,
             version=dd_version,
-        )
+        ),
     )
     processor = datadog_injector_builder(config)
 
@@ -230,3 +411,61 @@ def test_datadog_injector_builder_returns_the_right_processor(
     event_dd_keys = event.keys() & dd_keys
 
     assert event_dd_keys == dd_keys
+
+
+@pytest.mark.parametrize(
+    ("tracer", "expected"),
+    [(None, None), (Mock(), datadog_span_injector)],
+)
+def test_datadog_injector_builder_only_injects_the_span_if_json(
+    tracer: Mock | None, expected: LogProcessor | None
+) -> None:
+    config = LogConfig(
+        output_format=OutputFormat.JSON,
+        datadog=DatadogSettings(injection_enabled=True, env="some-env"),
+    )
+
+    with patch("acidrain_logging.processors.tracer", new=tracer):
+        assert datadog_injector_builder(config) is expected
+
+
+@pytest.mark.parametrize(
+    ("output_format", "static_fields", "should_be_enabled"),
+    [
+        (OutputFormat.CONSOLE, {}, False),
+        (OutputFormat.CONSOLE, {"host": "some-host"}, True),
+        (OutputFormat.JSON, {"host": "some-host"}, False),
+    ],
+)
+def test_static_fields_builder_returns_the_right_processor(
+    faker: Faker,
+    output_format: OutputFormat,
+    static_fields: dict[str, str],
+    should_be_enabled: bool,
+) -> None:
+    config = LogConfig(output_format=output_format, static_fields=static_fields)
+    processor = static_fields_builder(config)
+
+    if not should_be_enabled:
+        assert processor is None
+        return
+
+    logger = Mock(Logger)
+    msg = faker.pystr()
+
+    assert processor is not None
+    assert processor(logger, "info", {"event": msg}) == {"event": msg, **static_fields}
+
+
+@pytest.mark.parametrize(
+    ("fmt", "expected"),
+    [
+        ("iso", "2023-11-14T22:13:20.123456Z"),
+        ("epoch", 1_700_000_000.123456),
+        ("epoch_ns", 1_700_000_000_123_456_000),
+    ],
+)
+def test_cached_timestamper_stamps_another_time(fmt: str, expected: object) -> None:
+    stamper = CachedTimeStamper(fmt)
+
+    assert stamper.stamp(1_700_000_000_123_456_000) == expected
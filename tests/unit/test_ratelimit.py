@@ -0,0 +1,248 @@
+import json
+import logging
+from collections.abc import Generator
+from logging import Logger
+from unittest.mock import Mock, call, patch
+
+import pytest
+import structlog
+from _pytest.capture import CaptureFixture
+from structlog import DropEvent
+from structlog.typing import EventDict
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import RateLimitSettings
+from acidrain_logging.ratelimit import RateLimiter
+
+
+@pytest.fixture
+def now() -> Generator[Mock, None, None]:
+    with patch("acidrain_logging.ratelimit.time.monotonic", return_value=100.0) as m:
+        yield m
+
+
+@pytest.fixture
+def _log_restore() -> Generator[None, None, None]:
+    logger = logging.getLogger()
+    handlers = [*logger.handlers]
+    level = logger.level
+    config = structlog.get_config()
+
+    yield
+
+    logger.handlers = handlers
+    logger.setLevel(level)
+    structlog.configure(**config)
+
+
+def _limit(
+    limiter: RateLimiter,
+    event: str = "boom",
+    logger: str = "test",
+    method: str = "error",
+) -> EventDict | None:
+    try:
+        return limiter(Mock(Logger), method, {"event": event, "logger": logger})
+    except DropEvent:
+        return None
+
+
+@pytest.mark.usefixtures("now")
+def test_rate_limiter_lets_a_burst_through() -> None:
+    limiter = RateLimiter(rate=1, burst=3, max_keys=10)
+
+    passed = [_limit(limiter) is not None for _ in range(5)]
+
+    assert passed == [True, True, True, False, False]
+
+
+def test_rate_limiter_refills_at_rate_and_counts_the_dropped_events(
+    now: Mock,
+) -> None:
+    limiter = RateLimiter(rate=2, burst=1, max_keys=10)
+
+    assert _limit(limiter) == {"event": "boom", "logger": "test"}
+    assert _limit(limiter) is None
+    assert _limit(limiter) is None
+
+    now.return_value += 0.25
+    assert _limit(limiter) is None
+
+    now.return_value += 0.25
+    assert _limit(limiter) == {"event": "boom", "logger": "test", "repeated": 3}
+
+    now.return_value += 10
+    assert _limit(limiter) == {"event": "boom", "logger": "test"}
+
+
+@pytest.mark.usefixtures("now")
+@pytest.mark.parametrize(
+    "kwargs", [{"event": "other"}, {"logger": "other"}, {"method": "warning"}]
+)
+def test_rate_limiter_limits_per_logger_level_and_message(
+    kwargs: dict[str, str],
+) -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=10)
+
+    assert _limit(limiter) is not None
+    assert _limit(limiter) is None
+    assert _limit(limiter, **kwargs) is not None
+
+
+@pytest.mark.usefixtures("now")
+def test_rate_limiter_forgets_the_least_recently_logged_keys() -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+
+    _limit(limiter, "a")
+    _limit(limiter, "b")
+    # Makes "b" the least recently logged
+    assert _limit(limiter, "a") is None
+    _limit(limiter, "c")
+
+    assert _limit(limiter, "a") is None
+    assert _limit(limiter, "b") is not None
+
+
+@patch("acidrain_logging.ratelimit.structlog.get_logger")
+def test_rate_limiter_logs_the_count_of_keys_not_logged_again(
+    get_logger: Mock, now: Mock
+) -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=10)
+
+    _limit(limiter, "a")
+    _limit(limiter, "a")
+    _limit(limiter, "a", method="exception")
+    _limit(limiter, "a", method="exception")
+
+    # Not until the key could be logged again
+    now.return_value += 0.5
+    _limit(limiter, "b")
+    assert not get_logger.called
+
+    now.return_value += 0.5
+    _limit(limiter, "c")
+
+    get_logger.assert_called_with("test")
+    assert get_logger.return_value.log.call_args_list == [
+        call(logging.ERROR, "a", repeated=1, _acidrain_rate_limit_summary=True),
+        call(logging.ERROR, "a", repeated=1, _acidrain_rate_limit_summary=True),
+    ]
+
+    # Not carried by the next event of the key anymore
+    assert _limit(limiter, "a") == {"event": "a", "logger": "test"}
+    _limit(limiter, "d")
+    assert get_logger.return_value.log.call_count == 2
+
+
+@pytest.mark.usefixtures("now")
+@patch("acidrain_logging.ratelimit.structlog.get_logger")
+def test_rate_limiter_logs_the_count_of_the_keys_it_forgets(get_logger: Mock) -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2)
+
+    _limit(limiter, "a")
+    _limit(limiter, "a")
+    _limit(limiter, "b")
+    _limit(limiter, "b")
+    # Forgets "a", the least recently logged
+    _limit(limiter, "c")
+
+    get_logger.return_value.log.assert_called_once_with(
+        logging.ERROR, "a", repeated=1, _acidrain_rate_limit_summary=True
+    )
+    assert list(limiter._buckets) == [("test", "error", "b"), ("test", "error", "c")]  # noqa: SLF001
+
+    # Then "b", only once
+    _limit(limiter, "d")
+    _limit(limiter, "e")
+    assert get_logger.return_value.log.call_args_list[1:] == [
+        call(logging.ERROR, "b", repeated=1, _acidrain_rate_limit_summary=True)
+    ]
+
+
+@pytest.mark.usefixtures("now")
+def test_rate_limiter_does_not_inherit_the_lock_held_when_forking() -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=10)
+
+    # As if another thread was logging when forking
+    with limiter._lock:  # noqa: SLF001
+        limiter._reset_after_fork()  # noqa: SLF001
+
+    assert _limit(limiter) is not None
+
+
+@pytest.mark.usefixtures("now")
+def test_rate_limiter_uses_the_template_of_stdlib_records() -> None:
+    limiter = RateLimiter(rate=1, burst=1, max_keys=10)
+
+    records = [
+        logging.makeLogRecord({"msg": "No user %s", "args": (user,)})
+        for user in ("a", "b")
+    ]
+
+    limiter(Mock(Logger), "error", {"event": "No user a", "_record": records[0]})
+    with pytest.raises(DropEvent):
+        limiter(Mock(Logger), "error", {"event": "No user b", "_record": records[1]})
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.usefixtures("now", "_log_restore")
+def test_repeated_events_are_dropped_before_being_processed(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            output_format=OutputFormat.JSON,
+            fast_path=fast_path,
+            rate_limit=RateLimitSettings(enabled=True, burst=2),
+        )
+    )
+    log = structlog.get_logger("test.ratelimit")
+    stdlib_logger = logging.getLogger("test.ratelimit")
+
+    for _ in range(5):
+        try:
+            msg = "boom"
+            raise ValueError(msg)  # noqa: TRY301
+        except ValueError:
+            log.exception("Failed")
+        stdlib_logger.error("Failed %d", 42)
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+
+    assert [line["message"] for line in lines] == ["Failed", "Failed 42"] * 2
+    assert all("ValueError" in line["exception"] for line in lines[::2])
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+@pytest.mark.usefixtures("_log_restore")
+def test_count_of_repeated_events_is_logged_with_other_events(
+    capsys: CaptureFixture[str], now: Mock, *, fast_path: bool
+) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            output_format=OutputFormat.JSON,
+            fast_path=fast_path,
+            rate_limit=RateLimitSettings(enabled=True, burst=1),
+        )
+    )
+    log = structlog.get_logger("test.ratelimit")
+
+    for _ in range(3):
+        log.warning("Failed")
+    now.return_value += 1
+    structlog.get_logger("test.other").info("Other")
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+
+    assert [
+        (line["message"], line["logger"], line["level"], line.get("repeated"))
+        for line in lines
+    ] == [
+        ("Failed", "test.ratelimit", "warning", None),
+        ("Failed", "test.ratelimit", "warning", 2),
+        ("Other", "test.other", "info", None),
+    ]
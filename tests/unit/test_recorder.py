@@ -0,0 +1,273 @@
+import json
+import logging
+from collections.abc import Generator
+
+import pytest
+import structlog
+from _pytest.capture import CaptureFixture
+from freezegun.api import FrozenDateTimeFactory
+from structlog import DropEvent
+from structlog.typing import EventDict, WrappedLogger
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import FlightRecorderSettings
+from acidrain_logging.processors import SHARED_PRE_PROCESSORS
+from acidrain_logging.recorder import (
+    configure_flight_recorder,
+    filter_by_level_or_record,
+    start_recording,
+    stop_recording,
+)
+
+
+@pytest.fixture(autouse=True)
+def _log_restore() -> Generator[None, None, None]:
+    logger = logging.getLogger()
+    handlers = [*logger.handlers]
+    level = logger.level
+    config = structlog.get_config()
+
+    yield
+
+    logger.handlers = handlers
+    logger.setLevel(level)
+    structlog.configure(**config)
+    configure_flight_recorder(FlightRecorderSettings())
+
+
+def _configure(*, fast_path: bool = False, **settings: object) -> None:
+    # Only keep our handler, to get a clean output
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            output_format=OutputFormat.JSON,
+            fast_path=fast_path,
+            flight_recorder=FlightRecorderSettings(enabled=True, **settings),  # type: ignore[arg-type]
+        )
+    )
+
+
+def _messages(capsys: CaptureFixture[str]) -> list[str]:
+    return [
+        json.loads(line)["message"] for line in capsys.readouterr().err.splitlines()
+    ]
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_recorded_events_are_logged_if_the_request_failed(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+    log = structlog.get_logger("test.recorder")
+
+    recorder = start_recording()
+    log.debug("debug-1")
+    log.info("info")
+    log.debug("debug-2")
+
+    # The other events are logged right away
+    assert _messages(capsys) == ["info"]
+
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    lines = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert [line["message"] for line in lines] == ["debug-1", "debug-2"]
+    assert {line["level"] for line in lines} == {"debug"}
+
+
+@pytest.mark.parametrize("fast_path", [False, True])
+def test_recorded_events_are_dropped_if_the_request_succeeded(
+    capsys: CaptureFixture[str], *, fast_path: bool
+) -> None:
+    _configure(fast_path=fast_path)
+    log = structlog.get_logger("test.recorder")
+
+    recorder = start_recording()
+    log.debug("debug")
+    stop_recording(recorder, failed=False, elapsed_ms=1)
+
+    # Not recording anymore
+    log.debug("debug")
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    assert _messages(capsys) == []
+
+
+@pytest.mark.parametrize("timestamp_format", ["iso", "%Y-%m-%d %H:%M:%S"])
+def test_recorded_events_keep_the_time_and_context_they_were_recorded_with(
+    capsys: CaptureFixture[str], freezer: FrozenDateTimeFactory, timestamp_format: str
+) -> None:
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            output_format=OutputFormat.JSON,
+            timestamp_format=timestamp_format,
+            flight_recorder=FlightRecorderSettings(enabled=True),
+        )
+    )
+    log = structlog.get_logger("test.recorder")
+    freezer.move_to("2024-01-02T03:04:05Z")
+
+    recorder = start_recording()
+    with structlog.contextvars.bound_contextvars(step="first"):
+        log.debug("debug")
+    freezer.tick(10)
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    (line,) = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert line["step"] == "first"
+    assert line["timestamp"] in {"2024-01-02T03:04:05Z", "2024-01-02 03:04:05"}
+
+
+def test_recorded_events_keep_their_exception(capsys: CaptureFixture[str]) -> None:
+    _configure()
+    log = structlog.get_logger("test.recorder")
+
+    recorder = start_recording()
+    try:
+        msg = "boom"
+        raise ValueError(msg)  # noqa: TRY301
+    except ValueError:
+        log.debug("debug", exc_info=True)
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    (line,) = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert "ValueError: boom" in line["exception"]
+
+
+def test_recorded_events_keep_their_stack(capsys: CaptureFixture[str]) -> None:
+    _configure()
+
+    recorder = start_recording()
+    structlog.get_logger("test.recorder").debug("debug", stack_info=True)
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    # Rendered from where the event was logged, not from where it was replayed
+    (line,) = [json.loads(line) for line in capsys.readouterr().err.splitlines()]
+    assert "test_recorded_events_keep_their_stack" in line["stack"]
+    assert "stop_recording" not in line["stack"]
+
+
+def test_recorded_events_can_be_dropped_when_replayed(
+    capsys: CaptureFixture[str],
+) -> None:
+    def _drop(_logger: WrappedLogger, _name: str, event_dict: EventDict) -> EventDict:
+        if event_dict.get("drop"):
+            raise DropEvent
+        return event_dict
+
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="INFO",
+            output_format=OutputFormat.JSON,
+            flight_recorder=FlightRecorderSettings(enabled=True),
+        ),
+        pre_processors=[*SHARED_PRE_PROCESSORS, _drop],
+    )
+    log = structlog.get_logger("test.recorder")
+
+    recorder = start_recording()
+    log.debug("dropped", drop=True)
+    log.debug("kept")
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    assert _messages(capsys) == ["kept"]
+
+
+def test_recorded_events_are_dropped_without_a_replayer(
+    capsys: CaptureFixture[str],
+) -> None:
+    _configure()
+
+    recorder = start_recording()
+    structlog.get_logger("test.recorder").debug("debug")
+
+    # Configured directly, without a logger to replay the events through
+    configure_flight_recorder(FlightRecorderSettings(enabled=True))
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    assert _messages(capsys) == []
+
+
+def test_events_are_not_recorded_outside_of_requests(
+    capsys: CaptureFixture[str],
+) -> None:
+    _configure()
+
+    structlog.get_logger("test.recorder").debug("debug")
+
+    assert _messages(capsys) == []
+
+
+@pytest.mark.parametrize(
+    ("elapsed_ms", "expected"), [(None, []), (100, []), (100.1, ["debug"])]
+)
+def test_recorded_events_are_logged_if_the_request_was_slow(
+    capsys: CaptureFixture[str], elapsed_ms: float | None, expected: list[str]
+) -> None:
+    _configure(flush_slower_than_ms=100)
+
+    recorder = start_recording()
+    structlog.get_logger("test.recorder").debug("debug")
+    stop_recording(recorder, failed=False, elapsed_ms=elapsed_ms)
+
+    assert _messages(capsys) == expected
+
+
+def test_only_the_last_events_at_or_above_the_level_are_recorded(
+    capsys: CaptureFixture[str],
+) -> None:
+    logging.getLogger().handlers.clear()
+    configure_logger(
+        LogConfig(
+            level="WARNING",
+            output_format=OutputFormat.JSON,
+            flight_recorder=FlightRecorderSettings(
+                enabled=True, level="INFO", max_events=2
+            ),
+        )
+    )
+    log = structlog.get_logger("test.recorder")
+
+    recorder = start_recording()
+    log.debug("debug")
+    log.info("info-1")
+    log.info("info-2")
+    log.info("info-3")
+    stop_recording(recorder, failed=True, elapsed_ms=1)
+
+    assert _messages(capsys) == ["info-2", "info-3"]
+
+
+def test_events_of_the_notset_level_are_filtered() -> None:
+    _configure()
+
+    recorder = start_recording()
+    with pytest.raises(DropEvent):
+        filter_by_level_or_record(logging.getLogger("test.recorder"), "notset", {})
+    stop_recording(recorder, failed=False, elapsed_ms=1)
+
+
+def test_events_are_not_recorded_when_logging_is_disabled(
+    capsys: CaptureFixture[str],
+) -> None:
+    _configure()
+
+    logging.disable(logging.WARNING)
+    try:
+        recorder = start_recording()
+        structlog.get_logger("test.recorder").debug("debug")
+        stop_recording(recorder, failed=True, elapsed_ms=1)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert _messages(capsys) == []
+
+
+def test_recording_is_disabled_by_default() -> None:
+    configure_logger(LogConfig(level="INFO"))
+
+    assert start_recording() is None
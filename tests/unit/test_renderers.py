@@ -0,0 +1,146 @@
+from logging import Logger
+from unittest.mock import Mock
+
+import orjson
+import pytest
+from faker import Faker
+
+from acidrain_logging.context import (
+    bound_contextvars,
+    get_bound_context,
+    get_contextvars,
+    merge_contextvars,
+)
+from acidrain_logging.renderers import JSONLineRenderer
+
+
+@pytest.fixture
+def static_fields(faker: Faker) -> dict[str, str]:
+    return {faker.pystr(): faker.pystr() for _ in range(3)}
+
+
+def test_json_line_renderer_renders_complete_lines(faker: Faker) -> None:
+    event_dict = {"event": faker.pystr(), faker.pystr(): faker.pyint()}
+
+    line = JSONLineRenderer()(Mock(Logger), "info", event_dict)
+
+    assert line == orjson.dumps(event_dict) + b"\n"
+
+
+def test_json_line_renderer_splices_the_static_fields(
+    faker: Faker, static_fields: dict[str, str]
+) -> None:
+    renderer = JSONLineRenderer(static_fields)
+    event_dict = {"event": faker.pystr(), "data": faker.pydict(value_types=[str])}
+
+    line = renderer(Mock(Logger), "info", event_dict)
+
+    assert line == orjson.dumps({**event_dict, **static_fields}) + b"\n"
+    assert event_dict.keys().isdisjoint(static_fields)  # Left untouched
+
+
+def test_json_line_renderer_renders_static_fields_alone(
+    static_fields: dict[str, str],
+) -> None:
+    line = JSONLineRenderer(static_fields)(Mock(Logger), "info", {})
+
+    assert line == orjson.dumps(static_fields) + b"\n"
+
+
+def test_json_line_renderer_static_fields_win_over_the_event_values(
+    faker: Faker, static_fields: dict[str, str]
+) -> None:
+    key = next(iter(static_fields))
+    event_dict = {key: faker.pystr(), "event": faker.pystr()}
+
+    line = JSONLineRenderer(static_fields)(Mock(Logger), "info", event_dict)
+
+    # No duplicated key, same output as with event_dict.update(static_fields)
+    assert line == orjson.dumps({**event_dict, **static_fields}) + b"\n"
+    assert line.count(key.encode()) == 1
+
+
+def test_json_line_renderer_keeps_the_fallback_serialization(faker: Faker) -> None:
+    class Unserializable:
+        def __repr__(self) -> str:
+            return "unserializable"
+
+    line = JSONLineRenderer({"host": faker.pystr()})(
+        Mock(Logger), "info", {"value": Unserializable()}
+    )
+
+    assert orjson.loads(line)["value"] == "unserializable"
+
+
+def test_json_line_renderer_splices_the_cached_context(
+    faker: Faker, static_fields: dict[str, str]
+) -> None:
+    renderer = JSONLineRenderer(static_fields)
+    context_values = {"trace_id": faker.uuid4(), "task": {"id": faker.pystr()}}
+    event_dict = {"event": faker.pystr()}
+
+    with bound_contextvars(**context_values):
+        line = renderer(Mock(Logger), "info", event_dict.copy())
+
+        context = get_bound_context()
+        assert context.fragment == orjson.dumps(context_values)[1:-1]
+
+        # The cached fragment is used as is
+        context.fragment = b'"cached":true'
+        cached_line = renderer(Mock(Logger), "info", event_dict.copy())
+
+    # The context first, like merge_contextvars adds it
+    expected = {**context_values, **event_dict, **static_fields}
+    assert list(orjson.loads(line).items()) == list(expected.items())
+    assert orjson.loads(cached_line) == {
+        "cached": True,
+        **event_dict,
+        **static_fields,
+    }
+
+
+def test_json_line_renderer_splices_the_context_merged_first(faker: Faker) -> None:
+    renderer = JSONLineRenderer()
+
+    with bound_contextvars(trace_id=faker.pystr(), other=faker.pystr()):
+        event_dict = merge_contextvars(Mock(Logger), "info", {"event": faker.pystr()})
+        expected = orjson.dumps(event_dict) + b"\n"
+
+        assert renderer(Mock(Logger), "info", event_dict) == expected
+        assert get_bound_context().fragment is not None
+
+
+def test_json_line_renderer_renders_merged_context_values_as_usual(
+    faker: Faker,
+) -> None:
+    renderer = JSONLineRenderer()
+
+    with bound_contextvars(trace_id=faker.pystr(), other=faker.pystr()):
+        event_dict = merge_contextvars(Mock(Logger), "info", {"event": faker.pystr()})
+        event_dict = {"before": faker.pystr(), **event_dict}
+        expected = orjson.dumps(event_dict) + b"\n"
+
+        assert renderer(Mock(Logger), "info", event_dict) == expected
+        assert get_bound_context().fragment is None
+
+
+def test_json_line_renderer_event_values_win_over_the_context(faker: Faker) -> None:
+    renderer = JSONLineRenderer()
+    event_dict = {"event": faker.pystr(), "trace_id": faker.pystr()}
+
+    with bound_contextvars(trace_id=faker.pystr(), other=faker.pystr()):
+        line = renderer(Mock(Logger), "info", event_dict.copy())
+        expected = {**get_contextvars(), **event_dict}
+
+    assert orjson.loads(line) == expected
+
+
+def test_json_line_renderer_static_fields_win_over_the_context(faker: Faker) -> None:
+    host = faker.pystr()
+    renderer = JSONLineRenderer({"host": host})
+
+    with bound_contextvars(host=faker.pystr()):
+        line = renderer(Mock(Logger), "info", {"event": faker.pystr()})
+
+    assert line.count(b'"host"') == 1
+    assert orjson.loads(line)["host"] == host
@@ -0,0 +1,167 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from acidrain_logging import sampling
+from acidrain_logging.config import AccessLogSettings, TaskLogSettings
+from acidrain_logging.sampling import AccessLogSampler, TaskLogSampler
+
+
+def test_sampler_logs_everything_by_default() -> None:
+    sampler = AccessLogSampler(AccessLogSettings())
+
+    assert sampler.should_log("/items/{item_id}", 200, 1.0) is True
+    assert sampler.should_log(None, 404, None) is True
+
+
+def test_sampler_skips_excluded_routes() -> None:
+    sampler = AccessLogSampler(
+        AccessLogSettings(exclude={"/health"}, sample_rates={"/health": 1.0})
+    )
+
+    assert sampler.should_log("/health", 200, 1.0) is False
+    assert sampler.should_log("/items/{item_id}", 200, 1.0) is True
+
+
+@pytest.mark.parametrize(
+    ("status_code", "elapsed_ms", "expected"),
+    [
+        (200, 1.0, False),
+        (200, None, False),
+        (499, 1.0, False),
+        (500, 1.0, True),
+        (503, None, True),
+        (200, 250.0, False),
+        (200, 250.1, True),
+    ],
+)
+def test_sampler_always_logs_errors_and_slow_requests(
+    *, status_code: int, elapsed_ms: float | None, expected: bool
+) -> None:
+    sampler = AccessLogSampler(
+        AccessLogSettings(exclude={"/health"}, always_log_slower_than_ms=250)
+    )
+
+    assert sampler.should_log("/health", status_code, elapsed_ms) is expected
+
+
+@pytest.mark.parametrize(
+    ("route", "draw", "expected"),
+    [
+        ("/metrics", 0.09, True),
+        ("/metrics", 0.1, False),
+        ("/items/{item_id}", 0.49, True),
+        ("/items/{item_id}", 0.5, False),
+        (None, 0.49, True),
+        (None, 0.5, False),
+    ],
+)
+@patch(f"{sampling.__name__}.random")
+def test_sampler_samples_routes_at_their_rate(
+    random_mock: Mock, *, route: str | None, draw: float, expected: bool
+) -> None:
+    random_mock.random.return_value = draw
+    sampler = AccessLogSampler(
+        AccessLogSettings(default_sample_rate=0.5, sample_rates={"/metrics": 0.1})
+    )
+
+    assert sampler.should_log(route, 200, 1.0) is expected
+
+
+@pytest.mark.parametrize(
+    ("status_code", "elapsed_ms", "expected"),
+    [(200, 1.0, False), (500, 1.0, True), (200, 250.1, True)],
+)
+def test_sampler_only_logs_the_always_logged_requests_when_aggregating(
+    *, status_code: int, elapsed_ms: float, expected: bool
+) -> None:
+    sampler = AccessLogSampler(
+        AccessLogSettings(
+            aggregate=True, sample_rates={"/": 1.0}, always_log_slower_than_ms=250
+        )
+    )
+
+    assert sampler.should_log("/", status_code, elapsed_ms) is expected
+
+
+def test_task_sampler_logs_everything_by_default() -> None:
+    sampler = TaskLogSampler(TaskLogSettings())
+
+    assert sampler.should_log_start("tasks.add") is True
+    assert sampler.should_log_end(sampled=True, state="SUCCESS", duration_ms=1) is True
+
+
+def test_task_sampler_logs_every_nth_run() -> None:
+    sampler = TaskLogSampler(
+        TaskLogSettings(sample_every={"tasks.add": 3}, sample_rates={"tasks.add": 0})
+    )
+
+    assert [sampler.should_log_start("tasks.add") for _ in range(7)] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+
+
+@pytest.mark.parametrize(
+    ("task_name", "draw", "expected"),
+    [
+        ("tasks.add", 0.09, True),
+        ("tasks.add", 0.1, False),
+        ("tasks.other", 0.49, True),
+        ("tasks.other", 0.5, False),
+    ],
+)
+@patch(f"{sampling.__name__}.random")
+def test_task_sampler_samples_tasks_at_their_rate(
+    random_mock: Mock, *, task_name: str, draw: float, expected: bool
+) -> None:
+    random_mock.random.return_value = draw
+    sampler = TaskLogSampler(
+        TaskLogSettings(default_sample_rate=0.5, sample_rates={"tasks.add": 0.1})
+    )
+
+    assert sampler.should_log_start(task_name) is expected
+
+
+@pytest.mark.parametrize(
+    ("state", "duration_ms", "expected"),
+    [
+        ("SUCCESS", 1.0, False),
+        ("SUCCESS", None, False),
+        ("SUCCESS", 250.0, False),
+        ("SUCCESS", 250.1, True),
+        ("FAILURE", 1.0, True),
+        ("RETRY", None, True),
+    ],
+)
+def test_task_sampler_always_logs_failures_and_slow_runs(
+    *, state: str, duration_ms: float | None, expected: bool
+) -> None:
+    sampler = TaskLogSampler(
+        TaskLogSettings(default_sample_rate=0, always_log_slower_than_ms=250)
+    )
+
+    assert sampler.should_log_start("tasks.add") is False
+    assert (
+        sampler.should_log_end(sampled=False, state=state, duration_ms=duration_ms)
+        is expected
+    )
+
+
+def test_task_sampler_only_logs_the_always_logged_runs_when_aggregating() -> None:
+    sampler = TaskLogSampler(
+        TaskLogSettings(
+            aggregate=True,
+            sample_every={"tasks.add": 1},
+            sample_rates={"tasks.other": 1.0},
+        )
+    )
+
+    assert sampler.should_log_start("tasks.add") is False
+    assert sampler.should_log_start("tasks.other") is False
+    assert sampler.should_log_end(sampled=False, state="FAILURE", duration_ms=1) is True
@@ -0,0 +1,632 @@
+import copy
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from collections.abc import Callable, Generator
+from typing import TYPE_CHECKING
+from unittest.mock import patch
+
+import pytest
+from faker import Faker
+
+from acidrain_logging.config import OverflowPolicy
+from acidrain_logging.sinks import (
+    BatchSink,
+    FunnelSink,
+    QueueSink,
+    Sink,
+    SinkHandler,
+    StreamSink,
+)
+from acidrain_logging.testing.utils import retry
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+    from multiprocessing.synchronize import Event
+
+
+class ListSink(Sink):
+    def __init__(self) -> None:
+        self.lines: list[bytes] = []
+        self.closed = False
+
+    def write(self, line: bytes, levelno: int) -> None:  # noqa: ARG002
+        self.lines.append(line)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class BlockedSink(ListSink):
+    """Sink that blocks all writes until released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.released = threading.Event()
+        self.entered = threading.Event()
+
+    def write(self, line: bytes, levelno: int) -> None:
+        self.entered.set()
+        self.released.wait()
+        super().write(line, levelno)
+
+
+@pytest.fixture
+def pipe() -> Generator[tuple[io.BufferedReader, io.BufferedWriter], None, None]:
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+
+    with open(read_fd, "rb") as reader, open(write_fd, "wb") as writer:  # noqa: PTH123
+        yield reader, writer
+
+
+@pytest.fixture
+def blocked_sink() -> Generator[BlockedSink, None, None]:
+    sink = BlockedSink()
+    yield sink
+    sink.released.set()
+
+
+def _fill_queue(sink: QueueSink, target: BlockedSink, levels: list[int]) -> None:
+    """Get the writer thread stuck on a first line, then fill the queue."""
+    sink.write(b"in-flight\n", logging.INFO)
+    assert target.entered.wait(timeout=1)
+
+    for idx, levelno in enumerate(levels):
+        sink.write(f"queued-{idx}\n".encode(), levelno)
+
+
+def _run_in_child(target: Callable[..., None], *args: object) -> None:
+    process = multiprocessing.get_context("fork").Process(target=target, args=args)
+    process.start()
+    process.join(timeout=5)
+
+    if process.exitcode is None:  # pragma: no cover: stuck child
+        process.kill()
+    assert process.exitcode == 0
+
+
+def _run_in_forked_copy(target: Callable[..., None], sink: Sink, *args: object) -> None:
+    """
+    Run `target` with a copy of the sink, re-initialized like in a forked process.
+
+    The child side of the sinks then runs in this process, threads included, with
+    buffers and sockets of its own like in a forked process.
+    """
+    child = copy.copy(sink)
+    for name, value in vars(child).items():
+        if isinstance(value, list | dict | deque):
+            setattr(child, name, copy.copy(value))
+
+    if isinstance(child, FunnelSink):
+        child._reader = child._reader.dup()  # noqa: SLF001
+        child._writer = child._writer.dup()  # noqa: SLF001
+
+    child._reset_after_fork()  # noqa: SLF001
+
+    target(child, *args)
+
+
+in_forked_processes = pytest.mark.parametrize(
+    "run_in_child", [_run_in_child, _run_in_forked_copy], ids=["fork", "copy"]
+)
+
+
+def _write_and_close(sink: Sink, line: bytes) -> None:
+    sink.write(line, logging.INFO)
+    sink.close()
+
+
+def test_stream_sink_writes_to_the_underlying_buffer(faker: Faker) -> None:
+    stream = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+    line = f"{faker.pystr()}\n".encode()
+
+    StreamSink(stream).write(line, logging.INFO)
+
+    assert stream.buffer.getvalue() == line
+
+
+def test_stream_sink_writes_text_if_there_is_no_buffer(faker: Faker) -> None:
+    stream = io.StringIO()
+    line = f"{faker.pystr()}\n"
+
+    sink = StreamSink(stream)
+    sink.write(line.encode(), logging.INFO)
+    sink.close()
+
+    assert stream.getvalue() == line
+
+
+@in_forked_processes
+def test_stream_sink_does_not_inherit_its_lock_in_forked_processes(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+    run_in_child: Callable[..., None],
+) -> None:
+    reader, writer = pipe
+    sink = StreamSink(io.TextIOWrapper(writer))
+
+    # As if another thread was writing when forking
+    with sink._lock:  # noqa: SLF001
+        run_in_child(_write_and_close, sink, b"child\n")
+
+    assert reader.read() == b"child\n"
+
+
+def _batch_sink(stream: io.IOBase, **kwargs: float) -> BatchSink:
+    params: dict[str, float] = {
+        "max_bytes": 1024,
+        "max_count": 10,
+        "max_latency_s": 60,
+        **kwargs,
+    }
+    return BatchSink(stream, **params)  # type: ignore[arg-type]
+
+
+def test_batch_sink_buffers_lines_until_flushed(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer)
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.write(b"line-2\n", logging.WARNING)
+
+    assert reader.read() is None  # Nothing written yet
+
+    sink.flush()
+    assert reader.read() == b"line-1\nline-2\n"
+
+    sink.close()
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "levelno"),
+    [
+        ({"max_count": 3}, logging.INFO),
+        ({"max_bytes": 21}, logging.INFO),
+        ({}, logging.ERROR),
+        ({"flush_level": logging.WARNING}, logging.WARNING),
+    ],
+)
+def test_batch_sink_writes_when_a_threshold_is_reached(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+    kwargs: dict[str, float],
+    levelno: int,
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer, **kwargs)
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.write(b"line-2\n", logging.INFO)
+    assert reader.read() is None
+
+    sink.write(b"line-3\n", levelno)
+    assert reader.read() == b"line-1\nline-2\nline-3\n"
+
+    sink.close()
+
+
+def test_batch_sink_writes_after_the_max_latency(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer, max_latency_s=0.05)
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.write(b"line-2\n", logging.INFO)
+
+    os.set_blocking(reader.fileno(), True)
+    assert reader.read(14) == b"line-1\nline-2\n"
+
+    sink.close()
+
+
+def test_batch_sink_writes_everything_when_closed(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer)
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.close()
+    sink.close()  # Closing twice is fine
+
+    assert reader.read() == b"line-1\n"
+
+    # Late events, after the thread is gone, are written synchronously
+    sink.write(b"line-2\n", logging.INFO)
+    assert reader.read() == b"line-2\n"
+
+
+def test_batch_sink_resumes_partial_writes(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer)
+
+    writev = os.writev
+
+    def _partial_writev(fd: int, buffers: list[memoryview]) -> int:
+        # Write at most 5 bytes at a time
+        return writev(fd, [bytes(b"".join(buffers)[:5])])
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.write(b"line-2\n", logging.INFO)
+
+    with patch("os.writev", side_effect=_partial_writev):
+        sink.flush()
+
+    assert reader.read() == b"line-1\nline-2\n"
+
+    sink.close()
+
+
+@in_forked_processes
+def test_batch_sink_leaves_the_lines_of_the_parent_to_the_parent_when_forked(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+    run_in_child: Callable[..., None],
+) -> None:
+    reader, writer = pipe
+    sink = _batch_sink(writer)
+    sink.write(b"parent\n", logging.INFO)
+
+    run_in_child(_write_and_close, sink, b"child\n")
+    assert reader.read() == b"child\n"
+
+    sink.close()
+    assert reader.read() == b"parent\n"
+
+
+@pytest.mark.parametrize(
+    "stream_factory",
+    [
+        lambda: io.TextIOWrapper(io.BytesIO(), encoding="utf-8"),
+        io.StringIO,
+    ],
+)
+def test_batch_sink_writes_to_streams_without_file_descriptor(
+    stream_factory: type[io.TextIOBase],
+) -> None:
+    stream = stream_factory()
+    sink = _batch_sink(stream)
+
+    sink.write(b"line-1\n", logging.INFO)
+    sink.write(b"line-2\n", logging.INFO)
+    sink.close()
+
+    buffer = getattr(stream, "buffer", None)
+    value = buffer.getvalue().decode() if buffer else stream.getvalue()  # type: ignore[attr-defined]
+    assert value == "line-1\nline-2\n"
+
+
+def test_queue_sink_writes_lines_in_order(faker: Faker) -> None:
+    target = ListSink()
+    lines = [f"{faker.pystr()}\n".encode() for _ in range(100)]
+
+    sink = QueueSink(target, max_size=10)
+    for line in lines:
+        sink.write(line, logging.INFO)
+    sink.flush()
+
+    assert target.lines == lines
+
+    sink.close()
+    assert target.closed is True
+
+
+def test_queue_sink_drains_the_queue_when_closed(blocked_sink: BlockedSink) -> None:
+    sink = QueueSink(blocked_sink, max_size=10)
+    _fill_queue(sink, blocked_sink, [logging.INFO] * 5)
+
+    blocked_sink.released.set()
+    sink.close()
+
+    assert len(blocked_sink.lines) == 6
+    assert sink.dropped_events == {}
+
+
+def _check_queue_sink_in_child(sink: QueueSink) -> None:
+    # The writer thread of the parent is stuck on the blocked sink, not its own
+    sink.target = target = ListSink()
+
+    sink.write(b"child\n", logging.INFO)
+    sink.flush()
+
+    assert target.lines == [b"child\n"]
+
+
+@in_forked_processes
+def test_queue_sink_restarts_with_an_empty_queue_when_forked(
+    blocked_sink: BlockedSink, run_in_child: Callable[..., None]
+) -> None:
+    sink = QueueSink(blocked_sink, max_size=10)
+    _fill_queue(sink, blocked_sink, [logging.INFO] * 5)
+
+    run_in_child(_check_queue_sink_in_child, sink)
+
+    blocked_sink.released.set()
+    sink.close()
+    assert len(blocked_sink.lines) == 6
+
+
+def test_queue_sink_writes_synchronously_once_closed(faker: Faker) -> None:
+    target = ListSink()
+    sink = QueueSink(target, max_size=10)
+    sink.close()
+    sink.close()  # Closing twice is fine
+
+    line = faker.pystr().encode()
+    sink.write(line, logging.INFO)
+
+    assert target.lines == [line]
+
+
+def test_queue_sink_drop_newest_drops_the_incoming_line(
+    blocked_sink: BlockedSink,
+) -> None:
+    sink = QueueSink(
+        blocked_sink, max_size=2, overflow_policy=OverflowPolicy.DROP_NEWEST
+    )
+    _fill_queue(sink, blocked_sink, [logging.INFO, logging.DEBUG, logging.WARNING])
+
+    blocked_sink.released.set()
+    sink.close()
+
+    assert blocked_sink.lines == [b"in-flight\n", b"queued-0\n", b"queued-1\n"]
+    assert sink.dropped_events == {"WARNING": 1}
+
+
+def test_queue_sink_drop_oldest_drops_the_oldest_unprotected_line(
+    blocked_sink: BlockedSink,
+) -> None:
+    sink = QueueSink(
+        blocked_sink, max_size=2, overflow_policy=OverflowPolicy.DROP_OLDEST
+    )
+    _fill_queue(sink, blocked_sink, [logging.ERROR, logging.DEBUG, logging.INFO])
+
+    blocked_sink.released.set()
+    sink.close()
+
+    assert blocked_sink.lines == [b"in-flight\n", b"queued-0\n", b"queued-2\n"]
+    assert sink.dropped_events == {"DEBUG": 1}
+
+
+@pytest.mark.parametrize(
+    "overflow_policy",
+    [OverflowPolicy.BLOCK, OverflowPolicy.DROP_NEWEST, OverflowPolicy.DROP_OLDEST],
+)
+def test_queue_sink_never_drops_protected_lines(
+    blocked_sink: BlockedSink, overflow_policy: OverflowPolicy
+) -> None:
+    sink = QueueSink(blocked_sink, max_size=1, overflow_policy=overflow_policy)
+    _fill_queue(sink, blocked_sink, [logging.ERROR])
+
+    writer = threading.Thread(target=sink.write, args=(b"critical\n", logging.CRITICAL))
+    writer.start()
+
+    # The queue is full of protected lines, the writer has to wait
+    writer.join(timeout=0.1)
+    assert writer.is_alive()
+
+    blocked_sink.released.set()
+    writer.join(timeout=1)
+    sink.close()
+
+    assert blocked_sink.lines == [b"in-flight\n", b"queued-0\n", b"critical\n"]
+    assert sink.dropped_events == {}
+
+
+def test_queue_sink_counts_failed_writes(faker: Faker) -> None:
+    class FailingSink(ListSink):
+        def write(self, line: bytes, levelno: int) -> None:  # noqa: ARG002
+            raise OSError
+
+    sink = QueueSink(FailingSink(), max_size=10)
+    sink.write(faker.pystr().encode(), logging.WARNING)
+    sink.close()
+
+    assert sink.dropped_events == {"WARNING": 1}
+
+
+def _funnel_sink(target: Sink, **kwargs: float) -> FunnelSink:
+    params: dict[str, float] = {"max_bytes": 1024, "max_latency_s": 60, **kwargs}
+    return FunnelSink(target, **params)  # type: ignore[arg-type]
+
+
+def test_funnel_sink_writes_the_lines_of_this_process_directly() -> None:
+    target = ListSink()
+    sink = _funnel_sink(target)
+
+    sink.write(b"line-1\n", logging.INFO)
+    assert target.lines == [b"line-1\n"]
+
+    sink.close()
+    assert target.closed is True
+
+
+def _write_lines(sink: FunnelSink, lines: list[bytes]) -> None:
+    for line in lines:
+        sink.write(line, logging.INFO)
+    sink.close()
+
+
+def test_funnel_sink_writes_the_lines_of_the_forked_processes() -> None:
+    target = ListSink()
+    sink = _funnel_sink(target, max_bytes=64 * 1024)
+
+    # Larger than PIPE_BUF, so they would interleave on a shared pipe
+    lines = [f"{i:04d}{'x' * 8192}\n".encode() for i in range(20)]
+    ctx = multiprocessing.get_context("fork")
+    processes = [
+        ctx.Process(target=_write_lines, args=(sink, lines[i::4])) for i in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    sink.close()
+
+    # Batches of whole lines
+    assert len(target.lines) < len(lines)
+    assert sorted(b"".join(target.lines).splitlines(keepends=True)) == lines
+    assert sink.dropped_lines == 0
+
+
+def _write_and_wait(sink: FunnelSink) -> None:
+    sink.write(b"line-1\n", logging.INFO)
+    retry(lambda: sink._lines).until(lambda lines: not lines, interval_s=0)  # noqa: SLF001
+
+
+@in_forked_processes
+def test_funnel_sink_sends_the_lines_after_the_max_latency(
+    run_in_child: Callable[..., None],
+) -> None:
+    target = ListSink()
+    sink = _funnel_sink(target, max_latency_s=0.01)
+
+    run_in_child(_write_and_wait, sink)
+    sink.close()
+
+    assert target.lines == [b"line-1\n"]
+
+
+def _write_past_the_funnel(sink: FunnelSink, large_line: bytes) -> None:
+    sink.write(large_line, logging.INFO)
+    sink.write(b"line-1\n", logging.INFO)
+    # Ignored by the parent
+    sink._writer.send(b"")  # noqa: SLF001
+    sink.flush()
+
+    # Like if the parent was gone
+    sink._writer.close()  # noqa: SLF001
+    sink.write(b"line-2\n", logging.ERROR)
+
+    sink.close()
+    sink.close()  # Closing twice is fine
+
+
+@in_forked_processes
+def test_funnel_sink_children_write_the_lines_it_cant_send(
+    pipe: tuple[io.BufferedReader, io.BufferedWriter],
+    run_in_child: Callable[..., None],
+) -> None:
+    reader, writer = pipe
+    sink = _funnel_sink(StreamSink(io.TextIOWrapper(writer)))
+    large_line = b"x" * 2048 + b"\n"
+
+    run_in_child(_write_past_the_funnel, sink, large_line)
+    sink.close()
+
+    # Written by the child, or sent to the parent
+    lines = reader.read().splitlines(keepends=True)
+    assert sorted(lines) == [b"line-1\n", b"line-2\n", large_line]
+
+
+def _reconfigure_and_write(sink: FunnelSink, lines: list[bytes]) -> None:
+    assert sink.is_inherited
+
+    # Like the logging configured again in a gunicorn worker
+    new_sink = _funnel_sink(ListSink(), max_bytes=64 * 1024)
+    sink.close()
+
+    assert new_sink.is_inherited
+    assert new_sink.max_bytes == 1024
+    _write_lines(new_sink, lines)
+
+
+def test_funnel_sink_created_in_a_forked_process_sends_to_the_same_parent() -> None:
+    target = ListSink()
+    sink = _funnel_sink(target)
+    lines = [f"line-{i}\n".encode() for i in range(10)]
+
+    _run_in_child(_reconfigure_and_write, sink, lines)
+    sink.close()
+
+    assert not sink.is_inherited
+    assert b"".join(target.lines).splitlines(keepends=True) == lines
+
+
+def _flood(sink: FunnelSink, conn: "Connection", released: "Event") -> None:
+    for _ in range(2000):
+        sink.write(b"x" * 600 + b"\n", logging.INFO)
+    conn.send(sink.dropped_lines)
+
+    # Blocks until sent, and reports the dropped lines
+    released.wait()
+    sink.write(b"error\n", logging.ERROR)
+
+
+def test_funnel_sink_drops_lines_when_the_parent_cant_keep_up(
+    blocked_sink: BlockedSink,
+) -> None:
+    sink = _funnel_sink(blocked_sink)
+
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    released = ctx.Event()
+    process = ctx.Process(target=_flood, args=(sink, child_conn, released))
+    process.start()
+
+    dropped = parent_conn.recv()
+    assert dropped > 0
+
+    blocked_sink.released.set()
+    released.set()
+    process.join()
+    sink.close()
+
+    # The child may drop more lines until the error line is sent, and every line is
+    # either delivered or counted as dropped.
+    delivered = b"".join(blocked_sink.lines).splitlines()
+    assert sink.dropped_lines >= dropped
+    assert len(delivered) - 1 + sink.dropped_lines == 2000
+    assert delivered[-1] == b"error"
+
+
+def test_sink_handler_hands_formatted_records_to_the_sink(faker: Faker) -> None:
+    sink = ListSink()
+    handler = SinkHandler(sink)
+    msg = faker.pystr()
+
+    logger = logging.getLogger(f"{__name__}.{faker.pystr()}")
+    logger.addHandler(handler)
+    logger.warning(msg)
+    handler.flush()
+    handler.close()
+
+    assert sink.lines == [f"{msg}\n".encode()]
+    assert sink.closed is True
+
+
+def test_sink_handler_respects_filters(faker: Faker) -> None:
+    sink = ListSink()
+    handler = SinkHandler(sink)
+    handler.addFilter(lambda _: False)
+
+    logger = logging.getLogger(f"{__name__}.{faker.pystr()}")
+    logger.addHandler(handler)
+    logger.warning(faker.pystr())
+
+    assert sink.lines == []
+
+
+def test_sink_handler_handles_sink_errors(faker: Faker) -> None:
+    class FailingSink(ListSink):
+        def write(self, line: bytes, levelno: int) -> None:  # noqa: ARG002
+            raise OSError
+
+    handler = SinkHandler(FailingSink())
+    logger = logging.getLogger(f"{__name__}.{faker.pystr()}")
+    logger.addHandler(handler)
+
+    raise_exceptions = logging.raiseExceptions
+    logging.raiseExceptions = False
+    try:
+        logger.warning(faker.pystr())
+    finally:
+        logging.raiseExceptions = raise_exceptions
@@ -0,0 +1,157 @@
+import multiprocessing
+import os
+import re
+from collections.abc import Generator
+from typing import TYPE_CHECKING
+from unittest.mock import Mock, patch
+from uuid import UUID
+
+import pytest
+
+from acidrain_logging import trace_ids
+from acidrain_logging.config import TraceIdFormat, TraceIdSettings
+from acidrain_logging.trace_ids import (
+    DatadogTraceIdGenerator,
+    RandomTraceIdGenerator,
+    configure_trace_ids,
+    get_trace_id_generator,
+    new_trace_id,
+)
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+TRACE_ID = 0x0AF7651916CD43DD8448EB211C80319C
+SPAN_ID = 0xB7AD6B7169203331
+
+
+@pytest.fixture(autouse=True)
+def _reset_generator() -> Generator[None, None, None]:
+    yield
+    configure_trace_ids(TraceIdSettings())
+
+
+@pytest.fixture
+def span() -> Mock:
+    return Mock(trace_id=TRACE_ID, span_id=SPAN_ID)
+
+
+def test_random_generator_generates_uuids_by_default() -> None:
+    generator = RandomTraceIdGenerator()
+
+    ids = [generator() for _ in range(1000)]
+
+    assert len(set(ids)) == len(ids)
+    for trace_id in ids:
+        uuid = UUID(trace_id)
+        assert str(uuid) == trace_id
+        assert uuid.version == 4
+        assert uuid.variant == "specified in RFC 4122"
+
+
+@pytest.mark.parametrize(
+    ("fmt", "pattern"),
+    [
+        (TraceIdFormat.HEX, r"[0-9a-f]{32}"),
+        (TraceIdFormat.TRACEPARENT, r"00-[0-9a-f]{32}-[0-9a-f]{16}-01"),
+    ],
+)
+def test_random_generator_formats(fmt: TraceIdFormat, pattern: str) -> None:
+    generator = RandomTraceIdGenerator(fmt)
+
+    ids = [generator() for _ in range(1000)]
+
+    assert len(set(ids)) == len(ids)
+    for trace_id in ids:
+        assert re.fullmatch(pattern, trace_id)
+
+
+def test_random_generator_reads_random_bytes_by_batch() -> None:
+    generator = RandomTraceIdGenerator(batch_size=10)
+
+    with patch("os.urandom", wraps=os.urandom) as mock:
+        for _ in range(25):
+            generator()
+
+    assert [c.args for c in mock.call_args_list] == [(160,)] * 3
+
+
+def _send_trace_id(generator: RandomTraceIdGenerator, conn: "Connection") -> None:
+    conn.send(generator())
+
+
+def test_random_generator_drops_its_batch_in_forked_processes() -> None:
+    generator = RandomTraceIdGenerator()
+    generator()
+
+    ctx = multiprocessing.get_context("fork")
+    parent_conn, child_conn = ctx.Pipe()
+    process = ctx.Process(target=_send_trace_id, args=(generator, child_conn))
+    process.start()
+    process.join()
+
+    assert parent_conn.recv() != generator()
+
+
+def test_random_generators_are_cleared_after_a_fork() -> None:
+    generator = RandomTraceIdGenerator(batch_size=10)
+    generator()
+
+    with patch("os.urandom", wraps=os.urandom) as mock:
+        # What forked processes run first, before any id is handed out
+        generator._reset_after_fork()  # noqa: SLF001
+        generator()
+
+    mock.assert_called_once_with(160)
+
+
+@pytest.mark.parametrize(
+    ("fmt", "expected"),
+    [
+        (TraceIdFormat.UUID, "0af76519-16cd-43dd-8448-eb211c80319c"),
+        (TraceIdFormat.HEX, "0af7651916cd43dd8448eb211c80319c"),
+        (
+            TraceIdFormat.TRACEPARENT,
+            "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01",
+        ),
+    ],
+)
+def test_datadog_generator_reuses_the_active_trace_id(
+    span: Mock, fmt: TraceIdFormat, expected: str
+) -> None:
+    generator = DatadogTraceIdGenerator(fmt, fallback=Mock())
+
+    with patch(f"{trace_ids.__name__}.tracer") as tracer_mock:
+        tracer_mock.current_span.return_value = span
+        assert generator() == expected
+
+
+def test_datadog_generator_falls_back_without_active_span() -> None:
+    fallback = Mock(return_value="fallback")
+    generator = DatadogTraceIdGenerator(TraceIdFormat.UUID, fallback)
+
+    with patch(f"{trace_ids.__name__}.tracer") as tracer_mock:
+        tracer_mock.current_span.return_value = None
+        assert generator() == "fallback"
+
+
+@pytest.mark.parametrize("from_datadog", [True, False])
+def test_get_trace_id_generator(*, from_datadog: bool) -> None:
+    settings = TraceIdSettings(format=TraceIdFormat.HEX, from_datadog=from_datadog)
+
+    generator = get_trace_id_generator(settings)
+
+    if from_datadog:
+        assert isinstance(generator, DatadogTraceIdGenerator)
+        generator = generator.fallback
+
+    assert isinstance(generator, RandomTraceIdGenerator)
+    assert generator.fmt == TraceIdFormat.HEX
+
+
+def test_configure_trace_ids_sets_the_generator_of_new_trace_id() -> None:
+    assert UUID(new_trace_id())
+
+    configure_trace_ids(TraceIdSettings(format=TraceIdFormat.TRACEPARENT))
+
+    assert new_trace_id().startswith("00-")
@@ -0,0 +1,167 @@
+from collections.abc import Callable, Generator
+from functools import partial
+from unittest.mock import Mock, patch
+
+import pytest
+from structlog.processors import format_exc_info
+from structlog.typing import ExcInfo
+
+from acidrain_logging import tracebacks
+from acidrain_logging.tracebacks import CachedExceptionFormatter
+
+
+@pytest.fixture
+def format_stacks() -> Generator[Mock, None, None]:
+    wrapped = tracebacks._format_stacks  # noqa: SLF001
+    with patch.object(tracebacks, "_format_stacks", wraps=wrapped) as m:
+        yield m
+
+
+class CustomError(Exception):
+    pass
+
+
+class UnprintableError(Exception):
+    def __str__(self) -> str:
+        raise RuntimeError
+
+
+def _raise(exc: BaseException) -> None:
+    raise exc
+
+
+def _simple() -> None:
+    _raise(ValueError("boom"))
+
+
+def _empty_message() -> None:
+    _raise(CustomError())
+
+
+def _unprintable() -> None:
+    _raise(UnprintableError())
+
+
+def _caused() -> None:
+    try:
+        _simple()
+    except ValueError as e:
+        msg = "caused"
+        raise KeyError(msg) from e
+
+
+def _during_handling() -> None:
+    try:
+        _caused()
+    except KeyError:
+        _raise(RuntimeError("during handling"))
+
+
+def _suppressed_context() -> None:
+    try:
+        _simple()
+    except ValueError:
+        msg = "suppressed"
+        raise CustomError(msg) from None
+
+
+def _with_notes() -> None:
+    try:
+        _simple()
+    except ValueError as e:
+        e.add_note("a note")
+        raise
+
+
+def _syntax_error() -> None:
+    compile("1 +", "<string>", "exec")
+
+
+def _group() -> None:
+    try:
+        _simple()
+    except ValueError as e:
+        msg = "group"
+        raise ExceptionGroup(msg, [e, CustomError("other")]) from None
+
+
+def _cycle() -> None:
+    try:
+        _simple()
+    except ValueError as e:
+        error = KeyError("cycle")
+        e.__context__ = error
+        raise error from e
+
+
+def _get_exc_info(func: Callable[[], None]) -> ExcInfo:
+    with pytest.raises(BaseException) as info:  # noqa: PT011 -> Whatever it raises
+        func()
+
+    return info.type, info.value, info.tb
+
+
+@pytest.mark.parametrize(
+    "func",
+    [
+        _simple,
+        _empty_message,
+        _unprintable,
+        _caused,
+        _during_handling,
+        _suppressed_context,
+        _with_notes,
+        _syntax_error,
+        _group,
+        _cycle,
+    ],
+)
+def test_exceptions_are_formatted_like_format_exc_info(
+    func: Callable[[], None],
+) -> None:
+    formatter = CachedExceptionFormatter(max_size=10)
+    exc_info = _get_exc_info(func)
+    expected = format_exc_info(None, "", {"exc_info": exc_info})["exception"]
+
+    # Formatted, then from the cache
+    assert formatter(exc_info) == expected
+    assert formatter(exc_info) == expected
+
+
+def test_exceptions_without_traceback_are_formatted_like_format_exc_info() -> None:
+    formatter = CachedExceptionFormatter(max_size=10)
+    exc_info = (ValueError, ValueError("boom"), None)
+
+    assert formatter(exc_info) == "ValueError: boom"
+
+
+def test_tracebacks_are_cached_per_type_and_location(format_stacks: Mock) -> None:
+    formatter = CachedExceptionFormatter(max_size=10)
+
+    for msg in ("first", "second"):
+        exc_info = _get_exc_info(partial(_raise, ValueError(msg)))
+        assert formatter(exc_info).endswith(f"ValueError: {msg}")
+    assert format_stacks.call_count == 1
+
+    formatter(_get_exc_info(partial(_raise, KeyError("other"))))
+    formatter(_get_exc_info(_simple))
+    assert format_stacks.call_count == 3
+
+
+def test_tracebacks_cache_is_bounded(format_stacks: Mock) -> None:
+    formatter = CachedExceptionFormatter(max_size=1)
+
+    for func in (_simple, _caused, _simple):
+        formatter(_get_exc_info(func))
+
+    assert format_stacks.call_count == 3
+
+
+def test_formatter_does_not_inherit_the_lock_held_when_forking() -> None:
+    formatter = CachedExceptionFormatter(max_size=10)
+
+    # As if another thread was formatting when forking
+    with formatter._lock:  # noqa: SLF001
+        formatter._reset_after_fork()  # noqa: SLF001
+
+    assert formatter(_get_exc_info(_simple)).endswith("ValueError: boom")
@@ -0,0 +1,152 @@
+from collections import Counter, OrderedDict
+from datetime import UTC, datetime
+from logging import Logger
+from typing import Any
+from unittest.mock import Mock
+from uuid import UUID
+
+import orjson
+import pytest
+
+from acidrain_logging.config import TaskLogSettings
+from acidrain_logging.renderers import JSONLineRenderer
+from acidrain_logging.truncation import (
+    BoundedValue,
+    TaskArgsFormatter,
+    ValueLimits,
+    truncate,
+)
+
+LIMITS = ValueLimits(max_depth=3, max_length=5, max_bytes=1000)
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        42,
+        1.5,
+        "foo",
+        [1, "two", None],
+        {"a": {"b": [1, 2]}},
+        datetime(2024, 1, 2, tzinfo=UTC),
+        UUID(int=1),
+    ],
+)
+def test_truncate_keeps_values_within_the_limits(value: Any) -> None:  # noqa: ANN401
+    assert truncate(value, LIMITS) == value
+
+
+def test_truncate_turns_other_collections_into_lists() -> None:
+    assert truncate((1, 2), LIMITS) == [1, 2]
+    assert truncate(frozenset([1]), LIMITS) == [1]
+
+
+def test_truncate_renders_other_objects_as_strings() -> None:
+    assert truncate(b"foo", LIMITS) == "b'foo'"
+
+
+def test_truncate_walks_the_subclasses_like_their_base() -> None:
+    class Name(str):
+        __slots__ = ()
+
+    limits = ValueLimits(max_depth=3, max_length=5, max_bytes=10)
+
+    assert truncate(Name("x" * 20), limits) == "x" * 8 + "... 12 more chars"
+    assert truncate(OrderedDict(a=(1, 2)), LIMITS) == {"a": [1, 2]}
+    assert truncate(Counter("aab"), LIMITS) == {"a": 2, "b": 1}
+
+
+def test_truncate_describes_the_containers_past_max_depth() -> None:
+    value = [[[["deep"]], {"a": 1}]]
+
+    assert truncate(value, LIMITS) == [[["<list of 1 items>"], {"a": 1}]]
+    assert truncate([[[{"a": 1}]]], LIMITS) == [[["<dict of 1 items>"]]]
+
+
+def test_truncate_keeps_the_first_max_length_items() -> None:
+    assert truncate(list(range(1000)), LIMITS) == [0, 1, 2, 3, 4, "... 995 more"]
+    assert truncate({str(i): i for i in range(7)}, LIMITS) == {
+        "0": 0,
+        "1": 1,
+        "2": 2,
+        "3": 3,
+        "4": 4,
+        "...": "2 more",
+    }
+
+
+def test_truncate_stops_once_max_bytes_are_spent() -> None:
+    limits = ValueLimits(max_depth=3, max_length=1000, max_bytes=20)
+
+    assert truncate(["x" * 100, "y"], limits) == [
+        "x" * 17 + "... 83 more chars",
+        "... 1 more",
+    ]
+    assert truncate(list(range(100)), limits) == [*range(10), "... 90 more"]
+    assert truncate({"a": "x" * 100, "b": 1}, limits) == {
+        "a": "x" * 13 + "... 87 more chars",
+        "...": "1 more",
+    }
+
+
+def test_bounded_value_is_truncated_when_rendered() -> None:
+    value = list(range(1000))
+    bounded = BoundedValue(value, LIMITS)
+
+    line = JSONLineRenderer()(Mock(Logger), "info", {"data": bounded})
+
+    assert orjson.loads(line) == {"data": [0, 1, 2, 3, 4, "... 995 more"]}
+    assert repr(bounded) == "[0, 1, 2, 3, 4, '... 995 more']"
+    assert bounded.value is value  # Not copied
+
+
+def _format(settings: TaskLogSettings, task_name: str = "tasks.add") -> tuple[Any, Any]:
+    args, kwargs = TaskArgsFormatter(settings).format(
+        task_name, [1, 2], {"user": "joe", "password": "secret"}
+    )
+
+    return (
+        args and args.__structlog__(),
+        kwargs and kwargs.__structlog__(),
+    )
+
+
+def test_task_args_formatter_logs_all_arguments_by_default() -> None:
+    assert _format(TaskLogSettings()) == (
+        [1, 2],
+        {"user": "joe", "password": "secret"},
+    )
+
+
+def test_task_args_formatter_applies_the_limits() -> None:
+    settings = TaskLogSettings(args_max_length=1)
+
+    assert _format(settings) == ([1, "... 1 more"], {"user": "joe", "...": "1 more"})
+
+
+def test_task_args_formatter_hides_the_denied_kwargs() -> None:
+    settings = TaskLogSettings(args_deny={"tasks.add": {"password"}})
+
+    assert _format(settings) == ([1, 2], {"user": "joe"})
+    assert _format(settings, "tasks.other") == (
+        [1, 2],
+        {"user": "joe", "password": "secret"},
+    )
+
+
+def test_task_args_formatter_hides_all_arguments_with_a_wildcard() -> None:
+    settings = TaskLogSettings(args_deny={"tasks.add": {"*"}})
+
+    assert _format(settings) == (None, None)
+
+
+def test_task_args_formatter_only_logs_the_allowed_kwargs() -> None:
+    settings = TaskLogSettings(args_allow={"tasks.add": {"user"}})
+
+    assert _format(settings) == (None, {"user": "joe"})
+    assert _format(settings, "tasks.other") == (
+        [1, 2],
+        {"user": "joe", "password": "secret"},
+    )
@@ -0,0 +1,318 @@
+import io
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, Any, cast
+from unittest.mock import Mock
+from wsgiref.util import FileWrapper, setup_testing_defaults
+
+import pytest
+import structlog
+from _pytest.logging import LogCaptureFixture
+from faker import Faker
+from structlog.contextvars import bound_contextvars
+from structlog.stdlib import BoundLogger
+
+from acidrain_logging import LogConfig, OutputFormat, configure_logger
+from acidrain_logging.config import (
+    AccessLogSettings,
+    FlightRecorderSettings,
+    LevelElevationSettings,
+)
+from acidrain_logging.testing.factories import LogConfigFactory
+from acidrain_logging.wsgi.middlewares import (
+    PATH_PARAMS_ENVIRON_KEY,
+    ROUTE_ENVIRON_KEY,
+    LogMiddleware,
+)
+
+if TYPE_CHECKING:
+    from _typeshed.wsgi import StartResponse, WSGIEnvironment
+
+log: BoundLogger = structlog.get_logger()
+
+
+@pytest.fixture(autouse=True)
+def _configure_logger() -> None:
+    log_config: LogConfig = LogConfigFactory.build(
+        output_format=OutputFormat.CONSOLE, level="INFO"
+    )
+    configure_logger(log_config)
+
+
+def _create_environ(path: str = "/", **extra: str) -> "WSGIEnvironment":
+    environ: WSGIEnvironment = {"PATH_INFO": path, **extra}
+    setup_testing_defaults(environ)
+    return environ
+
+
+def _app(_environ: "WSGIEnvironment", start_response: "StartResponse") -> list[bytes]:
+    log.info("in app")
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"Hello", b", ", b"World!"]
+
+
+def _get_http(caplog: LogCaptureFixture) -> dict[str, Any]:
+    return cast("dict[str, Any]", caplog.records[-1].msg["http"])  # type: ignore[index]
+
+
+def _run(app: LogMiddleware, environ: "WSGIEnvironment") -> bytes:
+    # Like a WSGI server: consume the response, then close it
+    iterable = app(environ, Mock())
+    try:
+        return b"".join(iterable)
+    finally:
+        cast("Any", iterable).close()
+
+
+def test_log_middleware_logs_the_request_once_the_response_is_closed(
+    caplog: LogCaptureFixture,
+) -> None:
+    app = LogMiddleware(_app)
+
+    iterable = app(_create_environ(), Mock())
+    assert b"".join(iterable) == b"Hello, World!"
+    assert [r.msg["event"] for r in caplog.records] == ["in app"]  # type: ignore[index]
+
+    cast("Any", iterable).close()
+    assert len(caplog.records) == 2
+
+    log_values = cast("dict[str, Any]", caplog.records[-1].msg)
+    assert log_values["event"] == "GET / 200"
+
+    response = log_values["http"]["response"]
+    assert response["status_code"] == 200
+    assert response["bytes_sent"] == len(b"Hello, World!")
+    assert 0 <= response["time_to_headers"] <= response["elapsed"]
+
+
+def test_log_middleware_logs_the_request_data(
+    caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    key = faker.pystr()
+    environ = _create_environ(
+        f"/value/{key}",
+        QUERY_STRING="default=abc&default=def&other=",
+        HTTP_HOST="example.com:8080",
+        HTTP_USER_AGENT="test-agent",
+        REMOTE_ADDR="10.0.0.1",
+    )
+    environ[PATH_PARAMS_ENVIRON_KEY] = {"key": key}
+
+    _run(LogMiddleware(_app), environ)
+
+    http = _get_http(caplog)
+    del http["response"]
+    assert http == {
+        "method": "GET",
+        "client": {"remote_ip": "10.0.0.1", "user_agent": "test-agent"},
+        "request": {
+            "path_params": {"key": key},
+            "query_params": {"default": "abc", "other": ""},
+        },
+        "url": {"host": "example.com", "path": f"/value/{key}", "scheme": "http"},
+    }
+
+
+def test_log_middleware_resets_the_context_and_binds_the_trace_id(
+    caplog: LogCaptureFixture, faker: Faker
+) -> None:
+    trace_id = faker.uuid4()
+
+    with bound_contextvars(extra_value=faker.pystr()):
+        _run(LogMiddleware(_app), _create_environ(HTTP_X_TRACE_ID=trace_id))
+
+    for record in caplog.records:
+        log_values = cast("dict[str, Any]", record.msg)
+        assert log_values["trace_id"] == trace_id
+        assert "extra_value" not in log_values
+
+
+def test_log_middleware_counts_the_bytes_of_the_write_callable(
+    caplog: LogCaptureFixture,
+) -> None:
+    def _legacy_app(
+        _environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> list[bytes]:
+        write = start_response("201 Created", [])
+        write(b"x" * 10)
+        return [b"y" * 5]
+
+    _run(LogMiddleware(_legacy_app), _create_environ())
+
+    response = _get_http(caplog)["response"]
+    assert response["status_code"] == 201
+    assert response["bytes_sent"] == 15
+
+
+def test_log_middleware_closes_the_response_of_the_app(
+    caplog: LogCaptureFixture,
+) -> None:
+    events = []
+
+    def _streaming_app(
+        _environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> Iterable[bytes]:
+        start_response("200 OK", [])
+
+        def _chunks() -> Iterator[bytes]:
+            try:
+                yield b"chunk"
+            finally:
+                events.append("closed")
+
+        return _chunks()
+
+    app = LogMiddleware(_streaming_app)
+    iterable = app(_create_environ(), Mock())
+    assert next(iter(iterable)) == b"chunk"
+
+    # Closed early, by a client disconnecting
+    cast("Any", iterable).close()
+
+    assert events == ["closed"]
+    assert _get_http(caplog)["response"]["bytes_sent"] == len(b"chunk")
+
+
+def test_log_middleware_logs_requests_that_fail(caplog: LogCaptureFixture) -> None:
+    def _failing_app(
+        _environ: "WSGIEnvironment", _start_response: "StartResponse"
+    ) -> list[bytes]:
+        msg = "boom"
+        raise RuntimeError(msg)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        LogMiddleware(_failing_app)(_create_environ(), Mock())
+
+    log_values = cast("dict[str, Any]", caplog.records[-1].msg)
+    assert log_values["event"] == "GET / 500"
+
+
+def test_log_middleware_samples_requests_by_route(caplog: LogCaptureFixture) -> None:
+    access_log = AccessLogSettings(exclude={"/health"})
+    app = LogMiddleware(_app, access_log)
+
+    environ = _create_environ("/health")
+    environ[ROUTE_ENVIRON_KEY] = "/health"
+    _run(app, environ)
+    assert [r.msg["event"] for r in caplog.records] == ["in app"]  # type: ignore[index]
+
+    # Without a matched route, the default rate applies
+    _run(app, _create_environ("/other"))
+    assert cast("dict[str, Any]", caplog.records[-1].msg)["event"] == "GET /other 200"
+
+
+@pytest.mark.parametrize(
+    ("status", "recorded"), [("200 OK", []), ("503 ERR", ["debug"])]
+)
+def test_log_middleware_logs_the_recorded_events_of_failed_requests(
+    caplog: LogCaptureFixture, status: str, recorded: list[str]
+) -> None:
+    configure_logger(
+        LogConfigFactory.build(
+            output_format=OutputFormat.CONSOLE,
+            level="INFO",
+            flight_recorder=FlightRecorderSettings(enabled=True),
+        )
+    )
+
+    def _debug_app(
+        _environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> list[bytes]:
+        # Not the module's logger, cached with the processors of its first use
+        structlog.get_logger().debug("debug")
+        start_response(status, [])
+        return []
+
+    _run(LogMiddleware(_debug_app), _create_environ())
+
+    # Before the request, with its trace id
+    events = [cast("dict[str, Any]", r.msg) for r in caplog.records]
+    assert [e["event"] for e in events] == [*recorded, f"GET / {status[:3]}"]
+    assert len({e["trace_id"] for e in events}) == 1
+
+
+def test_log_middleware_logs_responses_failing_while_streamed_as_failed(
+    caplog: LogCaptureFixture,
+) -> None:
+    configure_logger(
+        LogConfigFactory.build(
+            output_format=OutputFormat.CONSOLE,
+            level="INFO",
+            flight_recorder=FlightRecorderSettings(enabled=True),
+        )
+    )
+
+    def _failing_app(
+        _environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> Iterable[bytes]:
+        start_response("200 OK", [])
+
+        def _chunks() -> Iterator[bytes]:
+            # Not the module's logger, cached with the processors of its first use
+            structlog.get_logger().debug("debug")
+            yield b"chunk"
+            msg = "boom"
+            raise RuntimeError(msg)
+
+        return _chunks()
+
+    # Closed by the server after the failure, without logging the request again
+    with pytest.raises(RuntimeError, match="boom"):
+        _run(LogMiddleware(_failing_app), _create_environ())
+
+    events = [cast("dict[str, Any]", r.msg)["event"] for r in caplog.records]
+    assert events == ["debug", "GET / 200"]
+    assert _get_http(caplog)["response"]["bytes_sent"] == len(b"chunk")
+
+
+def test_log_middleware_passes_the_file_wrapper_through(
+    caplog: LogCaptureFixture,
+) -> None:
+    def _file_app(
+        environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> Iterable[bytes]:
+        start_response("200 OK", [])
+        return cast("Iterable[bytes]", environ["wsgi.file_wrapper"](io.BytesIO(b"x")))
+
+    environ = _create_environ()
+    environ["wsgi.file_wrapper"] = FileWrapper
+
+    iterable = LogMiddleware(_file_app)(environ, Mock())
+
+    # For the server to send the file itself
+    assert isinstance(iterable, FileWrapper)
+    assert _get_http(caplog)["response"]["status_code"] == 200
+
+
+@pytest.mark.parametrize(
+    ("headers", "logged"),
+    [
+        ({}, []),
+        ({"HTTP_X_DEBUG_LOG": "info"}, []),
+        ({"HTTP_X_DEBUG_LOG": "debug"}, ["debug"]),
+    ],
+)
+def test_log_middleware_raises_the_level_of_requests_from_the_header(
+    caplog: LogCaptureFixture, headers: dict[str, str], logged: list[str]
+) -> None:
+    configure_logger(
+        LogConfigFactory.build(
+            output_format=OutputFormat.CONSOLE,
+            level="INFO",
+            level_elevation=LevelElevationSettings(enabled=True),
+        )
+    )
+
+    def _debug_app(
+        _environ: "WSGIEnvironment", start_response: "StartResponse"
+    ) -> list[bytes]:
+        # Not the module's logger, cached with the processors of its first use
+        structlog.get_logger().debug("debug")
+        start_response("200 OK", [])
+        return []
+
+    _run(LogMiddleware(_debug_app), _create_environ(**headers))
+    # The next request is back to the global level
+    _run(LogMiddleware(_debug_app), _create_environ())
+
+    events = [cast("dict[str, Any]", r.msg)["event"] for r in caplog.records]
+    assert events == [*logged, "GET / 200", "GET / 200"]